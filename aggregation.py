@@ -0,0 +1,386 @@
+"""
+Aggregate cube for Microsoft Fabric bill analysis
+Holds per (MeterCategory, ConsumedService, ResourceName) cost aggregates and
+rolls them up into the service, category, resource and combined reports
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Union
+
+from search_index import term_pattern
+
+KEY_COLUMNS = ['MeterCategory', 'ConsumedService', 'ResourceName']
+CELL_COLUMNS = KEY_COLUMNS + ['Cost_Sum', 'Cost_Comp', 'Cost_Count', 'Cost_Min', 'Cost_Max', 'First_Row']
+
+# Number of highest-cost raw rows retained alongside the aggregates
+DEFAULT_TOP_N = 100
+
+# Resources shown under each service in the hierarchy before the rest are grouped as "Other"
+DEFAULT_RESOURCES_PER_SERVICE = 10
+
+# Levels of error-free splitting applied to costs before they are summed (see exact_parts)
+SPLIT_LEVELS = 2
+PART_COLUMNS = [f'Cost_Part{level}' for level in range(SPLIT_LEVELS + 1)]
+
+
+def _two_sum(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Knuth's TwoSum: s = fl(a + b) and the rounding error e, so a + b == s + e exactly."""
+    s = a + b
+    b_virtual = s - a
+    e = (a - (s - b_virtual)) + (b - b_virtual)
+    return s, e
+
+
+def exact_parts(*terms: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Split values into parts whose sums do not depend on summation order.
+
+    Each row's value is the sum of terms (a raw cost, or a cell's Cost_Sum
+    and Cost_Comp). Rump's error-free extraction splits it into SPLIT_LEVELS
+    parts, each a multiple of a power of two small enough that summing the
+    part over any subset of the rows, in any order, is exact in float64,
+    plus a remainder (about 2^-60 of the largest value for a million rows)
+    whose rounding is negligible. Missing values count as zero.
+
+    Returns:
+        dict: PART_COLUMNS name -> per-row part
+    """
+    terms = [np.asarray(term, dtype=np.float64) for term in terms]
+    terms = [np.where(np.isnan(term), 0.0, term) for term in terms]
+    # Partial sums of up to `count` extracted values stay below sigma, so they are exact
+    count = max(sum(len(term) for term in terms), 1)
+    margin = math.ceil(math.log2(count)) + 1
+
+    parts = {}
+    for name in PART_COLUMNS[:-1]:
+        largest = max((float(np.abs(term).max()) for term in terms if len(term)), default=0.0)
+        sigma = 2.0 ** (math.frexp(largest)[1] + margin) if largest else 1.0
+        part = np.zeros(len(terms[0]))
+        for index, term in enumerate(terms):
+            extracted = (sigma + term) - sigma
+            part += extracted
+            terms[index] = term - extracted
+        parts[name] = part
+    parts[PART_COLUMNS[-1]] = sum(terms)
+    return parts
+
+
+def _from_parts(sums: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Combine summed PART_COLUMNS into (Cost_Sum, Cost_Comp).
+
+    Cost_Sum is the correctly rounded total and Cost_Comp the remaining
+    error, so merged cells keep the precision of the exact parts.
+    """
+    total = sums[PART_COLUMNS[0]].to_numpy(dtype=np.float64)
+    error = np.zeros(len(total))
+    for name in PART_COLUMNS[1:]:
+        total, rounding = _two_sum(total, sums[name].to_numpy(dtype=np.float64))
+        error += rounding
+    return _two_sum(total, error)
+
+
+class AggregateCube:
+    """
+    Cost aggregates at (MeterCategory, ConsumedService, ResourceName) grain.
+
+    Each cell keeps sum, count, min and max of Cost plus the position of the
+    first raw row in the combination, so roll-ups reproduce the row-order
+    dependent parts of the reports (e.g. ``first`` and ``unique``). Cubes
+    built from separate chunks of the same file can be merged, which makes
+    them the unit of work for streaming ingestion. Sums are accumulated
+    exactly (see exact_parts) and kept as Cost_Sum, the correctly rounded
+    total, plus the remaining error Cost_Comp, so merged cubes report the
+    same figures as a single pass.
+    """
+
+    def __init__(self, cells: pd.DataFrame = None, total_rows: int = 0,
+                 top_rows: pd.DataFrame = None, top_n: int = DEFAULT_TOP_N):
+        self.cells = cells if cells is not None else pd.DataFrame(columns=CELL_COLUMNS)
+        self.total_rows = total_rows
+        self.top_rows = top_rows if top_rows is not None else pd.DataFrame(columns=KEY_COLUMNS + ['Cost'])
+        self.top_n = top_n
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, row_offset: int = 0, top_n: int = DEFAULT_TOP_N) -> 'AggregateCube':
+        """
+        Build a cube from a cleaned DataFrame.
+
+        Args:
+            df (pd.DataFrame): Prepared billing rows
+            row_offset (int): Position of df's first row within the whole bill
+            top_n (int): Number of highest-cost rows to retain
+
+        Returns:
+            AggregateCube: Aggregates for the rows in df
+        """
+        values = pd.DataFrame({
+            'Cost': df['Cost'].to_numpy(),
+            'Row': np.arange(row_offset, row_offset + len(df)),
+            **exact_parts(df['Cost'].to_numpy())
+        }, index=df.index)
+
+        cells = values.groupby([df[col] for col in KEY_COLUMNS], observed=True, sort=False).agg(
+            Cost_Count=('Cost', 'count'),
+            Cost_Min=('Cost', 'min'),
+            Cost_Max=('Cost', 'max'),
+            First_Row=('Row', 'min'),
+            **{name: (name, 'sum') for name in PART_COLUMNS}
+        ).reset_index()
+        cells = cells.astype({col: object for col in KEY_COLUMNS})
+        cells['Cost_Sum'], cells['Cost_Comp'] = _from_parts(cells)
+        cells = cells[CELL_COLUMNS]
+
+        top_rows = df.nlargest(top_n, 'Cost')[KEY_COLUMNS + ['Cost']]
+        top_rows = top_rows.astype({col: object for col in KEY_COLUMNS})
+
+        return cls(cells, len(df), top_rows, top_n)
+
+    def merge(self, other: 'AggregateCube') -> 'AggregateCube':
+        """
+        Combine two cubes into one covering the rows of both.
+
+        Args:
+            other (AggregateCube): Cube for rows that come after this cube's rows
+
+        Returns:
+            AggregateCube: Merged aggregates
+        """
+        if self.cells.empty:
+            return other
+        if other.cells.empty:
+            return self
+
+        both = pd.concat([self.cells, other.cells], ignore_index=True)
+        both = both.assign(**exact_parts(both['Cost_Sum'], both['Cost_Comp']))
+        cells = both.groupby(KEY_COLUMNS, sort=False).agg(
+            Cost_Count=('Cost_Count', 'sum'),
+            Cost_Min=('Cost_Min', 'min'),
+            Cost_Max=('Cost_Max', 'max'),
+            First_Row=('First_Row', 'min'),
+            **{name: (name, 'sum') for name in PART_COLUMNS}
+        ).reset_index()
+        cells['Cost_Sum'], cells['Cost_Comp'] = _from_parts(cells)
+        cells = cells[CELL_COLUMNS]
+
+        top_n = max(self.top_n, other.top_n)
+        top_rows = pd.concat([self.top_rows, other.top_rows]).nlargest(top_n, 'Cost')
+
+        return AggregateCube(cells, self.total_rows + other.total_rows, top_rows, top_n)
+
+    def shift_rows(self, offset: int) -> 'AggregateCube':
+        """
+        Return a copy whose row positions start at offset.
+
+        Cubes built independently (e.g. one per file) all count rows from
+        zero; shifting each by the rows that precede it makes them mergeable
+        in order.
+        """
+        cells = self.cells.copy()
+        cells['First_Row'] = cells['First_Row'] + offset
+        return AggregateCube(cells, self.total_rows, self.top_rows, self.top_n)
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by the cells and top rows."""
+        return int(self.cells.memory_usage(deep=True).sum() + self.top_rows.memory_usage(deep=True).sum())
+
+    def cost_by(self, columns: Union[str, List[str]]) -> pd.Series:
+        """
+        Total cost for each value of one or more key columns, sorted by value.
+
+        Cell sums are added exactly (see exact_parts), so a total is the same
+        however the rows were split between chunks, files and cells.
+        """
+        parts = pd.DataFrame(exact_parts(self.cells['Cost_Sum'], self.cells['Cost_Comp']), index=self.cells.index)
+        sums = parts.groupby([self.cells[col] for col in np.atleast_1d(columns)]).sum()
+        return pd.Series(_from_parts(sums)[0], index=sums.index, name='Cost_Sum')
+
+    @property
+    def total_cost(self) -> float:
+        parts = pd.DataFrame(exact_parts(self.cells['Cost_Sum'], self.cells['Cost_Comp']))
+        return float(_from_parts(parts.sum().to_frame().T)[0][0])
+
+    def basic_stats(self) -> Dict:
+        """Return the aggregate part of FabricBillAnalyzer.get_basic_stats."""
+        total_cost = self.total_cost
+        return {
+            'total_records': int(self.total_rows),
+            'total_cost': total_cost,
+            'avg_cost': total_cost / self.total_rows if self.total_rows else float('nan'),
+            'min_cost': float(self.cells['Cost_Min'].min()),
+            'max_cost': float(self.cells['Cost_Max'].max()),
+            'unique_services': self.cells['ConsumedService'].nunique(),
+            'unique_categories': self.cells['MeterCategory'].nunique(),
+            'unique_resources': self.cells['ResourceName'].nunique()
+        }
+
+    def rollup(self, column: str) -> pd.DataFrame:
+        """Total cost and row count for each value of one key column."""
+        return pd.DataFrame({
+            'Total_Cost': self.cost_by(column),
+            'Usage_Count': self.cells.groupby(column)['Cost_Count'].sum()
+        }).reset_index()
+
+    def _distinct_in_order(self, group_col: str, value_col: str) -> pd.Series:
+        """
+        Comma-join the distinct value_col entries of each group in order of first appearance.
+
+        Equivalent to ``groupby(group_col)[value_col].agg(lambda x: ', '.join(x.unique()))``
+        on the raw rows, but computed from a deduplicated (group, value) pair
+        table and concatenated with one ``np.add.reduceat`` call instead of a
+        Python call per group.
+        """
+        pairs = self.cells.groupby([group_col, value_col], sort=False)['First_Row'].min().reset_index()
+        if pairs.empty:
+            return pd.Series(dtype=object)
+
+        # Make each group's values contiguous, ordered by first appearance
+        pairs = pairs.sort_values([group_col, 'First_Row'], kind='stable')
+        groups = pairs[group_col].to_numpy()
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+        joined = np.add.reduceat((', ' + pairs[value_col].astype(str)).to_numpy(dtype=object), starts)
+        return pd.Series(joined, index=pd.Index(groups[starts], name=group_col)).str[2:]
+
+    def _dimension_report(self, group_col: str, list_col: str, list_name: str) -> pd.DataFrame:
+        """Roll the cube up to one key column in the analyze_by_service/category layout."""
+        if self.cells.empty:
+            return pd.DataFrame()
+
+        grouped = self.cells.groupby(group_col)
+        total = self.cost_by(group_col)
+        count = grouped['Cost_Count'].sum()
+
+        report = pd.DataFrame({
+            'Total_Cost': total,
+            'Avg_Cost': total / count,
+            'Usage_Count': count,
+            'Unique_Resources': grouped['ResourceName'].nunique(),
+            list_name: self._distinct_in_order(group_col, list_col)
+        }).round(2)
+
+        report = report.sort_values('Total_Cost', ascending=False).reset_index()
+        report['Percentage'] = (report['Total_Cost'] / self.total_cost * 100).round(2)
+        return report
+
+    def service_report(self) -> pd.DataFrame:
+        """Costs by consumed service (see FabricBillAnalyzer.analyze_by_service)."""
+        return self._dimension_report('ConsumedService', 'MeterCategory', 'Categories')
+
+    def category_report(self) -> pd.DataFrame:
+        """Costs by meter category (see FabricBillAnalyzer.analyze_by_category)."""
+        return self._dimension_report('MeterCategory', 'ConsumedService', 'Services')
+
+    def resource_report(self) -> pd.DataFrame:
+        """Costs by resource name (see FabricBillAnalyzer.analyze_by_resource)."""
+        if self.cells.empty:
+            return pd.DataFrame()
+
+        grouped = self.cells.groupby('ResourceName')
+        total = self.cost_by('ResourceName')
+        count = grouped['Cost_Count'].sum()
+
+        # Service and category of the first raw row for each resource
+        first = self.cells.loc[grouped['First_Row'].idxmin()].set_index('ResourceName')
+
+        report = pd.DataFrame({
+            'Total_Cost': total,
+            'Avg_Cost': total / count,
+            'Usage_Count': count,
+            'Service': first['ConsumedService'],
+            'Category': first['MeterCategory']
+        }).round(2)
+
+        report = report.sort_values('Total_Cost', ascending=False).reset_index()
+        report['Percentage'] = (report['Total_Cost'] / self.total_cost * 100).round(2)
+        return report
+
+    def combined_report(self) -> pd.DataFrame:
+        """Grouped costs sorted by MeterCategory↑, ConsumedService↑, Cost↓."""
+        if self.cells.empty:
+            return pd.DataFrame(columns=KEY_COLUMNS + ['Cost'])
+
+        combined = self.cells[KEY_COLUMNS + ['Cost_Sum']].rename(columns={'Cost_Sum': 'Cost'})
+        # ResourceName breaks cost ties the same way a sorted group-by would
+        combined = combined.sort_values(
+            by=['MeterCategory', 'ConsumedService', 'Cost', 'ResourceName'],
+            ascending=[True, True, False, True]
+        ).reset_index(drop=True)
+        combined['Cost'] = combined['Cost'].round(2)
+        return combined
+
+    def hierarchy(self, resources_per_service: int = DEFAULT_RESOURCES_PER_SERVICE) -> pd.DataFrame:
+        """
+        Category -> service -> resource cost tree as parent/child rows.
+
+        Built from the cells in one sort and two group-bys, so the cost grows
+        with the number of combinations rather than raw rows. Within each
+        service only the costliest resources_per_service resources are kept;
+        the remainder is summed into one "Other (n)" node per service.
+
+        Args:
+            resources_per_service (int): Resources kept per service
+
+        Returns:
+            pd.DataFrame: ids, labels, parents and values, parents before children
+        """
+        if self.cells.empty:
+            return pd.DataFrame(columns=['ids', 'labels', 'parents', 'values'])
+
+        resources = self.cells[KEY_COLUMNS + ['Cost_Sum']].sort_values(
+            ['MeterCategory', 'ConsumedService', 'Cost_Sum'], ascending=[True, True, False], kind='stable')
+        service_ids = resources['MeterCategory'] + ' - ' + resources['ConsumedService']
+        rank = resources.groupby(['MeterCategory', 'ConsumedService'], sort=False).cumcount()
+        keep = (rank < resources_per_service).to_numpy()
+
+        kept = pd.DataFrame({
+            'ids': service_ids[keep] + ' - ' + resources['ResourceName'][keep],
+            'labels': resources['ResourceName'][keep],
+            'parents': service_ids[keep],
+            'values': resources['Cost_Sum'][keep]
+        })
+
+        rest = resources[~keep].assign(Parent=service_ids[~keep])
+        rest = rest.groupby('Parent', sort=False)['Cost_Sum'].agg(['sum', 'count'])
+        other = pd.DataFrame({
+            'ids': rest.index + ' - Other',
+            'labels': 'Other (' + rest['count'].astype(str) + ')',
+            'parents': rest.index,
+            'values': rest['sum']
+        })
+
+        services = resources.groupby(['MeterCategory', 'ConsumedService'], sort=False)['Cost_Sum'].sum().reset_index()
+        categories = services.groupby('MeterCategory', sort=False)['Cost_Sum'].sum()
+
+        levels = [
+            pd.DataFrame({'ids': categories.index, 'labels': categories.index,
+                          'parents': '', 'values': categories.to_numpy()}),
+            pd.DataFrame({'ids': services['MeterCategory'] + ' - ' + services['ConsumedService'],
+                          'labels': services['ConsumedService'], 'parents': services['MeterCategory'],
+                          'values': services['Cost_Sum']}),
+            kept,
+            other
+        ]
+        return pd.concat(levels, ignore_index=True)
+
+    def top_costs(self, limit: int = 10) -> pd.DataFrame:
+        """Highest-cost raw rows, limited to the top_n rows retained while building."""
+        return self.top_rows.head(limit)
+
+    def search(self, search_term: str) -> pd.DataFrame:
+        """Combined report rows whose key columns contain search_term."""
+        combined = self.combined_report()
+        if combined.empty:
+            return combined
+
+        # Invalid patterns are matched literally, as in SearchIndex
+        regex = term_pattern(search_term) is not None
+        mask = (
+            combined['ResourceName'].str.contains(search_term, case=False, na=False, regex=regex) |
+            combined['ConsumedService'].str.contains(search_term, case=False, na=False, regex=regex) |
+            combined['MeterCategory'].str.contains(search_term, case=False, na=False, regex=regex)
+        )
+        return combined[mask]
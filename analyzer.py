@@ -10,211 +10,322 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import os
-from typing import Dict, List, Tuple, Optional
+import threading
+from typing import Callable, Dict, List, Tuple, Optional
 import logging
 
+from aggregation import AggregateCube
+from excel_export import write_workbook
+from search_index import SearchIndex
+from timeseries import CostTimeSeries, find_date_column
+from anomaly import find_anomalies, DEFAULT_WINDOW, DEFAULT_THRESHOLD, DEFAULT_MIN_COST
+from sidecar import read_sidecar, write_sidecar
+from excel_import import is_excel_file, read_excel_bill
+from bill_schema import read_bill_csv
+from query_store import QueryStore, QueryError, DEFAULT_ROW_LIMIT, DEFAULT_TIMEOUT
+from instrumentation import instrumented, stage
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def encode_key_column(series: pd.Series) -> pd.Series:
+    """
+    Encode a key column as a categorical of stripped strings.
+    
+    Stripping runs once per distinct value rather than once per row, values
+    that collide after stripping are merged, and categories are sorted so
+    group-bys keep the same order as on plain strings. Missing values become
+    'nan', as with astype(str).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    
+    labels = pd.Index(uniques).astype(str).str.strip()
+    if (codes == -1).any():
+        labels = labels.append(pd.Index(['nan']))
+        codes = np.where(codes == -1, len(labels) - 1, codes)
+    
+    label_codes, categories = pd.factorize(labels, sort=True)
+    return pd.Series(
+        pd.Categorical.from_codes(label_codes[codes], categories=categories),
+        index=series.index,
+        name=series.name
+    )
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean a raw billing DataFrame: numeric Cost, categorical key columns, parsed dates.
+    
+    Args:
+        df (pd.DataFrame): Raw rows as read from the bill
+        
+    Returns:
+        pd.DataFrame: The cleaned frame
+    """
+    # Convert Cost to numeric, handling various formats
+    if 'Cost' in df.columns:
+        df['Cost'] = pd.to_numeric(df['Cost'], errors='coerce')
+        df['Cost'] = df['Cost'].fillna(0)
+    
+    # Clean string columns, stored as categoricals
+    string_columns = ['MeterCategory', 'ConsumedService', 'ResourceName']
+    for col in string_columns:
+        if col in df.columns:
+            df[col] = encode_key_column(df[col])
+    
+    # Handle date columns if present
+    date_columns = ['Date', 'BillingDate', 'UsageDate']
+    for col in date_columns:
+        if col in df.columns:
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except:
+                pass
+    
+    return df
+
 class FabricBillAnalyzer:
-    def __init__(self):
-        """Initialize the Fabric Bill Analyzer with enhanced features."""
+    def __init__(self, use_sidecar: bool = True, csv_engine: Optional[str] = None):
+        """
+        Initialize the Fabric Bill Analyzer with enhanced features.
+        
+        Args:
+            use_sidecar (bool): Reuse/write a columnar cache next to the source file
+            csv_engine (str): CSV parser: 'pandas', 'pyarrow' (multi-threaded) or
+                'auto' by file size (default: FBA_CSV_ENGINE, else 'auto')
+        """
         self.df = None
         self.file_path = None
         self.analysis_timestamp = None
+        self.use_sidecar = use_sidecar
+        self.csv_engine = csv_engine
+        # Serializes the lazy builds below so concurrent requests build each structure once
+        self._build_lock = threading.RLock()
+        self._reset_memos()
+        
+    def _reset_memos(self):
+        """Drop the aggregates, indexes and stores built from the previous load."""
+        self._cube = None
+        self._search_index = None
+        self._time_series = None
+        self._query_store = None
+        self._anomalies = None
+        # (object, bytes) per attribute counted by memory_bytes
+        self._memory_sizes = {}
+    
+    def memory_bytes(self) -> int:
+        """
+        Estimate the memory held by the rows and every structure built from them.
         
+        Counts the DataFrame, the aggregate cube, the search index, the time
+        series grids, the SQL store and memoized anomalies, whichever exist.
+        Each is measured once after it is built.
+        """
+        total = 0
+        for name in ('df', '_cube', '_search_index', '_time_series', '_query_store', '_anomalies'):
+            obj = getattr(self, name, None)
+            if obj is None:
+                continue
+            measured = self._memory_sizes.get(name)
+            if measured is None or measured[0] is not obj:
+                size = (int(obj.memory_usage(deep=True).sum()) if isinstance(obj, pd.DataFrame)
+                        else obj.memory_bytes())
+                measured = self._memory_sizes[name] = (obj, size)
+            total += measured[1]
+        return total
+    
+    @instrumented
     def load_data(self, file_path: str) -> bool:
         """
-        Load and validate billing data from CSV file.
+        Load and validate billing data from a CSV file or Excel workbook.
+        
+        Workbooks are streamed through openpyxl's read-only reader and the
+        billing sheet is found automatically; both formats then share the
+        same cleaning path and columnar sidecar.
         
         Args:
-            file_path (str): Path to the CSV file
+            file_path (str): Path to the CSV or .xlsx/.xlsm/.xls file
             
         Returns:
             bool: True if successful, False otherwise
         """
+        # Aggregates and indexes from a previous load are no longer valid
+        self._reset_memos()
+        
         try:
             # Check if file exists
             if not os.path.exists(file_path):
                 logger.error(f"File not found: {file_path}")
                 return False
-                
-            # Load CSV with flexible separator detection
-            try:
-                self.df = pd.read_csv(file_path)
-            except Exception as e:
-                # Try with semicolon separator
-                self.df = pd.read_csv(file_path, sep=';')
             
-            self.file_path = file_path
-            self.analysis_timestamp = datetime.now()
+            # Reuse the cleaned columnar sidecar when the source is unchanged
+            if self.use_sidecar:
+                with stage('FabricBillAnalyzer.read_sidecar', self) as read:
+                    cached_df = read_sidecar(file_path)
+                    # self.df still holds the previous bill here
+                    read.rows = len(cached_df) if cached_df is not None else 0
+                if cached_df is not None:
+                    self.df = cached_df
+                    self.file_path = file_path
+                    self.analysis_timestamp = datetime.now()
+                    return True
+                
+            if is_excel_file(file_path):
+                with stage('FabricBillAnalyzer.read_excel', self):
+                    self.df = read_excel_bill(file_path)
+            else:
+                # Delimiter, encoding and header sniffed up front; only projected columns parsed
+                with stage('FabricBillAnalyzer.read_csv', self):
+                    self.df = read_bill_csv(file_path, engine=self.csv_engine)
             
             logger.info(f"Loaded {len(self.df)} records from {file_path}")
             
-            # Validate required columns
-            required_columns = ['MeterCategory', 'ConsumedService', 'ResourceName', 'Cost']
-            missing_columns = [col for col in required_columns if col not in self.df.columns]
-            
-            if missing_columns:
-                logger.error(f"Missing required columns: {missing_columns}")
-                logger.info(f"Available columns: {list(self.df.columns)}")
+            if not self.load_frame(self.df, file_path):
                 return False
             
-            # Clean and prepare data
-            self._prepare_data()
+            if self.use_sidecar:
+                write_sidecar(file_path, self.df)
             return True
             
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
             return False
     
+    def load_frame(self, df: pd.DataFrame, file_path: str = None) -> bool:
+        """
+        Validate and prepare billing rows that were already parsed.
+        
+        Used by load_data and by ingestion paths that parse the CSV
+        themselves (e.g. while an upload is still arriving).
+        
+        Args:
+            df (pd.DataFrame): Raw billing rows
+            file_path (str): Source file the rows came from
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self._reset_memos()
+        
+        self.df = df
+        self.file_path = file_path
+        self.analysis_timestamp = datetime.now()
+        
+        # Validate required columns
+        required_columns = ['MeterCategory', 'ConsumedService', 'ResourceName', 'Cost']
+        missing_columns = [col for col in required_columns if col not in self.df.columns]
+        
+        if missing_columns:
+            logger.error(f"Missing required columns: {missing_columns}")
+            logger.info(f"Available columns: {list(self.df.columns)}")
+            return False
+        
+        # Clean and prepare data
+        self._prepare_data()
+        return True
+    
+    @instrumented
     def _prepare_data(self):
         """Prepare and clean the loaded data."""
-        # Convert Cost to numeric, handling various formats
-        if 'Cost' in self.df.columns:
-            self.df['Cost'] = pd.to_numeric(self.df['Cost'], errors='coerce')
-            self.df['Cost'] = self.df['Cost'].fillna(0)
-        
-        # Clean string columns
-        string_columns = ['MeterCategory', 'ConsumedService', 'ResourceName']
-        for col in string_columns:
-            if col in self.df.columns:
-                self.df[col] = self.df[col].astype(str).str.strip()
-        
-        # Handle date columns if present
-        date_columns = ['Date', 'BillingDate', 'UsageDate']
-        for col in date_columns:
-            if col in self.df.columns:
-                try:
-                    self.df[col] = pd.to_datetime(self.df[col])
-                except:
-                    pass
+        self.df = prepare_frame(self.df)
         
         logger.info(f"Data prepared: {len(self.df)} records, ${self.df['Cost'].sum():,.2f} total cost")
     
+    def has_data(self) -> bool:
+        """Return True once billing data has been loaded."""
+        return self.df is not None or self._cube is not None
+    
+    def get_cube(self) -> Optional[AggregateCube]:
+        """
+        Return the (MeterCategory, ConsumedService, ResourceName) aggregate cube.
+        
+        The cube is built with a single group-by the first time it is needed
+        after a load, and every per-dimension report rolls up from it.
+        """
+        if self._cube is None and self.df is not None:
+            with self._build_lock:
+                if self._cube is None:
+                    with stage('FabricBillAnalyzer.build_cube', self):
+                        self._cube = AggregateCube.from_frame(self.df)
+        return self._cube
+    
+    @instrumented
     def get_basic_stats(self) -> Dict:
         """Generate basic statistics about the billing data."""
-        if self.df is None:
+        cube = self.get_cube()
+        if cube is None:
             return {}
         
-        stats = {
-            'total_records': len(self.df),
-            'total_cost': float(self.df['Cost'].sum()),
-            'avg_cost': float(self.df['Cost'].mean()),
-            'min_cost': float(self.df['Cost'].min()),
-            'max_cost': float(self.df['Cost'].max()),
-            'unique_services': self.df['ConsumedService'].nunique(),
-            'unique_categories': self.df['MeterCategory'].nunique(),
-            'unique_resources': self.df['ResourceName'].nunique(),
-            'analysis_date': self.analysis_timestamp.strftime('%Y-%m-%d %H:%M:%S') if self.analysis_timestamp else 'N/A'
-        }
+        stats = cube.basic_stats()
+        stats['analysis_date'] = self.analysis_timestamp.strftime('%Y-%m-%d %H:%M:%S') if self.analysis_timestamp else 'N/A'
         
         return stats
     
+    @instrumented
     def analyze_by_service(self) -> pd.DataFrame:
         """Analyze costs by consumed service."""
-        if self.df is None:
+        cube = self.get_cube()
+        if cube is None:
             return pd.DataFrame()
         
-        service_analysis = self.df.groupby('ConsumedService').agg({
-            'Cost': ['sum', 'mean', 'count'],
-            'ResourceName': 'nunique',
-            'MeterCategory': lambda x: ', '.join(x.unique())
-        }).round(2)
-        
-        # Flatten column names
-        service_analysis.columns = ['Total_Cost', 'Avg_Cost', 'Usage_Count', 'Unique_Resources', 'Categories']
-        service_analysis = service_analysis.sort_values('Total_Cost', ascending=False).reset_index()
-        
-        # Add percentage of total
-        total_cost = self.df['Cost'].sum()
-        service_analysis['Percentage'] = (service_analysis['Total_Cost'] / total_cost * 100).round(2)
-        
-        return service_analysis
+        return cube.service_report()
     
+    @instrumented
     def analyze_by_category(self) -> pd.DataFrame:
         """Analyze costs by meter category."""
-        if self.df is None:
+        cube = self.get_cube()
+        if cube is None:
             return pd.DataFrame()
         
-        category_analysis = self.df.groupby('MeterCategory').agg({
-            'Cost': ['sum', 'mean', 'count'],
-            'ResourceName': 'nunique',
-            'ConsumedService': lambda x: ', '.join(x.unique())
-        }).round(2)
-        
-        # Flatten column names
-        category_analysis.columns = ['Total_Cost', 'Avg_Cost', 'Usage_Count', 'Unique_Resources', 'Services']
-        category_analysis = category_analysis.sort_values('Total_Cost', ascending=False).reset_index()
-        
-        # Add percentage of total
-        total_cost = self.df['Cost'].sum()
-        category_analysis['Percentage'] = (category_analysis['Total_Cost'] / total_cost * 100).round(2)
-        
-        return category_analysis
+        return cube.category_report()
     
+    @instrumented
     def analyze_by_resource(self) -> pd.DataFrame:
         """Analyze costs by resource name."""
-        if self.df is None:
+        cube = self.get_cube()
+        if cube is None:
             return pd.DataFrame()
         
-        resource_analysis = self.df.groupby('ResourceName').agg({
-            'Cost': ['sum', 'mean', 'count'],
-            'ConsumedService': 'first',
-            'MeterCategory': 'first'
-        }).round(2)
-        
-        # Flatten column names
-        resource_analysis.columns = ['Total_Cost', 'Avg_Cost', 'Usage_Count', 'Service', 'Category']
-        resource_analysis = resource_analysis.sort_values('Total_Cost', ascending=False).reset_index()
-        
-        # Add percentage of total
-        total_cost = self.df['Cost'].sum()
-        resource_analysis['Percentage'] = (resource_analysis['Total_Cost'] / total_cost * 100).round(2)
-        
-        return resource_analysis
+        return cube.resource_report()
     
+    @instrumented
     def generate_combined_sorted_report(self) -> pd.DataFrame:
         """
         Generate the Combined Sorted Report with GROUPED costs by unique combinations.
         Groups records by MeterCategory + ConsumedService + ResourceName and sums costs.
         Sort by: MeterCategory↑, ConsumedService↑, Cost↓
         """
-        if self.df is None:
+        cube = self.get_cube()
+        if cube is None:
             logger.error("No data loaded. Please load data first.")
             return pd.DataFrame()
         
-        logger.info("Generating Combined Sorted Report with grouped costs...")
-        
-        # Group by MeterCategory, ConsumedService, and ResourceName, sum the costs
-        grouped_df = self.df.groupby(['MeterCategory', 'ConsumedService', 'ResourceName']).agg({
-            'Cost': 'sum'
-        }).reset_index()
+        combined_report = cube.combined_report()
         
-        # Sort by: MeterCategory (ascending), ConsumedService (ascending), Cost (descending)
-        combined_report = grouped_df.sort_values(
-            by=['MeterCategory', 'ConsumedService', 'Cost'],
-            ascending=[True, True, False]
-        ).reset_index(drop=True)
-        
-        # Round cost to 2 decimal places
-        combined_report['Cost'] = combined_report['Cost'].round(2)
-        
-        logger.info(f"Combined Sorted Report generated: {len(combined_report)} grouped records from {len(self.df)} individual records")
+        logger.info(f"Combined Sorted Report generated: {len(combined_report)} grouped records from {cube.total_rows} individual records")
         
         return combined_report
     
-    def export_combined_sorted_csv(self, output_path: str = None) -> str:
+    @instrumented
+    def export_combined_sorted_csv(self, output_path: str = None,
+                                   progress_callback: Optional[Callable[[float, str], None]] = None) -> str:
         """
         Export the Combined Sorted Report to CSV format matching the BillSort.csv format.
         
         Args:
             output_path (str): Optional path for the output file
+            progress_callback (callable): Optional callback(fraction, stage) reporting progress
             
         Returns:
             str: Path to the exported file
         """
+        progress = progress_callback or (lambda fraction, stage: None)
+        
+        progress(0.1, 'Combined_Sorted')
         combined_report = self.generate_combined_sorted_report()
         
         if combined_report.empty:
@@ -232,6 +343,7 @@ class FabricBillAnalyzer:
         
         try:
             # Export to CSV with exact format
+            progress(0.5, 'Writing CSV')
             combined_report.to_csv(output_path, index=False)
             logger.info(f"Combined Sorted Report exported to: {output_path}")
             return output_path
@@ -240,6 +352,7 @@ class FabricBillAnalyzer:
             logger.error(f"Error exporting CSV: {str(e)}")
             return None
     
+    @instrumented
     def get_top_costs(self, limit: int = 10) -> pd.DataFrame:
         """Get top cost items."""
         if self.df is None:
@@ -247,30 +360,209 @@ class FabricBillAnalyzer:
         
         return self.df.nlargest(limit, 'Cost')[['MeterCategory', 'ConsumedService', 'ResourceName', 'Cost']]
     
+    def get_time_series(self) -> Optional[CostTimeSeries]:
+        """
+        Return the daily cost grids over the bill's date column, building them on first use.
+        
+        Returns None when no Date/UsageDate/BillingDate column was parsed.
+        """
+        if self._time_series is None and self.df is not None:
+            date_column = find_date_column(self.df)
+            if date_column is None:
+                return None
+            with self._build_lock:
+                if self._time_series is None:
+                    with stage('FabricBillAnalyzer.build_time_series', self):
+                        self._time_series = CostTimeSeries(self.df, date_column)
+        return self._time_series
+    
+    @instrumented
+    def analyze_time_series(self, dimension: str = 'service', freq: str = 'daily',
+                            top_n: Optional[int] = 10) -> pd.DataFrame:
+        """
+        Cost per day, week or month for each service, category or resource.
+        
+        Args:
+            dimension (str): 'service', 'category' or 'resource'
+            freq (str): 'daily', 'weekly' or 'monthly'
+            top_n (int): Number of highest-cost values kept; the rest are summed as "Other"
+            
+        Returns:
+            pd.DataFrame: One row per period, one column per value
+        """
+        time_series = self.get_time_series()
+        if time_series is None:
+            logger.error("No date column available for time-series analysis")
+            return pd.DataFrame()
+        
+        return time_series.by(dimension, freq, top_n)
+    
+    def get_query_store(self) -> Optional[QueryStore]:
+        """
+        Return the in-memory SQL store over this bill.
+        
+        Rows and aggregate cells are copied into SQLite the first time a
+        query is run after a load.
+        """
+        if self._query_store is None and self.has_data():
+            with self._build_lock:
+                if self._query_store is None:
+                    with stage('FabricBillAnalyzer.build_query_store', self):
+                        self._query_store = QueryStore(self.df, self.get_cube())
+        return self._query_store
+    
+    @instrumented
+    def run_query(self, sql: str, limit: int = DEFAULT_ROW_LIMIT, timeout: float = DEFAULT_TIMEOUT) -> Dict:
+        """
+        Run a read-only SQL query against the bill.
+        
+        Tables are `bill` (one row per record, when rows are kept) and
+        `cells` (cost sum/count/min/max per category, service and resource).
+        
+        Args:
+            sql (str): A single SELECT statement
+            limit (int): Maximum rows returned
+            timeout (float): Seconds before the query is interrupted
+            
+        Returns:
+            dict: columns, rows, row_count, truncated and seconds
+            
+        Raises:
+            QueryError: If no data is loaded or the query is rejected, fails or times out
+        """
+        store = self.get_query_store()
+        if store is None:
+            raise QueryError("No data loaded")
+        return store.query(sql, limit, timeout)
+    
+    @instrumented
+    def detect_anomalies(self, window: int = DEFAULT_WINDOW, threshold: float = DEFAULT_THRESHOLD,
+                         method: str = 'zscore', min_cost: float = DEFAULT_MIN_COST) -> pd.DataFrame:
+        """
+        Flag resource-days whose cost spikes above the resource's own recent history.
+        
+        Each ResourceName's daily cost is compared with the preceding `window`
+        days (rolling mean/std for 'zscore', median/MAD for 'mad'), for all
+        resources at once.
+        
+        Args:
+            window (int): Days of history forming each baseline
+            threshold (float): Minimum score to flag
+            method (str): 'zscore' or 'mad'
+            min_cost (float): Minimum increase over the baseline to flag
+            
+        Returns:
+            pd.DataFrame: Flagged resource-days, highest score first (memoized
+                for the default parameters until the next load)
+        """
+        # The dashboard asks for the default scan on every view
+        default_params = (window, threshold, method, min_cost) == (
+            DEFAULT_WINDOW, DEFAULT_THRESHOLD, 'zscore', DEFAULT_MIN_COST)
+        if default_params and self._anomalies is not None:
+            return self._anomalies
+        
+        time_series = self.get_time_series()
+        if time_series is None or 'resource' not in time_series.dimensions:
+            # Expected for bills without a usage date and for aggregate-only analyzers
+            logger.debug("No date column available for anomaly detection")
+            return pd.DataFrame()
+        
+        resources = time_series.dimensions['resource']
+        codes = np.arange(len(resources.values))
+        days, columns, cost, baseline, score = find_anomalies(
+            resources.daily_matrix(codes), window, threshold, method, min_cost)
+        
+        anomalies = pd.DataFrame({
+            'Date': time_series.days[days],
+            'ResourceName': resources.values[codes[columns]].astype(str),
+            'Cost': cost.round(2),
+            'Baseline': baseline.round(2),
+            'Increase': (cost - baseline).round(2),
+            'Score': score.round(2)
+        })
+        
+        # Service and category of each flagged resource
+        context = self.get_cube().resource_report()[['ResourceName', 'Service', 'Category']]
+        context = context.astype({'ResourceName': str})
+        anomalies = anomalies.merge(context, on='ResourceName', how='left')
+        if default_params:
+            self._anomalies = anomalies
+        return anomalies
+    
+    def get_search_index(self) -> Optional[SearchIndex]:
+        """Return the substring index over the key columns, building it on first use."""
+        if self._search_index is None and self.df is not None:
+            with self._build_lock:
+                if self._search_index is None:
+                    with stage('FabricBillAnalyzer.build_search_index', self):
+                        self._search_index = SearchIndex(self.df)
+        return self._search_index
+    
+    @instrumented
     def search_resources(self, search_term: str) -> pd.DataFrame:
         """Search for resources containing the search term."""
         if self.df is None:
             return pd.DataFrame()
         
-        mask = (
-            self.df['ResourceName'].str.contains(search_term, case=False, na=False) |
-            self.df['ConsumedService'].str.contains(search_term, case=False, na=False) |
-            self.df['MeterCategory'].str.contains(search_term, case=False, na=False)
-        )
+        rows = self.get_search_index().search_any(search_term)
         
-        return self.df[mask][['MeterCategory', 'ConsumedService', 'ResourceName', 'Cost']]
+        return self.df.iloc[rows][['MeterCategory', 'ConsumedService', 'ResourceName', 'Cost']]
     
-    def export_to_excel(self, output_path: str = None) -> str:
+    def _analysis_sheets(self, progress: Callable[[float, str], None]) -> List[Tuple[str, pd.DataFrame]]:
+        """Build the (sheet name, DataFrame) pairs of the Excel export, excluding Raw_Data."""
+        # Summary sheet
+        progress(0.0, 'Summary')
+        stats = self.get_basic_stats()
+        summary_data = {
+            'Metric': ['Total Records', 'Total Cost', 'Average Cost', 'Unique Services', 'Unique Categories', 'Unique Resources'],
+            'Value': [
+                stats['total_records'],
+                f"${stats['total_cost']:,.2f}",
+                f"${stats['avg_cost']:,.2f}",
+                stats['unique_services'],
+                stats['unique_categories'],
+                stats['unique_resources']
+            ]
+        }
+        sheets = [('Summary', pd.DataFrame(summary_data))]
+        
+        # Analysis sheets
+        progress(0.05, 'By_Service')
+        sheets.append(('By_Service', self.analyze_by_service()))
+        progress(0.1, 'By_Category')
+        sheets.append(('By_Category', self.analyze_by_category()))
+        progress(0.15, 'By_Resource')
+        sheets.append(('By_Resource', self.analyze_by_resource()))
+        
+        # NEW: Combined Sorted Report sheet
+        progress(0.25, 'Combined_Sorted')
+        sheets.append(('Combined_Sorted', self.generate_combined_sorted_report()))
+        
+        # Top costs
+        progress(0.35, 'Top_Costs')
+        sheets.append(('Top_Costs', self.get_top_costs(20)))
+        return sheets
+    
+    @instrumented
+    def export_to_excel(self, output_path: str = None,
+                        progress_callback: Optional[Callable[[float, str], None]] = None,
+                        streaming: bool = True) -> str:
         """
         Export comprehensive analysis to Excel file including the new Combined Sorted Report.
         
         Args:
             output_path (str): Path for the Excel file
+            progress_callback (callable): Optional callback(fraction, stage) reporting progress
+            streaming (bool): Write rows incrementally through a write-only workbook, splitting
+                Raw_Data over numbered sheets past Excel's row limit. False builds the whole
+                workbook in memory with pandas' ExcelWriter.
             
         Returns:
             str: Path to the exported Excel file
         """
-        if self.df is None:
+        progress = progress_callback or (lambda fraction, stage: None)
+        
+        if not self.has_data():
             logger.error("No data to export")
             return None
         
@@ -284,35 +576,22 @@ class FabricBillAnalyzer:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
         try:
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                # Summary sheet
-                summary_data = {
-                    'Metric': ['Total Records', 'Total Cost', 'Average Cost', 'Unique Services', 'Unique Categories', 'Unique Resources'],
-                    'Value': [
-                        len(self.df),
-                        f"${self.df['Cost'].sum():,.2f}",
-                        f"${self.df['Cost'].mean():,.2f}",
-                        self.df['ConsumedService'].nunique(),
-                        self.df['MeterCategory'].nunique(),
-                        self.df['ResourceName'].nunique()
-                    ]
-                }
-                pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Analysis sheets
-                self.analyze_by_service().to_excel(writer, sheet_name='By_Service', index=False)
-                self.analyze_by_category().to_excel(writer, sheet_name='By_Category', index=False)
-                self.analyze_by_resource().to_excel(writer, sheet_name='By_Resource', index=False)
-                
-                # NEW: Combined Sorted Report sheet
-                combined_report = self.generate_combined_sorted_report()
-                combined_report.to_excel(writer, sheet_name='Combined_Sorted', index=False)
-                
-                # Top costs
-                self.get_top_costs(20).to_excel(writer, sheet_name='Top_Costs', index=False)
-                
-                # Raw data
-                self.df.to_excel(writer, sheet_name='Raw_Data', index=False)
+            sheets = self._analysis_sheets(progress)
+            
+            # Raw data (not retained in streaming mode)
+            if self.df is not None:
+                sheets.append(('Raw_Data', self.df))
+            
+            if streaming:
+                progress(0.4, 'Writing sheets')
+                write_workbook(output_path, sheets,
+                               lambda written, total: progress(0.4 + 0.55 * written / total, 'Writing sheets'))
+            else:
+                with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+                    for i, (sheet_name, frame) in enumerate(sheets):
+                        progress(0.4 + 0.5 * i / len(sheets), sheet_name)
+                        frame.to_excel(writer, sheet_name=sheet_name, index=False)
+                    progress(0.9, 'Saving workbook')
             
             logger.info(f"Analysis exported to: {output_path}")
             return output_path
@@ -321,9 +600,10 @@ class FabricBillAnalyzer:
             logger.error(f"Error exporting to Excel: {str(e)}")
             return None
     
+    @instrumented
     def generate_report_summary(self) -> str:
         """Generate a text summary of the analysis including new Combined Sorted Report info."""
-        if self.df is None:
+        if not self.has_data():
             return "No data loaded."
         
         stats = self.get_basic_stats()
@@ -0,0 +1,122 @@
+"""
+Cost anomaly detection for Microsoft Fabric bills
+Scores every resource's daily cost against its own trailing window, for all
+resources at once
+"""
+
+from typing import Tuple
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 14
+DEFAULT_THRESHOLD = 3.5
+
+# Smallest cost increase (and smallest spread) worth flagging, in currency units
+DEFAULT_MIN_COST = 1.0
+
+METHODS = ('zscore', 'mad')
+
+# Scales MAD to the standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+
+# Resources scored per batch by the MAD method (bounds the sliding-window copy)
+MAD_BATCH_COLUMNS = 8192
+
+
+def _rolling_mean_std(daily: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and standard deviation of the `window` days before each day, from cumulative sums."""
+    zeros = np.zeros((1, daily.shape[1]))
+    csum = np.vstack([zeros, np.cumsum(daily, axis=0)])
+    csum_sq = np.vstack([zeros, np.cumsum(daily * daily, axis=0)])
+
+    # Window for day t is rows [t - window, t); scored days start at t = window
+    total = csum[window:-1] - csum[:-window - 1]
+    total_sq = csum_sq[window:-1] - csum_sq[:-window - 1]
+    mean = total / window
+    variance = np.maximum(total_sq / window - mean * mean, 0.0)
+    return mean, np.sqrt(variance)
+
+
+def _sorted_median(values: np.ndarray) -> np.ndarray:
+    """Median along the last axis of an array already sorted along it."""
+    size = values.shape[-1]
+    middle = size // 2
+    if size % 2:
+        return values[..., middle]
+    return (values[..., middle - 1] + values[..., middle]) / 2
+
+
+def _rolling_median_mad(daily: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Median and scaled median absolute deviation of the `window` days before each day."""
+    n_days, n_columns = daily.shape
+    median = np.empty((n_days - window, n_columns))
+    mad = np.empty((n_days - window, n_columns))
+
+    for start in range(0, n_columns, MAD_BATCH_COLUMNS):
+        # Resources as rows so every window is contiguous in memory
+        block = np.ascontiguousarray(daily[:-1, start:start + MAD_BATCH_COLUMNS].T)
+        windows = np.sort(sliding_window_view(block, window, axis=1), axis=-1)
+        block_median = _sorted_median(windows)
+        deviations = np.sort(np.abs(windows - block_median[..., None]), axis=-1)
+        median[:, start:start + MAD_BATCH_COLUMNS] = block_median.T
+        mad[:, start:start + MAD_BATCH_COLUMNS] = MAD_SCALE * _sorted_median(deviations).T
+
+    return median, mad
+
+
+def score_daily_costs(daily: np.ndarray, window: int = DEFAULT_WINDOW, method: str = 'zscore',
+                      min_cost: float = DEFAULT_MIN_COST) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score each day's cost against the trailing window of the same column.
+
+    Args:
+        daily (np.ndarray): days x resources cost matrix (days in order, missing days as 0)
+        window (int): Number of preceding days forming the baseline
+        method (str): 'zscore' (rolling mean/std) or 'mad' (rolling median/MAD)
+        min_cost (float): Floor for the spread, so flat or brand-new resources
+            get finite scores and cent-level changes are not amplified
+
+    Returns:
+        tuple: (scores, baselines) for days window..n_days-1, each (n_days - window) x resources
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+    if daily.shape[0] <= window:
+        empty = np.empty((0, daily.shape[1]))
+        return empty, empty
+
+    if method == 'zscore':
+        baseline, spread = _rolling_mean_std(daily, window)
+    else:
+        baseline, spread = _rolling_median_mad(daily, window)
+
+    scores = (daily[window:] - baseline) / np.maximum(spread, min_cost)
+    return scores, baseline
+
+
+def find_anomalies(daily: np.ndarray, window: int = DEFAULT_WINDOW, threshold: float = DEFAULT_THRESHOLD,
+                   method: str = 'zscore', min_cost: float = DEFAULT_MIN_COST) -> Tuple[np.ndarray, ...]:
+    """
+    Locate cost spikes in a days x resources matrix.
+
+    A day is flagged when its score is at least `threshold` and its cost
+    exceeds the baseline by at least `min_cost`. Only increases are flagged.
+
+    Returns:
+        tuple: (day index, resource column, cost, baseline, score) arrays, highest score first
+    """
+    scores, baseline = score_daily_costs(daily, window, method, min_cost)
+    cost = daily[window:]
+
+    flagged = (scores >= threshold) & (cost - baseline >= min_cost)
+    days, columns = np.nonzero(flagged)
+    order = np.argsort(-scores[days, columns], kind='stable')
+    days, columns = days[order], columns[order]
+
+    logger.info(f"Anomaly scan ({method}, {window}-day window): {len(days)} flagged of "
+                f"{scores.size} resource-days")
+    return days + window, columns, cost[days, columns], baseline[days, columns], scores[days, columns]
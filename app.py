@@ -3,13 +3,29 @@ Semanticise Inc. Microsoft Azure & Fabric Bill Analyzer - Enhanced Flask Web App
 Web interface with Combined Sorted Report feature
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, send_from_directory, jsonify, Response, g
+from flask import before_render_template, template_rendered
 import os
 import pandas as pd
 from werkzeug.utils import secure_filename
+from werkzeug.formparser import parse_form_data
 from analyzer import FabricBillAnalyzer
-from charts import create_charts
+from bill_cache import AnalyzerCache, DEFAULT_MAX_BYTES, file_version
+from charts import ChartCache, chart_payload
+from pagination import parse_page_request, paginate_frame, sort_frame
+from timeseries import FREQUENCIES
+from export_jobs import ExportJobManager, DEFAULT_WORKERS, DONE
+from incremental import IncrementalBillAnalyzer, STATE_SUFFIX, state_path_for
+from upload import UploadSink, find_duplicate, register_upload
+from compressed import CSV_BILL_EXTENSIONS, compression_of, is_csv_bill
+from sidecar import remove_sidecar, write_sidecar
+from query_store import QueryError, DEFAULT_ROW_LIMIT, DEFAULT_TIMEOUT
+import instrumentation
+from instrumentation import stage, start_trace, end_trace, format_trace
+import re
 import tempfile
+import time
+import plotly
 import json
 import logging
 
@@ -18,19 +34,159 @@ app.secret_key = 'fabric_bill_analyzer_secret_key_2024'
 
 # Configuration
 UPLOAD_FOLDER = 'bills'
-ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xlsm', 'xls', 'gz', 'zst', 'zip'}
+# Largest accepted upload; uploads are streamed to disk, so this is not held in memory
+MAX_CONTENT_LENGTH = int(os.environ.get('FBA_MAX_UPLOAD_MB', 1024)) * 1024 * 1024
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['ANALYZER_CACHE_MAX_BYTES'] = int(os.environ.get('FBA_CACHE_MAX_MB', DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+
+app.config['EXPORT_WORKERS'] = int(os.environ.get('FBA_EXPORT_WORKERS', DEFAULT_WORKERS))
+
+# Parsed bills shared across requests, keyed by file path + mtime + size
+analyzer_cache = AnalyzerCache(max_bytes=app.config['ANALYZER_CACHE_MAX_BYTES'])
+
+# Serialized chart specs per file version, served by /api/charts
+chart_cache = ChartCache()
+
+# plotly.js shipped with the plotly package, served locally instead of from a CDN
+PLOTLY_JS_DIR = os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+
+# Excel/CSV exports run in the background; identical in-flight exports are shared
+export_jobs = ExportJobManager(max_workers=app.config['EXPORT_WORKERS'])
 
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs('reports', exist_ok=True)
 
+logger = logging.getLogger(__name__)
+
+@app.before_request
+def _start_request_trace():
+    """Collect the analyzer/chart stages run while handling this request."""
+    if instrumentation.is_enabled():
+        g.trace_token = start_trace()
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def _remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def _end_request_trace(exc):
+    """Log the request's per-stage breakdown and record its duration."""
+    token = g.pop('trace_token', None)
+    if token is None:
+        return
+    trace = end_trace(token)
+    seconds = time.perf_counter() - g.pop('request_start')
+    instrumentation.metrics.record_request(request.endpoint or 'unknown', seconds)
+    if trace:
+        logger.info(f"{request.method} {request.path} {g.get('response_status', 500)} {seconds:.3f}s | {format_trace(trace)}")
+
+@before_render_template.connect_via(app)
+def _start_render_stage(sender, template, context, **extra):
+    if instrumentation.is_enabled():
+        g.render_stage = stage(f"render_template.{template.name}").__enter__()
+
+@template_rendered.connect_via(app)
+def _end_render_stage(sender, template, context, **extra):
+    render_stage = g.pop('render_stage', None)
+    if render_stage is not None:
+        render_stage.__exit__(None, None, None)
+
 def allowed_file(filename):
-    """Check if file has allowed extension."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    """Check if file has allowed extension (.gz/.zst only around a CSV)."""
+    if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in ALLOWED_EXTENSIONS:
+        return False
+    return compression_of(filename) in (None, 'zip') or is_csv_bill(filename)
+
+def _load_analyzer(file_path):
+    """Parse a billing file (or load incremental state) into a new analyzer (cache miss path)."""
+    analyzer = IncrementalBillAnalyzer() if file_path.endswith(STATE_SUFFIX) else FabricBillAnalyzer()
+    if not analyzer.load_data(file_path):
+        return None
+    return analyzer
+
+def get_analyzer(file_path):
+    """
+    Return a loaded analyzer for file_path, reusing the shared cache.
+
+    The returned analyzer is shared between requests and must not be mutated.
+    Returns None if the file cannot be loaded.
+    """
+    return analyzer_cache.get(file_path, _load_analyzer)
+
+def _parse_cost(value):
+    """Convert a cost filter parameter to float, ignoring blank or invalid input."""
+    if value and value.strip():
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+def _parse_filters(args):
+    """Read the /filter query parameters."""
+    return {
+        'category': args.get('category', ''),
+        'service': args.get('service', ''),
+        'resource': args.get('resource', ''),
+        'min_cost': _parse_cost(args.get('min_cost', '')),
+        'max_cost': _parse_cost(args.get('max_cost', ''))
+    }
+
+def _filter_rows(analyzer, filters):
+    """Apply text filters through the search index, then cost filters on the matches."""
+    row_ids = analyzer.get_search_index().filter_rows({
+        'MeterCategory': filters['category'],
+        'ConsumedService': filters['service'],
+        'ResourceName': filters['resource']
+    })
+    filtered_df = analyzer.df if row_ids is None else analyzer.df.iloc[row_ids]
+    
+    if filters['min_cost'] is not None:
+        filtered_df = filtered_df[filtered_df['Cost'] >= filters['min_cost']]
+    
+    if filters['max_cost'] is not None:
+        filtered_df = filtered_df[filtered_df['Cost'] <= filters['max_cost']]
+    
+    return filtered_df
+
+def _result_stats(df):
+    """Summary statistics over a full filter/search result."""
+    return {
+        'total_records': len(df),
+        'total_cost': float(df['Cost'].sum()) if not df.empty else 0.0,
+        'avg_cost': float(df['Cost'].mean()) if not df.empty else 0.0,
+        'unique_services': int(df['ConsumedService'].nunique()) if not df.empty else 0,
+        'unique_categories': int(df['MeterCategory'].nunique()) if not df.empty else 0
+    }
+
+def _paged_response(df, download_name, **extra):
+    """
+    Return one page of df as JSON, or the whole sorted result as CSV.
+
+    Paging is controlled by the offset/limit/sort/cursor query parameters
+    (see pagination.parse_page_request); format=csv downloads every row in
+    the requested sort order instead.
+    """
+    try:
+        page = parse_page_request(request.args)
+        
+        if request.args.get('format') == 'csv':
+            csv_data = sort_frame(df, page['sort']).to_csv(index=False)
+            return Response(csv_data, mimetype='text/csv',
+                            headers={'Content-Disposition': f'attachment; filename={download_name}'})
+        
+        payload = paginate_frame(df, page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    payload.update(extra)
+    return jsonify(payload)
 
 @app.route('/')
 def index():
@@ -39,38 +195,110 @@ def index():
     files = []
     if os.path.exists(UPLOAD_FOLDER):
         for f in os.listdir(UPLOAD_FOLDER):
-            if allowed_file(f):
+            if allowed_file(f) or f.endswith(STATE_SUFFIX):
                 file_path = os.path.join(UPLOAD_FOLDER, f)
                 file_size = os.path.getsize(file_path)
                 files.append({
                     'name': f,
                     'size': f"{file_size / 1024:.1f} KB",
-                    'path': file_path
+                    'path': file_path,
+                    'incremental': f.endswith(STATE_SUFFIX)
                 })
     
-    return render_template('index.html', files=files)
+    return render_template('index.html', files=files,
+                           max_upload_mb=app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024))
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload."""
-    if 'file' not in request.files:
-        flash('No file selected', 'error')
-        return redirect(request.url)
+    """
+    Handle file upload.
+    
+    The upload is streamed to disk while it is hashed and (for CSV bills)
+    parsed, so the analyzer is cached and the columnar sidecar written by
+    the time the request completes. Content identical to an existing upload
+    is not ingested again.
+    """
+    folder = app.config['UPLOAD_FOLDER']
+    sinks = []
+    
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if not allowed_file(filename or '') or not secure_filename(filename):
+            return tempfile.TemporaryFile('wb+')
+        sink = UploadSink(os.path.join(folder, secure_filename(filename)),
+                          parse=is_csv_bill(filename) and compression_of(filename) != 'zip')
+        sinks.append(sink)
+        return sink
     
-    file = request.files['file']
-    if file.filename == '':
+    try:
+        _, _, files = parse_form_data(request.environ, stream_factory=stream_factory,
+                                      max_content_length=app.config['MAX_CONTENT_LENGTH'], silent=False)
+        file = files.get('file')
+        if file is None or file.filename == '':
+            flash('No file selected', 'error')
+            return redirect(url_for('index'))
+        
+        sink = file.stream if isinstance(file.stream, UploadSink) else None
+        if sink is None:
+            flash('Invalid file type. Please upload CSV (optionally .gz, .zst or .zip) or Excel files only.', 'error')
+            return redirect(url_for('index'))
+        
+        digest = sink.finish()
+        filename = os.path.basename(sink.dest_path)
+        duplicate = find_duplicate(folder, digest)
+        if duplicate is not None:
+            sink.discard()
+            flash(f'{file.filename} is identical to the already uploaded {duplicate}', 'info')
+            return redirect(url_for('analyze_file', filename=duplicate))
+        
+        sink.commit()
+        register_upload(folder, filename, digest)
+        analyzer_cache.invalidate(sink.dest_path)
+        chart_cache.invalidate(sink.dest_path)
+        
+        # Parsed while uploading: cache it so /analyze does not parse again
+        if sink.analyzer is not None:
+            write_sidecar(sink.dest_path, sink.analyzer.df)
+            analyzer_cache.get(sink.dest_path, lambda _path: sink.analyzer)
+        
+        flash(f'File {filename} uploaded successfully!', 'success')
+        return redirect(url_for('analyze_file', filename=filename))
+    finally:
+        # Partial files of failed or rejected uploads
+        for sink in sinks:
+            if os.path.exists(sink.part_path):
+                sink.discard()
+
+@app.route('/append/<filename>', methods=['POST'])
+def append_file(filename):
+    """Fold an uploaded daily delta CSV into incremental aggregate state."""
+    state_name = state_path_for(secure_filename(filename))
+    state_path = os.path.join(app.config['UPLOAD_FOLDER'], state_name)
+    
+    file = request.files.get('file')
+    if file is None or file.filename == '':
         flash('No file selected', 'error')
         return redirect(url_for('index'))
     
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        flash(f'File {filename} uploaded successfully!', 'success')
-        return redirect(url_for('analyze_file', filename=filename))
-    else:
-        flash('Invalid file type. Please upload CSV or Excel files only.', 'error')
+    if not is_csv_bill(file.filename):
+        flash('Invalid file type. Delta files must be CSV (optionally .gz, .zst or .zip).', 'error')
         return redirect(url_for('index'))
+    
+    # Save the delta to a temporary file (same suffix, so it is decompressed); only the aggregates are kept
+    suffix = next(ext for ext in CSV_BILL_EXTENSIONS if file.filename.lower().endswith(ext))
+    fd, delta_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        file.save(delta_path)
+        analyzer = IncrementalBillAnalyzer()
+        if not analyzer.append_file(delta_path, state_path, source_name=secure_filename(file.filename)):
+            flash('Error appending file. Please check the file format.', 'error')
+            return redirect(url_for('index'))
+    finally:
+        os.remove(delta_path)
+    
+    analyzer_cache.invalidate(state_path)
+    flash(f'{file.filename} appended to {state_name} ({analyzer.get_cube().total_rows:,} records total)', 'success')
+    return redirect(url_for('analyze_file', filename=state_name))
 
 @app.route('/analyze/<filename>')
 def analyze_file(filename):
@@ -81,10 +309,10 @@ def analyze_file(filename):
         flash('File not found', 'error')
         return redirect(url_for('index'))
     
-    # Initialize analyzer and load data
-    analyzer = FabricBillAnalyzer()
+    # Reuse the cached analyzer, loading the file on first access
+    analyzer = get_analyzer(file_path)
     
-    if not analyzer.load_data(file_path):
+    if analyzer is None:
         flash('Error loading file. Please check the file format.', 'error')
         return redirect(url_for('index'))
     
@@ -96,19 +324,21 @@ def analyze_file(filename):
         resource_analysis = analyzer.analyze_by_resource()
         combined_report = analyzer.generate_combined_sorted_report()  # NEW FEATURE
         top_costs = analyzer.get_top_costs(10)
-        
-        # NEW: Generate interactive charts
-        charts = create_charts(analyzer)
+        # Needs daily grids; bills without dates and aggregate-only analyzers have none
+        anomalies = analyzer.detect_anomalies() if analyzer.get_time_series() is not None else pd.DataFrame()
         
         # Convert DataFrames to dictionaries for template rendering
         analyses = {
             'basic_stats': basic_stats,
             'services': service_analysis.to_dict('records') if not service_analysis.empty else [],
             'categories': category_analysis.to_dict('records') if not category_analysis.empty else [],
-            'resources': resource_analysis.to_dict('records') if not resource_analysis.empty else [],
-            'combined_report': combined_report.to_dict('records') if not combined_report.empty else [],  # NEW
+            'resources': resource_analysis.head(10).to_dict('records') if not resource_analysis.empty else [],
+            # Combined report rows are fetched page by page from /api/combined_report
+            'combined_report_count': len(combined_report),
             'top_costs': top_costs.to_dict('records') if not top_costs.empty else [],
-            'charts': charts  # NEW: Interactive charts
+            'anomalies': anomalies.head(20).to_dict('records') if not anomalies.empty else [],
+            'anomaly_count': len(anomalies)
+            # Interactive charts are loaded by the page from /api/charts
         }
         
         # Generate summary report
@@ -123,57 +353,90 @@ def analyze_file(filename):
         flash(f'Error during analysis: {str(e)}', 'error')
         return redirect(url_for('index'))
 
-@app.route('/export_excel/<filename>')
-def export_excel(filename):
-    """Export analysis to Excel file."""
+# Export kinds: analyzer method, the name offered for download and the written file's extension
+EXPORT_KINDS = {
+    'excel': ('export_to_excel', 'fabric_analysis_{filename}.xlsx', '.xlsx'),
+    'csv': ('export_combined_sorted_csv', 'BillSort_{filename}', '.csv')
+}
+
+def _submit_export(kind, filename):
+    """Queue an export job for an uploaded file (deduplicated per file version)."""
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    method_name, download_name, extension = EXPORT_KINDS[kind]
+    
+    def run_export(progress, job_id):
+        progress(0.0, 'Loading data')
+        analyzer = get_analyzer(file_path)
+        if analyzer is None:
+            raise RuntimeError('Error loading file for export')
+        # One file per job: concurrent exports never share a timestamped name
+        output_path = os.path.join('reports', f"{kind}_export_{job_id}{extension}")
+        return getattr(analyzer, method_name)(output_path=output_path, progress_callback=progress)
+    
+    return export_jobs.submit(kind, file_path, run_export, download_name.format(filename=filename))
+
+def _job_payload(job):
+    """Job status plus the URLs a client needs to poll and download."""
+    payload = job.to_dict()
+    payload['status_url'] = url_for('api_export_status', job_id=job.id)
+    payload['download_url'] = url_for('download_export', job_id=job.id) if job.status == DONE else None
+    return payload
+
+def _export_accepted(kind, filename):
+    """Queue an export and answer 202 with the job's status URL instead of waiting for it."""
     file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
     if not os.path.exists(file_path):
         flash('File not found', 'error')
         return redirect(url_for('index'))
     
-    analyzer = FabricBillAnalyzer()
-    if not analyzer.load_data(file_path):
-        flash('Error loading file for export', 'error')
-        return redirect(url_for('index'))
-    
-    try:
-        excel_path = analyzer.export_to_excel()
-        if excel_path and os.path.exists(excel_path):
-            return send_file(excel_path, as_attachment=True, download_name=f"fabric_analysis_{filename}.xlsx")
-        else:
-            flash('Error generating Excel export', 'error')
-            return redirect(url_for('analyze_file', filename=filename))
-            
-    except Exception as e:
-        flash(f'Export error: {str(e)}', 'error')
-        return redirect(url_for('analyze_file', filename=filename))
+    job = _submit_export(kind, filename)
+    payload = _job_payload(job)
+    return jsonify(payload), 202, {'Location': payload['status_url']}
+
+@app.route('/export_excel/<filename>')
+def export_excel(filename):
+    """Start an Excel export job (poll status_url, then download it)."""
+    return _export_accepted('excel', filename)
 
 @app.route('/export_combined_csv/<filename>')
 def export_combined_csv(filename):
-    """Export Combined Sorted Report to CSV file - NEW FEATURE."""
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    """Start a Combined Sorted Report CSV export job (poll status_url, then download it)."""
+    return _export_accepted('csv', filename)
+
+@app.route('/api/exports/<filename>', methods=['POST'])
+def api_start_export(filename):
+    """Start a background export (kind=excel or kind=csv) and return its job id."""
+    kind = request.values.get('kind', 'excel')
+    if kind not in EXPORT_KINDS:
+        return jsonify({'error': f'Unknown export kind: {kind}'}), 400
     
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     if not os.path.exists(file_path):
-        flash('File not found', 'error')
-        return redirect(url_for('index'))
-    
-    analyzer = FabricBillAnalyzer()
-    if not analyzer.load_data(file_path):
-        flash('Error loading file for export', 'error')
-        return redirect(url_for('index'))
+        return jsonify({'error': 'File not found'}), 404
     
-    try:
-        csv_path = analyzer.export_combined_sorted_csv()
-        if csv_path and os.path.exists(csv_path):
-            return send_file(csv_path, as_attachment=True, download_name=f"BillSort_{filename}")
-        else:
-            flash('Error generating CSV export', 'error')
-            return redirect(url_for('analyze_file', filename=filename))
-            
-    except Exception as e:
-        flash(f'CSV Export error: {str(e)}', 'error')
-        return redirect(url_for('analyze_file', filename=filename))
+    job = _submit_export(kind, filename)
+    return jsonify(_job_payload(job)), 202
+
+@app.route('/api/exports/status/<job_id>')
+def api_export_status(job_id):
+    """API endpoint for export job status and progress."""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_payload(job))
+
+@app.route('/exports/download/<job_id>')
+def download_export(job_id):
+    """Download the file produced by a finished export job."""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != DONE:
+        return jsonify({'error': f'Job is {job.status}'}), 409
+    if not os.path.exists(job.result_path):
+        return jsonify({'error': 'Export file no longer exists'}), 410
+    return send_file(job.result_path, as_attachment=True, download_name=job.download_name)
 
 @app.route('/api/stats/<filename>')
 def api_stats(filename):
@@ -183,8 +446,8 @@ def api_stats(filename):
     if not os.path.exists(file_path):
         return jsonify({'error': 'File not found'}), 404
     
-    analyzer = FabricBillAnalyzer()
-    if not analyzer.load_data(file_path):
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
         return jsonify({'error': 'Error loading file'}), 500
     
     return jsonify(analyzer.get_basic_stats())
@@ -197,17 +460,190 @@ def api_combined_report(filename):
     if not os.path.exists(file_path):
         return jsonify({'error': 'File not found'}), 404
     
-    analyzer = FabricBillAnalyzer()
-    if not analyzer.load_data(file_path):
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
         return jsonify({'error': 'Error loading file'}), 500
     
     combined_report = analyzer.generate_combined_sorted_report()
+    return _paged_response(
+        combined_report,
+        f"BillSort_{filename}",
+        total_cost=float(combined_report['Cost'].sum()) if not combined_report.empty else 0
+    )
+
+@app.route('/api/filter/<filename>')
+def api_filter(filename):
+    """API endpoint for paged filter results (same parameters as /filter)."""
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    
+    if not os.path.exists(file_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
+        return jsonify({'error': 'Error loading file'}), 500
+    
+    if analyzer.df is None:
+        return jsonify({'error': 'Row-level filtering is not available for aggregate-only data'}), 400
+    
+    filtered_df = _filter_rows(analyzer, _parse_filters(request.args))
+    return _paged_response(filtered_df, f"filtered_{filename}", stats=_result_stats(filtered_df))
+
+@app.route('/api/search/<filename>')
+def api_search(filename):
+    """API endpoint for paged search results."""
+    search_term = request.args.get('q', '')
+    if not search_term:
+        return jsonify({'error': 'Please provide a search term'}), 400
+    
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    
+    if not os.path.exists(file_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
+        return jsonify({'error': 'Error loading file'}), 500
+    
+    try:
+        search_results = analyzer.search_resources(search_term)
+    except (re.error, ValueError) as e:
+        return jsonify({'error': f'Invalid search term: {str(e)}'}), 400
+    return _paged_response(search_results, f"search_{filename}", stats=_result_stats(search_results))
+
+@app.route('/api/query/<filename>', methods=['GET', 'POST'])
+def api_query(filename):
+    """
+    API endpoint for read-only SQL over a bill.
+
+    Parameters (query string, form or JSON body): sql, limit (rows, default
+    1000, at most 100000) and timeout (seconds, default 5, at most 60).
+    Tables are bill (one row per record) and cells (cost aggregates per
+    category, service and resource); without sql the table schemas are
+    returned.
+    """
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    
+    if not os.path.exists(file_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    params = request.get_json(silent=True) or request.values
+    if not hasattr(params, 'get'):
+        return jsonify({'error': 'JSON body must be an object'}), 400
+    try:
+        limit = int(params.get('limit', DEFAULT_ROW_LIMIT))
+        timeout = float(params.get('timeout', DEFAULT_TIMEOUT))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit and timeout must be numbers'}), 400
+    
+    sql = params.get('sql') or ''
+    if not isinstance(sql, str):
+        return jsonify({'error': 'sql must be a string'}), 400
+    
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
+        return jsonify({'error': 'Error loading file'}), 500
+    
+    if not sql.strip():
+        return jsonify({'tables': analyzer.get_query_store().schema})
+    
+    try:
+        return jsonify(analyzer.run_query(sql, limit, timeout))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/timeseries/<filename>')
+def api_timeseries(filename):
+    """
+    API endpoint for cost over time.
+
+    Query parameters: dimension (service/category/resource, optional), freq
+    (daily/weekly/monthly), top (values kept before "Other"), start and end
+    (inclusive dates for range_total).
+    """
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    
+    if not os.path.exists(file_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
+        return jsonify({'error': 'Error loading file'}), 500
+    
+    time_series = analyzer.get_time_series()
+    if time_series is None:
+        return jsonify({'error': 'No Date, UsageDate or BillingDate column in this file'}), 400
+    
+    dimension = request.args.get('dimension', '')
+    freq = request.args.get('freq', 'daily')
+    start = request.args.get('start') or None
+    end = request.args.get('end') or None
+    
+    if freq not in FREQUENCIES:
+        return jsonify({'error': f"freq must be one of: {', '.join(FREQUENCIES)}"}), 400
+    if dimension and dimension not in time_series.dimensions:
+        return jsonify({'error': f"dimension must be one of: {', '.join(time_series.dimensions)}"}), 400
+    
+    try:
+        top_n = int(request.args.get('top', 10))
+        range_total = time_series.range_total(start, end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if dimension:
+        frame = time_series.by(dimension, freq, top_n)
+    else:
+        frame = time_series.total(freq).to_frame()
+    
+    # Keep the periods that overlap the requested range
+    period_ends = frame.index + pd.tseries.frequencies.to_offset(FREQUENCIES[freq])
+    if start:
+        frame = frame[period_ends > pd.Timestamp(start)]
+    if end:
+        frame = frame[frame.index <= pd.Timestamp(end)]
+    
     return jsonify({
-        'data': combined_report.to_dict('records'),
-        'total_records': len(combined_report),
-        'total_cost': float(combined_report['Cost'].sum()) if not combined_report.empty else 0
+        'date_column': time_series.date_column,
+        'freq': freq,
+        'dimension': dimension or None,
+        # Both are null when the date column has no parseable dates (the series are empty)
+        'first_date': time_series.start.strftime('%Y-%m-%d') if time_series.n_days else None,
+        'last_date': time_series.end.strftime('%Y-%m-%d') if time_series.n_days else None,
+        'periods': [period.strftime('%Y-%m-%d') for period in frame.index],
+        'series': {str(column): frame[column].round(2).tolist() for column in frame.columns},
+        'range_total': round(range_total, 2)
     })
 
+@app.route('/api/charts/<filename>')
+def api_charts(filename):
+    """API endpoint for the dashboard charts as Plotly figure specs, cached per file version."""
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
+        return jsonify({'error': 'File not found or could not be loaded'}), 404
+    
+    try:
+        payload = chart_cache.get(file_version(file_path), lambda: chart_payload(analyzer))
+        return Response(payload, mimetype='application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/vendor/plotly.min.js')
+def plotly_js():
+    """Serve the plotly.js bundle that matches the installed plotly package."""
+    return send_from_directory(PLOTLY_JS_DIR, 'plotly.min.js', max_age=7 * 24 * 3600)
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Stage and request timing histograms in Prometheus text format."""
+    return Response(instrumentation.metrics.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache_stats')
+def api_cache_stats():
+    """API endpoint for analyzer cache hit/miss counters."""
+    return jsonify(analyzer_cache.stats())
+
 @app.route('/filter/<filename>')
 def filter_data(filename):
     """Advanced filtering interface - NEW FEATURE."""
@@ -217,88 +653,37 @@ def filter_data(filename):
         flash('File not found', 'error')
         return redirect(url_for('index'))
     
-    analyzer = FabricBillAnalyzer()
-    if not analyzer.load_data(file_path):
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
         flash('Error loading file', 'error')
         return redirect(url_for('index'))
     
-    # Get filter parameters from request
-    category_filter = request.args.get('category', '')
-    service_filter = request.args.get('service', '')
-    min_cost = request.args.get('min_cost', '')
-    max_cost = request.args.get('max_cost', '')
-    resource_filter = request.args.get('resource', '')
-    
-    # Convert cost filters to float if provided
-    min_cost_value = None
-    max_cost_value = None
-    
-    if min_cost and min_cost.strip():
-        try:
-            min_cost_value = float(min_cost)
-        except ValueError:
-            min_cost_value = None
-    
-    if max_cost and max_cost.strip():
-        try:
-            max_cost_value = float(max_cost)
-        except ValueError:
-            max_cost_value = None
-    
-    # Apply filters
-    filtered_df = analyzer.df.copy()
-    
-    if category_filter:
-        filtered_df = filtered_df[filtered_df['MeterCategory'].str.contains(category_filter, case=False, na=False)]
-    
-    if service_filter:
-        filtered_df = filtered_df[filtered_df['ConsumedService'].str.contains(service_filter, case=False, na=False)]
-    
-    if resource_filter:
-        filtered_df = filtered_df[filtered_df['ResourceName'].str.contains(resource_filter, case=False, na=False)]
-    
-    if min_cost_value is not None:
-        # Ensure Cost column is numeric
-        filtered_df = filtered_df[pd.to_numeric(filtered_df['Cost'], errors='coerce') >= min_cost_value]
+    if analyzer.df is None:
+        flash('Row-level filtering is not available for aggregate-only data', 'error')
+        return redirect(url_for('analyze_file', filename=filename))
     
-    if max_cost_value is not None:
-        # Ensure Cost column is numeric
-        filtered_df = filtered_df[pd.to_numeric(filtered_df['Cost'], errors='coerce') <= max_cost_value]
+    filters = _parse_filters(request.args)
+    filtered_df = _filter_rows(analyzer, filters)
     
     # Get unique values for filter dropdowns (from original data)
     filter_options = {
-        'categories': sorted([cat for cat in analyzer.df['MeterCategory'].unique() if pd.notna(cat)]),
-        'services': sorted([svc for svc in analyzer.df['ConsumedService'].unique() if pd.notna(svc)]),
+        'categories': sorted([cat for cat in analyzer.df['MeterCategory'].cat.categories if pd.notna(cat)]),
+        'services': sorted([svc for svc in analyzer.df['ConsumedService'].cat.categories if pd.notna(svc)]),
         'cost_range': {
             'min': float(analyzer.df['Cost'].min()),
             'max': float(analyzer.df['Cost'].max())
         }
     }
     
-    # Calculate filtered statistics
-    filtered_stats = {
-        'total_records': len(filtered_df),
-        'total_cost': float(filtered_df['Cost'].sum()) if not filtered_df.empty else 0.0,
-        'avg_cost': float(filtered_df['Cost'].mean()) if not filtered_df.empty else 0.0,
-        'unique_services': filtered_df['ConsumedService'].nunique() if not filtered_df.empty else 0,
-        'unique_categories': filtered_df['MeterCategory'].nunique() if not filtered_df.empty else 0
-    }
-    
-    # Convert to records for template
-    filtered_records = filtered_df.to_dict('records') if not filtered_df.empty else []
+    # Statistics cover the full result; rows are fetched page by page from /api/filter
+    filtered_stats = _result_stats(filtered_df)
     
     return render_template('filter.html', 
                           filename=filename,
-                          filtered_data=filtered_records,
                           filtered_stats=filtered_stats,
                           filter_options=filter_options,
-                          applied_filters={
-                              'category': category_filter,
-                              'service': service_filter,
-                              'min_cost': min_cost_value,
-                              'max_cost': max_cost_value,
-                              'resource': resource_filter
-                          })
+                          applied_filters=filters,
+                          columns=list(analyzer.df.columns))
 
 @app.route('/search/<filename>')
 def search_resources(filename):
@@ -315,19 +700,19 @@ def search_resources(filename):
         flash('File not found', 'error')
         return redirect(url_for('index'))
     
-    analyzer = FabricBillAnalyzer()
-    if not analyzer.load_data(file_path):
+    analyzer = get_analyzer(file_path)
+    if analyzer is None:
         flash('Error loading file', 'error')
         return redirect(url_for('index'))
     
     try:
         search_results = analyzer.search_resources(search_term)
-        results = search_results.to_dict('records') if not search_results.empty else []
         
+        # Rows are fetched page by page from /api/search
         return render_template('search_results.html', 
                                filename=filename, 
                                search_term=search_term, 
-                               results=results)
+                               search_stats=_result_stats(search_results))
         
     except Exception as e:
         flash(f'Search error: {str(e)}', 'error')
@@ -341,6 +726,9 @@ def delete_file(filename):
     try:
         if os.path.exists(file_path):
             os.remove(file_path)
+            remove_sidecar(file_path)
+            analyzer_cache.invalidate(file_path)
+            chart_cache.invalidate(file_path)
             flash(f'File {filename} deleted successfully', 'success')
         else:
             flash('File not found', 'error')
@@ -352,18 +740,24 @@ def delete_file(filename):
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error."""
-    flash("File is too large. Maximum size is 16MB.", 'error')
+    flash(f"File is too large. Maximum size is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB.", 'error')
     return redirect(url_for('index')), 413
 
 @app.errorhandler(404)
 def not_found(e):
     """Handle page not found."""
-    return render_template('404.html'), 404
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Not found'}), 404
+    flash('Page not found', 'error')
+    return redirect(url_for('index'))
 
 @app.errorhandler(500)
 def internal_error(e):
     """Handle internal server error."""
-    return render_template('500.html'), 500
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Internal server error'}), 500
+    flash('An unexpected error occurred', 'error')
+    return redirect(url_for('index'))
 
 if __name__ == '__main__':
     print("Starting Semanticise Inc. Microsoft Azure & Fabric Bill Analyzer - Enhanced Version")
@@ -0,0 +1,283 @@
+"""
+Benchmark suite: time and memory-profile every analyzer entry point on
+synthetic bills of increasing size and write the results as JSON
+
+Each entry point runs against a freshly loaded bill with the analyzer's
+memoized aggregates cleared, so it is measured cold, the way the first
+request after an upload sees it. Timing runs and the memory run are
+separate because tracemalloc slows allocation-heavy code down.
+
+Usage:
+    python benchmarks/bench_suite.py [--rows 1000 10000 100000] [--repeat 3]
+    python benchmarks/bench_suite.py --rows 1000000 --skip export_to_excel --compare benchmarks/results/old.json
+    python benchmarks/bench_suite.py --rows 15000000 --repeat 1 --only load_data_pandas load_data_pyarrow
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from analyzer import FabricBillAnalyzer
+from bill_schema import HAS_PYARROW
+from charts import create_charts
+from synthetic import (BillGenerator, DEFAULT_CATEGORIES, DEFAULT_SERVICES, DEFAULT_RESOURCES,
+                       DEFAULT_DAYS, DEFAULT_ZIPF_EXPONENT)
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+DEFAULT_REPEAT = 3
+
+# Slowdown against the baseline reported as a regression by --compare
+REGRESSION_RATIO = 1.2
+
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def reset_memos(analyzer: FabricBillAnalyzer):
+    """Drop the aggregates, search index, time series, SQL store and anomalies built on first use."""
+    analyzer._reset_memos()
+
+
+def entry_points(search_term: str, output_dir: str) -> Dict[str, Callable[[str, FabricBillAnalyzer], object]]:
+    """Benchmarked calls, each taking the bill path and a loaded analyzer."""
+    def load(path, _analyzer):
+        analyzer = FabricBillAnalyzer(use_sidecar=False)
+        if not analyzer.load_data(path):
+            raise RuntimeError(f"Failed to load {path}")
+        return analyzer
+
+    def load_with(engine):
+        def load_engine(path, _analyzer):
+            analyzer = FabricBillAnalyzer(use_sidecar=False, csv_engine=engine)
+            if not analyzer.load_data(path):
+                raise RuntimeError(f"Failed to load {path} with {engine}")
+            return analyzer
+        return load_engine
+
+    def load_sidecar(path, _analyzer):
+        analyzer = FabricBillAnalyzer()
+        if not analyzer.load_data(path):
+            raise RuntimeError(f"Failed to load {path}")
+        return analyzer
+
+    def export_excel(_path, analyzer):
+        output_path = os.path.join(output_dir, 'bench.xlsx')
+        if not analyzer.export_to_excel(output_path):
+            raise RuntimeError("Excel export failed")
+        os.remove(output_path)
+
+    return {
+        'load_data': load,
+        'load_data_pandas': load_with('pandas'),
+        'load_data_pyarrow': load_with('pyarrow'),
+        'load_data_sidecar': load_sidecar,
+        'analyze_by_service': lambda _path, analyzer: analyzer.analyze_by_service(),
+        'analyze_by_category': lambda _path, analyzer: analyzer.analyze_by_category(),
+        'analyze_by_resource': lambda _path, analyzer: analyzer.analyze_by_resource(),
+        'generate_combined_sorted_report': lambda _path, analyzer: analyzer.generate_combined_sorted_report(),
+        'get_top_costs': lambda _path, analyzer: analyzer.get_top_costs(10),
+        'search_resources': lambda _path, analyzer: analyzer.search_resources(search_term),
+        'analyze_time_series': lambda _path, analyzer: analyzer.analyze_time_series(),
+        'detect_anomalies': lambda _path, analyzer: analyzer.detect_anomalies(),
+        'run_query': lambda _path, analyzer: analyzer.run_query(
+            'SELECT ConsumedService, SUM(Cost_Sum) AS Cost FROM cells GROUP BY ConsumedService ORDER BY Cost DESC'),
+        'create_charts': lambda _path, analyzer: create_charts(analyzer),
+        'export_to_excel': export_excel
+    }
+
+
+def check_engines(path: str) -> Optional[str]:
+    """Load the bill with each CSV engine; returns a description of any difference in the cleaned frames."""
+    frames = {}
+    for engine in ('pandas', 'pyarrow'):
+        analyzer = FabricBillAnalyzer(use_sidecar=False, csv_engine=engine)
+        if not analyzer.load_data(path):
+            return f"{engine} failed to load the bill"
+        frames[engine] = analyzer.df
+    try:
+        pd.testing.assert_frame_equal(frames['pandas'], frames['pyarrow'])
+    except AssertionError as e:
+        return str(e)
+    return None
+
+
+def measure(func: Callable, path: str, analyzer: FabricBillAnalyzer, repeat: int) -> Dict:
+    """
+    Time func `repeat` times, then run it once more under tracemalloc.
+
+    Returns:
+        dict: min/median seconds, every timing and peak traced allocation in bytes
+    """
+    timings = []
+    for _ in range(repeat):
+        reset_memos(analyzer)
+        start = time.perf_counter()
+        func(path, analyzer)
+        timings.append(time.perf_counter() - start)
+
+    reset_memos(analyzer)
+    tracemalloc.start()
+    try:
+        func(path, analyzer)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds_min': round(min(timings), 6),
+        'seconds_median': round(statistics.median(timings), 6),
+        'seconds_all': [round(t, 6) for t in timings],
+        'peak_alloc_bytes': peak
+    }
+
+
+def bill_path(rows: int, args) -> str:
+    """Generate the bill for these parameters once and reuse it across runs."""
+    os.makedirs(args.data_dir, exist_ok=True)
+    name = (f"bill_{rows}_c{args.categories}_s{args.services}_r{args.resources}"
+            f"_d{args.days}_z{args.exponent}_seed{args.seed}.csv")
+    path = os.path.join(args.data_dir, name)
+    if not os.path.exists(path):
+        print(f"📝 Generating {rows:,} rows -> {path}")
+        generator = BillGenerator(args.categories, args.services, args.resources,
+                                  args.days, args.exponent, args.seed)
+        generator.write_csv(f"{path}.tmp", rows)
+        os.replace(f"{path}.tmp", path)
+    return path
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results: List[Dict], baseline_path: str):
+    """Print each entry point's time against a previous results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['rows'], r['entry_point']): r for r in baseline['results']}
+
+    print(f"\n📈 COMPARED WITH {baseline_path} (commit {baseline['environment'].get('commit')})")
+    print(f"{'Entry point':<34} {'Rows':>10} {'Before (s)':>11} {'After (s)':>10} {'Ratio':>7}")
+    print(f"{'─'*76}")
+    regressions = 0
+    for result in results:
+        before = previous.get((result['rows'], result['entry_point']))
+        if before is None or 'seconds_min' not in before or 'seconds_min' not in result:
+            continue
+        ratio = result['seconds_min'] / before['seconds_min'] if before['seconds_min'] else float('inf')
+        flag = ' ⚠️' if ratio > REGRESSION_RATIO else ''
+        regressions += bool(flag)
+        print(f"{result['entry_point']:<34} {result['rows']:>10,} {before['seconds_min']:>11.4f} "
+              f"{result['seconds_min']:>10.4f} {ratio:>6.2f}x{flag}")
+    print(f"\n{regressions} entry points more than {REGRESSION_RATIO}x slower")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every analyzer entry point on synthetic bills')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='Bill sizes to run, e.g. 1000 100000 10000000 (default: 10^3 10^4 10^5)')
+    parser.add_argument('--categories', type=int, default=DEFAULT_CATEGORIES, help='Distinct meter categories')
+    parser.add_argument('--services', type=int, default=DEFAULT_SERVICES, help='Distinct consumed services')
+    parser.add_argument('--resources', type=int, default=DEFAULT_RESOURCES, help='Distinct resources')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help='Days in the billing period')
+    parser.add_argument('--exponent', type=float, default=DEFAULT_ZIPF_EXPONENT, help='Zipf exponent')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed runs per entry point')
+    parser.add_argument('--only', nargs='+', metavar='ENTRY', help='Run only these entry points')
+    parser.add_argument('--skip', nargs='+', metavar='ENTRY', default=[], help='Skip these entry points')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Where generated bills are kept between runs')
+    parser.add_argument('--output', help='Results JSON (default: benchmarks/results/bench-<commit>-<time>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Results JSON of an earlier run to compare with')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    env = environment()
+    results = []
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        calls = entry_points(search_term='res-00001', output_dir=output_dir)
+        unknown = (set(args.only or []) | set(args.skip)) - set(calls)
+        if unknown:
+            parser.error(f"unknown entry points: {', '.join(sorted(unknown))}")
+        names = [name for name in calls if (not args.only or name in args.only) and name not in args.skip]
+
+        for rows in args.rows:
+            path = bill_path(rows, args)
+
+            # Sidecar written up front so load_data_sidecar measures a warm reload
+            analyzer = FabricBillAnalyzer()
+            if not analyzer.load_data(path):
+                print(f"❌ Error: Failed to load {path}")
+                return 1
+
+            print(f"\n📊 {rows:,} ROWS ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+            if HAS_PYARROW and any(name.startswith('load_data_p') for name in names):
+                difference = check_engines(path)
+                print("✅ pandas and pyarrow engines give identical frames" if difference is None
+                      else f"⚠️ CSV engines differ: {difference}")
+            print(f"{'Entry point':<34} {'Min (s)':>10} {'Median (s)':>11} {'Peak alloc (MB)':>16}")
+            print(f"{'─'*74}")
+            for name in names:
+                result = {'rows': rows, 'entry_point': name}
+                try:
+                    result.update(measure(calls[name], path, analyzer, args.repeat))
+                    print(f"{name:<34} {result['seconds_min']:>10.4f} {result['seconds_median']:>11.4f} "
+                          f"{result['peak_alloc_bytes'] / 1024 / 1024:>16.1f}")
+                except Exception as e:
+                    result['error'] = str(e)
+                    print(f"{name:<34} ❌ {str(e)}")
+                results.append(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{env['commit'] or 'nogit'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'environment': env,
+            'parameters': {
+                'categories': args.categories, 'services': args.services, 'resources': args.resources,
+                'days': args.days, 'exponent': args.exponent, 'seed': args.seed, 'repeat': args.repeat
+            },
+            'results': results
+        }, f, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Seeded synthetic Microsoft Fabric bill generator for benchmarks
+Produces bills with realistic shape: a category -> service -> resource
+hierarchy, Zipfian resource activity and costs, and a usage date per row
+
+Usage:
+    python benchmarks/synthetic.py bills/synthetic.csv [--rows 1000000] [--resources 50000]
+"""
+
+import argparse
+import os
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CATEGORIES = 30
+DEFAULT_SERVICES = 200
+DEFAULT_RESOURCES = 10_000
+DEFAULT_DAYS = 90
+
+# Zipf exponent for both how often a resource is billed and how expensive it is
+DEFAULT_ZIPF_EXPONENT = 1.1
+
+# Rows generated and written per chunk, so 10^7-row bills fit in memory
+GENERATE_CHUNK_ROWS = 1_000_000
+
+LOCATIONS = ['East US', 'West US', 'Central US', 'West Europe', 'North Europe', 'Southeast Asia']
+
+
+class BillGenerator:
+    """
+    Deterministic bill generator.
+
+    Each resource belongs to one service and each service to one category,
+    as in real exports. Resources are ranked by a Zipf law: the resource of
+    rank k appears in proportion to 1 / k**exponent and has a base cost
+    proportional to the same weight, so a few resources dominate both the
+    row count and the spend. Row costs add log-normal noise to the base
+    cost. The same seed and parameters always give the same bill.
+    """
+
+    def __init__(self, categories: int = DEFAULT_CATEGORIES, services: int = DEFAULT_SERVICES,
+                 resources: int = DEFAULT_RESOURCES, days: int = DEFAULT_DAYS,
+                 exponent: float = DEFAULT_ZIPF_EXPONENT, seed: int = 42):
+        """
+        Build the resource hierarchy.
+
+        Args:
+            categories (int): Distinct MeterCategory values
+            services (int): Distinct ConsumedService values
+            resources (int): Distinct ResourceName values
+            days (int): Length of the billing period
+            exponent (float): Zipf exponent for resource activity and cost
+            seed (int): Random seed
+        """
+        self.days = days
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        weights = 1.0 / np.arange(1, resources + 1) ** exponent
+        self.resource_p = weights / weights.sum()
+        self.base_cost = 500.0 * weights / weights[0] + 0.01
+
+        service_of = rng.integers(0, services, resources)
+        category_of_service = rng.integers(0, categories, services)
+
+        self.resource_names = np.array([f"res-{i:07d}" for i in rng.permutation(resources)], dtype=object)
+        self.service_names = np.array([f"Microsoft.Service{i}" for i in range(services)], dtype=object)[service_of]
+        self.category_names = np.array([f"Category {i}" for i in range(categories)], dtype=object)[
+            category_of_service[service_of]]
+        self.resource_groups = np.array([f"rg-{i % 500}" for i in range(resources)], dtype=object)
+        self.locations = np.array(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), resources)]
+
+    def chunks(self, rows: int, chunk_rows: int = GENERATE_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """Yield the bill's rows chunk_rows at a time."""
+        start_date = np.datetime64('2024-01-01')
+        for index, start in enumerate(range(0, rows, chunk_rows)):
+            size = min(chunk_rows, rows - start)
+            rng = np.random.default_rng([self.seed, index])
+
+            resource = rng.choice(len(self.resource_p), size=size, p=self.resource_p)
+            cost = self.base_cost[resource] * rng.lognormal(0.0, 0.5, size) / 10
+            day = rng.integers(0, self.days, size)
+
+            yield pd.DataFrame({
+                'UsageDate': (start_date + day).astype('datetime64[D]').astype(str),
+                'MeterCategory': self.category_names[resource],
+                'ConsumedService': self.service_names[resource],
+                'ResourceName': self.resource_names[resource],
+                'ResourceGroup': self.resource_groups[resource],
+                'ResourceLocation': self.locations[resource],
+                'Cost': np.round(cost, 4)
+            })
+
+    def frame(self, rows: int) -> pd.DataFrame:
+        """The whole bill as one DataFrame."""
+        return pd.concat(self.chunks(rows), ignore_index=True)
+
+    def write_csv(self, path: str, rows: int) -> str:
+        """
+        Write the bill as CSV, one chunk at a time.
+
+        Returns:
+            str: path
+        """
+        for index, chunk in enumerate(self.chunks(rows)):
+            chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Fabric billing CSV')
+    parser.add_argument('output', help='Path of the CSV to write')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows in the bill')
+    parser.add_argument('--categories', type=int, default=DEFAULT_CATEGORIES, help='Distinct meter categories')
+    parser.add_argument('--services', type=int, default=DEFAULT_SERVICES, help='Distinct consumed services')
+    parser.add_argument('--resources', type=int, default=DEFAULT_RESOURCES, help='Distinct resources')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help='Days in the billing period')
+    parser.add_argument('--exponent', type=float, default=DEFAULT_ZIPF_EXPONENT, help='Zipf exponent')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    generator = BillGenerator(args.categories, args.services, args.resources, args.days, args.exponent, args.seed)
+    generator.write_csv(args.output, args.rows)
+    print(f"✅ Wrote {args.rows:,} rows to {args.output} ({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
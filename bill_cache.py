@@ -0,0 +1,188 @@
+"""
+Process-wide cache of loaded FabricBillAnalyzer instances
+Keeps parsed bills in memory so every Flask route can reuse them
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default memory budget for cached DataFrames (1GB)
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def file_version(file_path: str) -> Optional[Tuple[str, int, int]]:
+    """
+    Build the cache key for a file: absolute path, mtime and size.
+
+    Args:
+        file_path (str): Path to the billing file
+
+    Returns:
+        tuple: (absolute path, mtime in ns, size in bytes) or None if missing
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+
+
+def estimate_analyzer_bytes(analyzer) -> int:
+    """
+    Estimate the memory held by an analyzer.
+
+    Includes the structures it builds lazily after loading (aggregate cube,
+    search index, time-series grids, SQL store), so the estimate grows as
+    requests use the analyzer.
+    """
+    try:
+        if hasattr(analyzer, 'memory_bytes'):
+            return int(analyzer.memory_bytes())
+        if analyzer.df is None:
+            return 0
+        return int(analyzer.df.memory_usage(deep=True).sum())
+    except Exception:
+        return 0
+
+
+class AnalyzerCache:
+    """
+    LRU cache of loaded analyzers keyed by file path + mtime + size.
+
+    Entries are evicted least-recently-used first once the estimated memory
+    of all cached analyzers - rows plus the indexes, grids and SQL stores
+    built from them - exceeds max_bytes. Those structures are built after an
+    analyzer is cached, so sizes are re-measured on every lookup. A file that
+    changes on disk gets a new key, so stale entries are never served.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_path: str, loader: Callable):
+        """
+        Return a loaded analyzer for file_path, loading it on a cache miss.
+
+        Args:
+            file_path (str): Path to the billing file
+            loader (callable): Called with file_path, returns a loaded analyzer or None
+
+        Returns:
+            The cached analyzer, or None if the file is missing or fails to load
+        """
+        key = file_version(file_path)
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Analyzers grow as earlier requests build indexes and stores
+                self._rebalance()
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread parses a given file version; the others wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+
+            analyzer = loader(file_path)
+
+            with self._lock:
+                self._load_locks.pop(key, None)
+                if analyzer is None:
+                    return None
+                self._store(key, analyzer)
+            return analyzer
+
+    def _store(self, key, analyzer):
+        """Insert an analyzer and evict older entries over the memory budget."""
+        # Drop older versions of the same file
+        for old_key in [k for k in self._entries if k[0] == key[0]]:
+            self._remove(old_key)
+
+        size = estimate_analyzer_bytes(analyzer)
+        if size > self.max_bytes:
+            logger.info(f"Not caching {key[0]}: {size:,} bytes exceeds cache budget of {self.max_bytes:,} bytes")
+            return
+
+        self._entries[key] = (analyzer, size)
+        self.current_bytes += size
+        self._rebalance()
+
+    def _rebalance(self):
+        """Re-measure every entry and evict least-recently-used ones over max_bytes (lock must be held)."""
+        for key, (analyzer, size) in list(self._entries.items()):
+            new_size = estimate_analyzer_bytes(analyzer)
+            if new_size != size:
+                self._entries[key] = (analyzer, new_size)
+                self.current_bytes += new_size - size
+
+        while self.current_bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+            logger.info(f"Evicted {oldest_key[0]} from analyzer cache")
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def invalidate(self, file_path: str) -> int:
+        """
+        Drop every cached version of a file.
+
+        Args:
+            file_path (str): Path to the billing file
+
+        Returns:
+            int: Number of entries removed
+        """
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == abs_path]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        """Drop all cached analyzers."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Return cache counters and current memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'files': [os.path.basename(k[0]) for k in self._entries]
+            }
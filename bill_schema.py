@@ -0,0 +1,358 @@
+"""
+CSV dialect sniffing and column projection for Microsoft Fabric bills
+Detects encoding, delimiter and header row from the first few KB of a bill,
+then parses only the columns the analyzer reads, with explicit dtypes, using
+pandas' C parser or PyArrow's multi-threaded reader. Compressed bills are
+parsed from decompressing streams and the parts of zipped exports in parallel
+"""
+
+import codecs
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional
+import logging
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from aggregation import KEY_COLUMNS
+from compressed import compression_of, open_bill, zip_parts
+from timeseries import DATE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = KEY_COLUMNS + ['Cost']
+
+# Bytes read to detect the dialect
+SNIFF_BYTES = 64 * 1024
+
+# Lines (or worksheet rows) searched for the header, so title rows above it are skipped
+HEADER_SCAN_ROWS = 20
+
+DELIMITERS = [',', ';', '\t', '|']
+
+# Registered extra column name that keeps every column of the source
+ALL_COLUMNS = '*'
+
+# Columns parsed from a bill and their dtypes (None: inferred by the parser).
+# Cost is inferred so currency-formatted text still reaches prepare_frame's
+# numeric coercion instead of failing the parse; dates are read as text and
+# converted there too.
+BILL_COLUMNS: Dict[str, Optional[str]] = {
+    'MeterCategory': 'category',
+    'ConsumedService': 'category',
+    'ResourceName': 'category',
+    'Cost': None,
+    **{col: 'str' for col in DATE_COLUMNS},
+    # Shown in the filter and search result tables
+    'ResourceGroup': 'category',
+    'ResourceLocation': 'category',
+    'ResourceType': 'category',
+    'MeterName': 'category'
+}
+
+# Parsing backends; 'auto' picks pyarrow for files of at least PYARROW_MIN_BYTES
+CSV_ENGINES = ('auto', 'pandas', 'pyarrow')
+DEFAULT_CSV_ENGINE = os.environ.get('FBA_CSV_ENGINE', 'auto')
+PYARROW_MIN_BYTES = 16 * 1024 * 1024
+
+# Bytes per block handed to each PyArrow parsing thread
+PYARROW_BLOCK_BYTES = 16 * 1024 * 1024
+
+# Parts of a zipped export parsed at the same time
+ZIP_PART_WORKERS = min(8, os.cpu_count() or 1)
+
+# Extra columns kept on top of BILL_COLUMNS (seeded from FBA_EXTRA_COLUMNS)
+_extra_columns: Dict[str, Optional[str]] = {}
+
+
+def register_column(name: str, dtype: Optional[str] = None):
+    """
+    Keep an extra column when bills are parsed.
+
+    Args:
+        name (str): Column name as it appears in the header, or '*' to keep every column
+        dtype (str): pandas dtype to parse it as (default: inferred)
+    """
+    _extra_columns[name] = dtype
+
+
+def registered_columns() -> List[str]:
+    """Extra columns registered so far."""
+    return list(_extra_columns)
+
+
+def projected_columns() -> Optional[Dict[str, Optional[str]]]:
+    """
+    Columns parsed from bills and their dtypes.
+
+    Returns:
+        dict: Column name -> dtype, or None if every column is kept
+    """
+    if ALL_COLUMNS in _extra_columns:
+        return None
+    return {**BILL_COLUMNS, **_extra_columns}
+
+
+class CsvDialect(NamedTuple):
+    encoding: str
+    sep: str
+    header_row: int
+    columns: List[str]
+
+
+def _detect_encoding(sample: bytes) -> str:
+    """Encoding from the byte order mark, else UTF-8 if the sample decodes, else Windows-1252."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    for encoding in ('utf-8', 'cp1252'):
+        try:
+            # A multi-byte character may be cut off at the end of the sample
+            sample[:sample.rfind(b'\n') + 1 or len(sample)].decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def sniff_sample(sample: bytes) -> CsvDialect:
+    """
+    Detect the dialect of a bill from its first bytes.
+
+    The header is the first line (within HEADER_SCAN_ROWS) that, split on
+    one of the candidate delimiters, names every required column. If no
+    line qualifies, the first line is the header and the delimiter is the
+    more frequent of ';' and ',' in it; validation then reports the
+    missing columns.
+
+    Args:
+        sample (bytes): Start of the file (up to SNIFF_BYTES)
+
+    Returns:
+        CsvDialect: encoding, delimiter, lines before the header and header column names
+    """
+    encoding = _detect_encoding(sample)
+    lines = sample.decode(encoding, errors='ignore').splitlines()[:HEADER_SCAN_ROWS]
+
+    for row_number, line in enumerate(lines):
+        for sep in DELIMITERS:
+            if sep not in line:
+                continue
+            columns = next(csv.reader([line], delimiter=sep))
+            if all(col in columns for col in REQUIRED_COLUMNS):
+                return CsvDialect(encoding, sep, row_number, columns)
+
+    header = lines[0] if lines else ''
+    sep = ';' if header.count(';') > header.count(',') else ','
+    return CsvDialect(encoding, sep, 0, next(csv.reader([header], delimiter=sep), []))
+
+
+def read_sample(stream: BinaryIO) -> bytes:
+    """First SNIFF_BYTES of a stream (decompressing readers may return less per read)."""
+    sample = b''
+    while len(sample) < SNIFF_BYTES:
+        data = stream.read(SNIFF_BYTES - len(sample))
+        if not data:
+            break
+        sample += data
+    return sample
+
+
+def sniff_csv(file_path: str, member: Optional[str] = None) -> CsvDialect:
+    """Detect the dialect of a bill file (or a part of a zipped export) from its first SNIFF_BYTES."""
+    with open_bill(file_path, member) as f:
+        return sniff_sample(read_sample(f))
+
+
+def read_csv_options(dialect: CsvDialect) -> Dict:
+    """
+    pd.read_csv keyword arguments for a sniffed bill.
+
+    Only projected columns present in the header are parsed. When a
+    required column is missing every column is kept, so the validation
+    error lists what the file does contain.
+    """
+    options = {'sep': dialect.sep, 'encoding': dialect.encoding, 'skiprows': dialect.header_row}
+    projection = projected_columns()
+    if projection is None or not all(col in dialect.columns for col in REQUIRED_COLUMNS):
+        options['dtype'] = {col: dtype for col, dtype in BILL_COLUMNS.items()
+                            if dtype is not None and col in dialect.columns}
+        return options
+
+    usecols = [col for col in dialect.columns if col in projection]
+    options['usecols'] = usecols
+    options['dtype'] = {col: projection[col] for col in usecols if projection[col] is not None}
+    return options
+
+
+def choose_engine(file_path: str, engine: Optional[str] = None) -> str:
+    """
+    Resolve the parsing backend for a file.
+
+    Args:
+        file_path (str): Path to the CSV file
+        engine (str): 'auto', 'pandas' or 'pyarrow' (default: FBA_CSV_ENGINE, else 'auto')
+
+    Returns:
+        str: 'pandas' or 'pyarrow'
+    """
+    engine = engine or DEFAULT_CSV_ENGINE
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"CSV engine must be one of: {', '.join(CSV_ENGINES)}")
+    if engine == 'pyarrow' and not HAS_PYARROW:
+        logger.warning("pyarrow is not installed (pip install -r requirements-optional.txt), parsing with pandas")
+        return 'pandas'
+    if engine == 'auto':
+        return 'pyarrow' if HAS_PYARROW and os.path.getsize(file_path) >= PYARROW_MIN_BYTES else 'pandas'
+    return engine
+
+
+def _arrow_type(dtype: str):
+    """Arrow column type parsed for a projection dtype (None: inferred, cast afterwards)."""
+    if dtype == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    if dtype == 'str':
+        return pa.string()
+    return None
+
+
+def _read_csv_pyarrow(source, dialect: CsvDialect, options: Dict) -> pd.DataFrame:
+    """
+    Parse with PyArrow's multi-threaded CSV reader.
+
+    Columns are converted to the same NumPy-backed dtypes the pandas
+    parser produces (dictionary columns become categoricals), so
+    prepare_frame yields an identical cleaned frame.
+    """
+    dtypes = options.get('dtype', {})
+    column_types = {col: _arrow_type(dtype) for col, dtype in dtypes.items() if _arrow_type(dtype) is not None}
+    table = pa_csv.read_csv(
+        source,
+        read_options=pa_csv.ReadOptions(
+            encoding='utf8' if dialect.encoding in ('utf-8', 'utf-8-sig') else dialect.encoding,
+            skip_rows=dialect.header_row,
+            block_size=PYARROW_BLOCK_BYTES,
+            use_threads=True
+        ),
+        parse_options=pa_csv.ParseOptions(delimiter=dialect.sep),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=options.get('usecols'),
+            column_types=column_types,
+            strings_can_be_null=True
+        )
+    )
+    df = table.to_pandas()
+    for col, dtype in dtypes.items():
+        # Dictionaries keep first-seen order; pandas sorts inferred categories
+        if dtype == 'category' and col in df.columns:
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    cast = {col: dtype for col, dtype in dtypes.items() if col not in column_types and col in df.columns}
+    return df.astype(cast) if cast else df
+
+
+def _part_label(file_path: str, member: Optional[str]) -> str:
+    name = os.path.basename(file_path)
+    return f"{name}:{member}" if member else name
+
+
+def _read_part(file_path: str, member: Optional[str], engine: Optional[str]) -> pd.DataFrame:
+    """Parse one CSV (plain, compressed, or one part of a zip archive) into a DataFrame."""
+    dialect = sniff_csv(file_path, member)
+    options = read_csv_options(dialect)
+    engine = choose_engine(file_path, engine)
+    # Plain files are parsed from the path, compressed ones from a decompressing stream
+    streamed = compression_of(file_path) is not None
+    if 'usecols' in options:
+        logger.info(f"Parsing {len(options['usecols'])} of {len(dialect.columns)} columns of "
+                    f"{_part_label(file_path, member)} with {engine} "
+                    f"(sep={dialect.sep!r}, encoding={dialect.encoding})")
+
+    if engine == 'pyarrow':
+        try:
+            if not streamed:
+                return _read_csv_pyarrow(file_path, dialect, options)
+            with open_bill(file_path, member) as f:
+                return _read_csv_pyarrow(f, dialect, options)
+        except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+            # e.g. ragged rows the pandas parser tolerates
+            logger.warning(f"pyarrow could not parse {_part_label(file_path, member)}, "
+                           f"retrying with pandas: {str(e)}")
+    if not streamed:
+        return pd.read_csv(file_path, **options)
+    with open_bill(file_path, member) as f:
+        return pd.read_csv(f, **options)
+
+
+def concat_parts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate the parts of one bill.
+
+    Columns that are categorical in every part are combined with
+    union_categoricals (sorted, as a single parse would give) instead of
+    falling back to object dtype.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    columns = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+    categorical = [col for col in columns
+                   if all(col in frame.columns and isinstance(frame[col].dtype, pd.CategoricalDtype)
+                          for frame in frames)]
+    df = pd.concat([frame.drop(columns=categorical) for frame in frames], ignore_index=True)
+    for col in categorical:
+        df[col] = union_categoricals([frame[col] for frame in frames], sort_categories=True)
+    return df[columns]
+
+
+def read_bill_csv(file_path: str, engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse a bill CSV once, with the sniffed dialect and the column projection.
+
+    .csv.gz and .csv.zst bills are decompressed as they are parsed. The
+    CSV parts of a .zip export are parsed in parallel (each from its own
+    decompressing stream) and concatenated in name order.
+
+    Args:
+        file_path (str): Path to the CSV, compressed CSV or zip archive
+        engine (str): Parsing backend, see choose_engine
+
+    Returns:
+        pd.DataFrame: Raw billing rows
+    """
+    if compression_of(file_path) != 'zip':
+        return _read_part(file_path, None, engine)
+
+    parts = zip_parts(file_path)
+    logger.info(f"Parsing {len(parts)} parts of {os.path.basename(file_path)}")
+    with ThreadPoolExecutor(max_workers=min(ZIP_PART_WORKERS, len(parts))) as executor:
+        frames = list(executor.map(lambda member: _read_part(file_path, member, engine), parts))
+    return concat_parts(frames)
+
+
+def iter_bill_csv(file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield a bill CSV chunksize rows at a time, with the sniffed dialect and projection.
+
+    Compressed bills are decompressed as they are read; the parts of a
+    zip archive follow one another in name order.
+    """
+    members = zip_parts(file_path) if compression_of(file_path) == 'zip' else [None]
+    for member in members:
+        options = read_csv_options(sniff_csv(file_path, member))
+        with open_bill(file_path, member) as f:
+            with pd.read_csv(f, chunksize=chunksize, **options) as reader:
+                yield from reader
+
+
+for _name in os.environ.get('FBA_EXTRA_COLUMNS', '').split(','):
+    if _name.strip():
+        register_column(_name.strip())
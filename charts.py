@@ -1,36 +1,97 @@
 """
 Interactive Charts and Visualizations for Microsoft Fabric Bill Analyzer
-Provides Plotly-based interactive charts for data visualization
+Provides Plotly-based interactive charts as JSON figure specs rendered in the browser
 """
 
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+import numpy as np
 import pandas as pd
 import json
 
+from instrumentation import instrumented, stage
+
+logger = logging.getLogger(__name__)
+
 # Set default template for consistent styling
 pio.templates.default = "plotly_white"
 
+HISTOGRAM_BINS = 30
+
+# Share of records in the first linear bin above which the histogram switches to log-scale bins
+LONG_TAIL_SHARE = 0.5
+
+# Threads building figures on a chart cache miss
+CHART_WORKERS = 4
+
+# Chart payloads kept in memory (one per file version)
+DEFAULT_CHART_CACHE_ENTRIES = 32
+
+def cost_histogram(costs: np.ndarray, bins: int = HISTOGRAM_BINS,
+                   log_bins: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray, bool, int]:
+    """
+    Bin costs with numpy.histogram.
+    
+    Log-scale bins cover only positive costs; zero and negative costs (e.g.
+    credits) are left out and counted separately.
+    
+    Args:
+        costs (np.ndarray): Cost of every record
+        bins (int): Number of bins
+        log_bins (bool): Logarithmically spaced bins; None uses them when more
+            than LONG_TAIL_SHARE of the records fall into the first linear bin
+        
+    Returns:
+        tuple: (bin edges, counts, whether log bins were used, records left out)
+    """
+    costs = costs[np.isfinite(costs)]
+    if len(costs) == 0:
+        return np.array([]), np.array([], dtype=np.int64), False, 0
+    
+    counts, edges = np.histogram(costs, bins=bins)
+    positive = costs[costs > 0]
+    if log_bins is None:
+        log_bins = counts[0] > LONG_TAIL_SHARE * len(costs)
+    if not log_bins or len(positive) == 0:
+        return edges, counts, False, 0
+    
+    low, high = positive.min(), positive.max()
+    edges = np.geomspace(low, high if high > low else low * 10, bins + 1)
+    counts, edges = np.histogram(positive, bins=edges)
+    return edges, counts, True, len(costs) - len(positive)
+
 class FabricChartGenerator:
     def __init__(self, analyzer):
         """Initialize chart generator with analyzer instance."""
         self.analyzer = analyzer
         self.df = analyzer.df
         
-    def generate_cost_by_service_pie(self) -> str:
+    @instrumented
+    def generate_cost_by_service_pie(self) -> Optional[go.Figure]:
         """Generate pie chart for cost distribution by service."""
-        if self.df is None or self.df.empty:
-            return ""
+        cube = self.analyzer.get_cube()
+        if cube is None or cube.cells.empty:
+            return None
             
-        service_data = self.df.groupby('ConsumedService')['Cost'].sum().reset_index()
-        service_data = service_data.sort_values('Cost', ascending=False).head(10)
+        service_data = cube.rollup('ConsumedService')
+        service_data = service_data.sort_values('Total_Cost', ascending=False).head(10)
         
         fig = px.pie(
             service_data, 
-            values='Cost', 
+            values='Total_Cost', 
             names='ConsumedService',
+            labels={'Total_Cost': 'Cost'},
             title='Cost Distribution by Service (Top 10)',
             color_discrete_sequence=px.colors.qualitative.Set3
         )
@@ -42,18 +103,16 @@ class FabricChartGenerator:
             title_x=0.5
         )
         
-        return fig.to_html(include_plotlyjs='cdn', div_id="service_pie_chart")
+        return fig
     
-    def generate_cost_by_category_bar(self) -> str:
+    @instrumented
+    def generate_cost_by_category_bar(self) -> Optional[go.Figure]:
         """Generate bar chart for cost by category."""
-        if self.df is None or self.df.empty:
-            return ""
+        cube = self.analyzer.get_cube()
+        if cube is None or cube.cells.empty:
+            return None
             
-        category_data = self.df.groupby('MeterCategory').agg({
-            'Cost': ['sum', 'count']
-        }).reset_index()
-        
-        category_data.columns = ['MeterCategory', 'Total_Cost', 'Usage_Count']
+        category_data = cube.rollup('MeterCategory')
         category_data = category_data.sort_values('Total_Cost', ascending=True)
         
         fig = go.Figure()
@@ -76,91 +135,110 @@ class FabricChartGenerator:
             title_x=0.5
         )
         
-        return fig.to_html(include_plotlyjs='cdn', div_id="category_bar_chart")
+        return fig
     
-    def generate_top_resources_chart(self) -> str:
-        """Generate horizontal bar chart for top cost resources."""
-        if self.df is None or self.df.empty:
-            return ""
+    @instrumented
+    def generate_top_resources_chart(self, limit: int = 15) -> Optional[go.Figure]:
+        """Generate horizontal bar chart for the resources with the highest total cost."""
+        cube = self.analyzer.get_cube()
+        if cube is None or cube.cells.empty:
+            return None
             
-        top_resources = self.df.nlargest(15, 'Cost')
+        # Per-resource totals from the aggregates, not individual rows
+        top_resources = cube.resource_report().head(limit).iloc[::-1]
         
         fig = go.Figure()
         
         fig.add_trace(go.Bar(
             y=top_resources['ResourceName'],
-            x=top_resources['Cost'],
+            x=top_resources['Total_Cost'],
             orientation='h',
             marker_color='rgb(26, 118, 255)',
-            text=[f'${x:,.2f}' for x in top_resources['Cost']],
+            text=[f'${x:,.2f}' for x in top_resources['Total_Cost']],
             textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Cost: $%{x:,.2f}<br>Service: %{customdata[0]}<br>Category: %{customdata[1]}<extra></extra>',
-            customdata=list(zip(top_resources['ConsumedService'], top_resources['MeterCategory']))
+            hovertemplate='<b>%{y}</b><br>Total cost: $%{x:,.2f}<br>Records: %{customdata[2]:,}'
+                          '<br>Service: %{customdata[0]}<br>Category: %{customdata[1]}<extra></extra>',
+            customdata=list(zip(top_resources['Service'], top_resources['Category'], top_resources['Usage_Count']))
         ))
         
         fig.update_layout(
-            title='Top 15 Resources by Cost',
-            xaxis_title='Cost ($)',
+            title=f'Top {limit} Resources by Total Cost',
+            xaxis_title='Total Cost ($)',
             yaxis_title='Resource Name',
             height=600,
             title_x=0.5
         )
         
-        return fig.to_html(include_plotlyjs='cdn', div_id="top_resources_chart")
+        return fig
     
-    def generate_cost_distribution_histogram(self) -> str:
-        """Generate histogram showing cost distribution."""
+    @instrumented
+    def generate_cost_distribution_histogram(self, bins: int = HISTOGRAM_BINS,
+                                             log_bins: Optional[bool] = None) -> Optional[go.Figure]:
+        """
+        Generate histogram showing cost distribution.
+        
+        Bins are counted on the server so only bin edges and counts reach
+        the browser, whatever the number of rows.
+        
+        Args:
+            bins (int): Number of bins
+            log_bins (bool): Logarithmically spaced bins; None picks them for
+                long-tailed costs (see cost_histogram)
+        """
         if self.df is None or self.df.empty:
-            return ""
+            return None
             
-        fig = px.histogram(
-            self.df, 
-            x='Cost', 
-            nbins=30,
-            title='Cost Distribution Histogram',
-            labels={'Cost': 'Cost ($)', 'count': 'Number of Records'},
-            color_discrete_sequence=['rgb(55, 83, 109)']
-        )
+        edges, counts, log_bins, skipped = cost_histogram(self.df['Cost'].to_numpy(), bins, log_bins)
+        if len(counts) == 0:
+            return None
+        
+        ranges = [f'${lo:,.2f} – ${hi:,.2f}' for lo, hi in zip(edges[:-1], edges[1:])]
+        fig = go.Figure()
+        
+        if log_bins:
+            # Equal-width bars, one per range, on a categorical axis
+            fig.add_trace(go.Bar(
+                x=ranges,
+                y=counts,
+                marker_color='rgb(55, 83, 109)',
+                hovertemplate='%{x}<br>Records: %{y:,}<extra></extra>'
+            ))
+            xaxis_title = 'Cost ($, log-scale bins)'
+        else:
+            fig.add_trace(go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=counts,
+                width=np.diff(edges),
+                customdata=ranges,
+                marker_color='rgb(55, 83, 109)',
+                hovertemplate='%{customdata}<br>Records: %{y:,}<extra></extra>'
+            ))
+            xaxis_title = 'Cost ($)'
+        
+        title = 'Cost Distribution Histogram'
+        if skipped:
+            title += f' ({skipped:,} zero or negative records not shown)'
         
         fig.update_layout(
+            title=title,
+            xaxis_title=xaxis_title,
+            yaxis_title='Number of Records',
+            bargap=0,
             title_x=0.5,
             height=400
         )
         
-        return fig.to_html(include_plotlyjs='cdn', div_id="cost_histogram")
+        return fig
     
-    def generate_service_category_sunburst(self) -> str:
+    @instrumented
+    def generate_service_category_sunburst(self) -> Optional[go.Figure]:
         """Generate sunburst chart showing category -> service -> resource hierarchy."""
-        if self.df is None or self.df.empty:
-            return ""
+        cube = self.analyzer.get_cube()
+        if cube is None or cube.cells.empty:
+            return None
             
-        # Create hierarchical data
-        hierarchy_data = []
-        
-        # Group by category and service
-        for category in self.df['MeterCategory'].unique():
-            cat_data = self.df[self.df['MeterCategory'] == category]
-            cat_cost = cat_data['Cost'].sum()
-            
-            hierarchy_data.append({
-                'ids': category,
-                'labels': category,
-                'parents': '',
-                'values': cat_cost
-            })
-            
-            for service in cat_data['ConsumedService'].unique():
-                service_data = cat_data[cat_data['ConsumedService'] == service]
-                service_cost = service_data['Cost'].sum()
-                
-                hierarchy_data.append({
-                    'ids': f"{category} - {service}",
-                    'labels': service,
-                    'parents': category,
-                    'values': service_cost
-                })
-        
-        df_hierarchy = pd.DataFrame(hierarchy_data)
+        # One node per category, service and top resource, from the grouped aggregates
+        df_hierarchy = cube.hierarchy()
         
         fig = go.Figure(go.Sunburst(
             ids=df_hierarchy['ids'],
@@ -168,6 +246,7 @@ class FabricChartGenerator:
             parents=df_hierarchy['parents'],
             values=df_hierarchy['values'],
             branchvalues="total",
+            hovertemplate='<b>%{label}</b><br>Cost: $%{value:,.2f}<br>%{percentParent:.1%} of %{parent}<extra></extra>'
         ))
         
         fig.update_layout(
@@ -176,19 +255,162 @@ class FabricChartGenerator:
             height=500
         )
         
-        return fig.to_html(include_plotlyjs='cdn', div_id="sunburst_chart")
+        return fig
     
-    def generate_combined_dashboard(self) -> dict:
-        """Generate all charts for the dashboard."""
+    @instrumented
+    def generate_cost_trend_chart(self, dimension: str = 'service', top_n: int = 8) -> Optional[go.Figure]:
+        """Generate stacked area chart of cost over time for the top services/categories/resources."""
+        time_series = self.analyzer.get_time_series()
+        if time_series is None or time_series.n_days == 0:
+            return None
+        
+        # Pick a resolution that keeps the chart readable
+        if time_series.n_days <= 92:
+            freq = 'daily'
+        elif time_series.n_days <= 730:
+            freq = 'weekly'
+        else:
+            freq = 'monthly'
+        
+        trend = time_series.by(dimension, freq, top_n)
+        
+        fig = go.Figure()
+        for column in trend.columns:
+            fig.add_trace(go.Scatter(
+                x=trend.index,
+                y=trend[column],
+                name=column,
+                mode='lines',
+                stackgroup='cost',
+                hovertemplate='%{x|%Y-%m-%d}<br>' + column + ': $%{y:,.2f}<extra></extra>'
+            ))
+        
+        fig.update_layout(
+            title=f'{freq.capitalize()} Cost Trend by {dimension.capitalize()} (Top {top_n})',
+            xaxis_title=time_series.date_column,
+            yaxis_title='Cost ($)',
+            height=500,
+            title_x=0.5
+        )
+        
+        return fig
+    
+    def chart_builders(self) -> Dict[str, Callable[[], Optional[go.Figure]]]:
+        """Figure builder for each dashboard chart, keyed as in the analysis page."""
         return {
-            'service_pie': self.generate_cost_by_service_pie(),
-            'category_bar': self.generate_cost_by_category_bar(),
-            'top_resources': self.generate_top_resources_chart(),
-            'cost_histogram': self.generate_cost_distribution_histogram(),
-            'sunburst': self.generate_service_category_sunburst()
+            'service_pie': self.generate_cost_by_service_pie,
+            'category_bar': self.generate_cost_by_category_bar,
+            'top_resources': self.generate_top_resources_chart,
+            'cost_histogram': self.generate_cost_distribution_histogram,
+            'sunburst': self.generate_service_category_sunburst,
+            'cost_trend': self.generate_cost_trend_chart
         }
+    
+    @instrumented
+    def generate_combined_dashboard(self) -> dict:
+        """
+        Generate all charts for the dashboard as Plotly figure specs.
+        
+        Figures are built in parallel threads. The shared aggregates are
+        built first so the threads only read them.
+        
+        Returns:
+            dict: Chart name -> {'data': [...], 'layout': {...}}, or None for
+            charts without data
+        """
+        self.analyzer.get_cube()
+        self.analyzer.get_time_series()
+        
+        builders = self.chart_builders()
+        with ThreadPoolExecutor(max_workers=CHART_WORKERS) as executor:
+            # Each thread runs in a copy of this context so its stages join the request's trace
+            futures = {name: executor.submit(contextvars.copy_context().run, build)
+                       for name, build in builders.items()}
+            figures = {name: future.result() for name, future in futures.items()}
+        
+        return {name: fig.to_plotly_json() if fig is not None else None
+                for name, fig in figures.items()}
 
 def create_charts(analyzer):
     """Create chart generator instance and return charts."""
     chart_gen = FabricChartGenerator(analyzer)
     return chart_gen.generate_combined_dashboard()
+
+def chart_payload(analyzer) -> str:
+    """
+    Serialize every dashboard chart into one compact JSON document.
+    
+    The styling template embedded in each figure's layout is sent once as
+    "template" instead of once per chart.
+    
+    Returns:
+        str: JSON {"template": {...}, "charts": {name: spec or null}}
+    """
+    charts = create_charts(analyzer)
+    with stage('chart_payload.serialize'):
+        template = None
+        for spec in charts.values():
+            if spec is not None:
+                template = spec['layout'].pop('template', template)
+        
+        return json.dumps({'template': template, 'charts': charts},
+                          cls=PlotlyJSONEncoder, separators=(',', ':'))
+
+class ChartCache:
+    """
+    LRU cache of serialized chart payloads keyed by file version.
+    
+    Keys are bill_cache.file_version tuples, so a changed file gets new
+    charts while an unchanged one is served without rebuilding any figure,
+    even after its analyzer has been evicted.
+    """
+    
+    def __init__(self, max_entries: int = DEFAULT_CHART_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+    
+    def get(self, key, builder: Callable[[], str]) -> str:
+        """
+        Return the payload for key, calling builder() on a miss.
+        
+        Concurrent requests for the same key wait for a single build.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        
+        with build_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key]
+            
+            payload = builder()
+            
+            with self._lock:
+                self._build_locks.pop(key, None)
+                # Drop charts of older versions of the same file
+                for old_key in [k for k in self._entries if k[0] == key[0]]:
+                    del self._entries[old_key]
+                self._entries[key] = payload
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return payload
+    
+    def invalidate(self, file_path: str) -> int:
+        """Drop the payloads of every version of a file; returns the number removed."""
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == abs_path]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+    
+    def clear(self):
+        """Drop all cached payloads."""
+        with self._lock:
+            self._entries.clear()
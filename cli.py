@@ -5,9 +5,71 @@ Command-line interface with Combined Sorted Report feature
 
 import argparse
 import os
+import sys
+import pandas as pd
 from analyzer import FabricBillAnalyzer
+from streaming import StreamingBillAnalyzer, DEFAULT_CHUNKSIZE
+from multibill import MultiBillAnalyzer
+from incremental import IncrementalBillAnalyzer, STATE_SUFFIX, state_path_for
+from anomaly import METHODS, DEFAULT_WINDOW, DEFAULT_THRESHOLD
+from bill_schema import ALL_COLUMNS, CSV_ENGINES, register_column
+from query_store import QueryError, DEFAULT_ROW_LIMIT, DEFAULT_TIMEOUT
+
+def query_main(argv):
+    """cli.py query FILE [SQL]: run read-only SQL against a bill, or list its tables."""
+    parser = argparse.ArgumentParser(prog='cli.py query',
+                                     description='Run a read-only SQL query against a billing file')
+    parser.add_argument('file', help='Billing file, incremental state, or a directory/glob of monthly bills')
+    parser.add_argument('sql', nargs='?', help='SELECT statement over the bill and cells tables (omit to list tables)')
+    parser.add_argument('--limit', type=int, default=DEFAULT_ROW_LIMIT,
+                        help=f'Maximum rows returned (default: {DEFAULT_ROW_LIMIT:,})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Seconds before the query is interrupted (default: {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--format', choices=['table', 'csv'], default='table', help='Output format (default: table)')
+    parser.add_argument('--csv-engine', choices=CSV_ENGINES, default=None, help='CSV parser (default: auto)')
+    args = parser.parse_args(argv)
+    
+    multi_file = os.path.isdir(args.file) or any(ch in args.file for ch in '*?[')
+    if not multi_file and not os.path.exists(args.file):
+        print(f"❌ Error: File not found: {args.file}")
+        return 1
+    
+    if args.file.endswith(STATE_SUFFIX):
+        analyzer = IncrementalBillAnalyzer()
+    elif multi_file:
+        analyzer = MultiBillAnalyzer()
+    else:
+        analyzer = FabricBillAnalyzer(csv_engine=args.csv_engine)
+    if not analyzer.load_data(args.file):
+        print(f"❌ Error: Failed to load data from {args.file}")
+        return 1
+    
+    if not args.sql:
+        for table, columns in analyzer.get_query_store().schema.items():
+            print(f"📋 {table}")
+            for name, sql_type in columns:
+                print(f"   {name:<30} {sql_type}")
+        return 0
+    
+    try:
+        result = analyzer.run_query(args.sql, args.limit, args.timeout)
+    except QueryError as e:
+        print(f"❌ Query failed: {str(e)}")
+        return 1
+    
+    frame = pd.DataFrame(result['rows'], columns=result['columns'])
+    if args.format == 'csv':
+        print(frame.to_csv(index=False), end='')
+        return 0
+    print(frame.to_string(index=False) if not frame.empty else '(no rows)')
+    more = f", truncated at --limit {args.limit:,}" if result['truncated'] else ''
+    print(f"\n✅ {result['row_count']:,} rows in {result['seconds']:.3f}s{more}")
+    return 0
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        return query_main(sys.argv[2:])
+    
     print("="*70)
     print("🚀 SEMANTICISE INC. MICROSOFT AZURE & FABRIC BILL ANALYZER - ENHANCED")
     print("🌐 Visit us at: https://semanticise.com/")
@@ -16,25 +78,71 @@ def main():
     
     parser = argparse.ArgumentParser(description='Analyze Microsoft Fabric billing data')
     parser.add_argument('file', nargs='?', default='bills/sample_fabric_bill.csv', 
-                       help='Path to CSV billing file (default: bills/sample_fabric_bill.csv)')
+                       help='Path to CSV (optionally .gz/.zst/.zip) or Excel billing file, or a directory/glob of monthly bills (default: bills/sample_fabric_bill.csv)')
     parser.add_argument('--excel', action='store_true', help='Export to Excel')
     parser.add_argument('--csv', action='store_true', help='Export Combined Sorted Report to CSV')
     parser.add_argument('--combined', action='store_true', help='Show Combined Sorted Report')
+    parser.add_argument('--stream', action='store_true',
+                       help='Stream the CSV in chunks for bills larger than memory (no Raw_Data sheet in Excel export)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                       help=f'Rows per chunk in --stream mode (default: {DEFAULT_CHUNKSIZE:,})')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes when analyzing several bills (default: number of CPUs)')
+    parser.add_argument('--append-to', metavar='STATE',
+                       help=f'Fold the file into incremental aggregate state STATE (created if missing, {STATE_SUFFIX} suffix added)')
+    parser.add_argument('--anomalies', action='store_true',
+                       help='Flag resources whose daily cost spikes above their recent history')
+    parser.add_argument('--anomaly-method', choices=METHODS, default='zscore',
+                       help='Baseline for --anomalies: rolling mean/std (zscore) or median/MAD (default: zscore)')
+    parser.add_argument('--anomaly-window', type=int, default=DEFAULT_WINDOW,
+                       help=f'Days of history per baseline for --anomalies (default: {DEFAULT_WINDOW})')
+    parser.add_argument('--anomaly-threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help=f'Minimum score flagged by --anomalies (default: {DEFAULT_THRESHOLD})')
+    
+    parser.add_argument('--csv-engine', choices=CSV_ENGINES, default=None,
+                       help='CSV parser: pandas, pyarrow (multi-threaded) or auto by file size (default: FBA_CSV_ENGINE, else auto)')
+    parser.add_argument('--keep-columns', nargs='+', metavar='COLUMN', default=[],
+                       help=f'Extra bill columns to parse and keep ({ALL_COLUMNS} keeps every column)')
     
     args = parser.parse_args()
     
+    for column in args.keep_columns:
+        register_column(column)
+    
+    # A directory or glob selects every matching bill
+    multi_file = os.path.isdir(args.file) or any(ch in args.file for ch in '*?[')
+    
     # Check if file exists
-    if not os.path.exists(args.file):
+    if not multi_file and not os.path.exists(args.file):
         print(f"❌ Error: File not found: {args.file}")
         print(f"💡 Make sure the file exists or use the default sample file")
         return
     
     # Initialize analyzer
-    analyzer = FabricBillAnalyzer()
+    if args.append_to:
+        state_path = state_path_for(args.append_to)
+        analyzer = IncrementalBillAnalyzer(chunksize=args.chunksize)
+        print(f"➕ Appending {args.file} to {state_path}")
+        if not analyzer.append_file(args.file, state_path):
+            print(f"❌ Error: Failed to append {args.file}")
+            print(f"💡 Check that the file has required columns: MeterCategory, ConsumedService, ResourceName, Cost")
+            return
+        args.file = state_path
+    elif args.file.endswith(STATE_SUFFIX):
+        analyzer = IncrementalBillAnalyzer(chunksize=args.chunksize)
+        print(f"📈 Incremental mode: aggregate state")
+    elif multi_file:
+        analyzer = MultiBillAnalyzer(max_workers=args.workers)
+        print(f"🗂️  Multi-file mode: loading bills in parallel")
+    elif args.stream:
+        analyzer = StreamingBillAnalyzer(chunksize=args.chunksize)
+        print(f"🌊 Streaming mode: {args.chunksize:,} rows per chunk")
+    else:
+        analyzer = FabricBillAnalyzer(csv_engine=args.csv_engine)
     
     print(f"📂 Loading data from: {args.file}")
     
-    if not analyzer.load_data(args.file):
+    if not args.append_to and not analyzer.load_data(args.file):
         print(f"❌ Error: Failed to load data from {args.file}")
         print(f"💡 Check that the file has required columns: MeterCategory, ConsumedService, ResourceName, Cost")
         return
@@ -51,6 +159,20 @@ def main():
     print(f"Unique Categories:  {stats['unique_categories']}")
     print(f"Unique Resources:   {stats['unique_resources']}")
     
+    # Delta files folded into incremental state
+    if isinstance(analyzer, IncrementalBillAnalyzer):
+        print(f"\n📈 APPLIED FILES: {len(analyzer.applied)}")
+        print(f"{'─'*50}")
+        for entry in analyzer.applied[-5:]:
+            print(f"{entry['file']:<30} {entry['rows']:>8,} rows  ${entry['cost']:>10.2f}")
+    
+    # Per-file totals in multi-file mode
+    if multi_file:
+        print(f"\n🗂️  COST BY FILE")
+        print(f"{'─'*50}")
+        for _, row in analyzer.file_summary().iterrows():
+            print(f"{row['File']:<30} ${row['Total_Cost']:>10.2f} ({row['Percentage']:4.1f}%)")
+    
     # Show top services
     print(f"\n💰 TOP SERVICES BY COST")
     print(f"{'─'*50}")
@@ -80,6 +202,25 @@ def main():
         else:
             print("No data available for Combined Sorted Report")
     
+    if args.anomalies:
+        print(f"\n🚨 COST ANOMALIES")
+        print(f"   Method: {args.anomaly_method}, {args.anomaly_window}-day window, score ≥ {args.anomaly_threshold}")
+        print(f"{'─'*70}")
+        
+        anomalies = analyzer.detect_anomalies(window=args.anomaly_window, threshold=args.anomaly_threshold,
+                                              method=args.anomaly_method)
+        if not anomalies.empty:
+            print(f"{'Date':<11} {'Resource':<25} {'Cost':>10} {'Baseline':>10} {'Score':>7}")
+            print(f"{'─'*70}")
+            for _, row in anomalies.head(15).iterrows():
+                print(f"{row['Date']:%Y-%m-%d} {row['ResourceName'][:24]:<25} ${row['Cost']:>9.2f} "
+                      f"${row['Baseline']:>9.2f} {row['Score']:>7.1f}")
+            
+            if len(anomalies) > 15:
+                print(f"... and {len(anomalies) - 15} more anomalies")
+        else:
+            print("No anomalies found (requires raw rows with a usage date)")
+    
     # Export options
     exports_done = []
     
@@ -117,4 +258,4 @@ def main():
     print(f"{'='*70}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
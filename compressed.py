@@ -0,0 +1,155 @@
+"""
+Compressed bill exports for Microsoft Fabric bill analysis
+Opens .csv.gz and .csv.zst bills as decompressing streams and lists the CSV
+parts of zipped (partitioned) exports, so nothing is extracted to disk
+"""
+
+import gzip
+import io
+import os
+import zipfile
+from typing import BinaryIO, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Suffix -> compression of single-file exports
+COMPRESSION_SUFFIXES = {
+    '.gz': 'gzip',
+    '.zst': 'zstd'
+}
+ZIP_SUFFIX = '.zip'
+
+# Every suffix of a compressed bill, e.g. for upload checks
+COMPRESSED_SUFFIXES = tuple(COMPRESSION_SUFFIXES) + (ZIP_SUFFIX,)
+
+# Extensions of billing files that may be read compressed
+CSV_BILL_EXTENSIONS = ('.csv',) + tuple(f'.csv{suffix}' for suffix in COMPRESSION_SUFFIXES) + (ZIP_SUFFIX,)
+
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW_ZSTD = pa.Codec.is_available('zstd')
+except ImportError:
+    HAS_PYARROW_ZSTD = False
+
+
+def compression_of(file_path: str) -> Optional[str]:
+    """'gzip', 'zstd' or 'zip' from the file name, None for plain files."""
+    name = file_path.lower()
+    if name.endswith(ZIP_SUFFIX):
+        return 'zip'
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def is_csv_bill(file_path: str) -> bool:
+    """True for .csv, .csv.gz, .csv.zst and .zip (parts of a CSV export) paths."""
+    return file_path.lower().endswith(CSV_BILL_EXTENSIONS)
+
+
+def decompress_stream(stream: BinaryIO, compression: Optional[str]) -> BinaryIO:
+    """
+    Wrap a binary stream so reads return decompressed bytes.
+
+    Works on non-seekable streams (e.g. an upload that is still arriving).
+    Zip archives cannot be read this way: their index is at the end.
+
+    Args:
+        stream: Readable binary stream of compressed data
+        compression (str): 'gzip', 'zstd' or None (returned unchanged)
+    """
+    if compression is None:
+        return stream
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == 'zstd':
+        if HAS_ZSTANDARD:
+            return zstandard.ZstdDecompressor().stream_reader(stream)
+        if HAS_PYARROW_ZSTD:
+            return pa.CompressedInputStream(pa.PythonFile(stream, mode='r'), 'zstd')
+        raise ValueError("Reading .zst bills requires the zstandard package: pip install zstandard "
+                         "(or pip install -r requirements-optional.txt)")
+    raise ValueError(f"Cannot stream-decompress {compression} data")
+
+
+def open_bill(file_path: str, member: Optional[str] = None) -> BinaryIO:
+    """
+    Open a bill for reading as a stream of decompressed bytes.
+
+    Args:
+        file_path (str): Plain, .gz, .zst or .zip file
+        member (str): CSV part inside a zip archive (required for .zip)
+
+    Returns:
+        Binary file object; closing it closes the underlying file
+    """
+    compression = compression_of(file_path)
+    if compression == 'zip':
+        if member is None:
+            raise ValueError(f"{os.path.basename(file_path)} is a zip archive; open one of its parts")
+        archive = zipfile.ZipFile(file_path)
+        try:
+            stream = archive.open(member)
+        except Exception:
+            archive.close()
+            raise
+        # ZipExtFile does not close its archive
+        return _ClosingStream(stream, archive)
+
+    raw = open(file_path, 'rb')
+    try:
+        return decompress_stream(raw, compression) if compression else raw
+    except Exception:
+        raw.close()
+        raise
+
+
+class _ClosingStream(io.BufferedIOBase):
+    """Read-through stream that also closes a second object (the zip archive) when closed."""
+
+    def __init__(self, stream: BinaryIO, owner):
+        self._stream = stream
+        self._owner = owner
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._stream.read1(size)
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            self._owner.close()
+        super().close()
+
+
+def zip_parts(file_path: str) -> List[str]:
+    """
+    CSV parts of a zipped export, in name order.
+
+    Directories and macOS resource forks are skipped.
+
+    Raises:
+        ValueError: If the archive contains no CSV file
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        parts = sorted(
+            info.filename for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.csv')
+            and not info.filename.startswith('__MACOSX/')
+        )
+    if not parts:
+        raise ValueError(f"{os.path.basename(file_path)} contains no CSV files")
+    return parts
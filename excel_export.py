@@ -0,0 +1,127 @@
+"""
+Constant-memory Excel export for Microsoft Fabric bill analysis
+Writes worksheets row by row through openpyxl's write-only mode and splits
+sheets that exceed Excel's row limit
+"""
+
+from typing import Callable, Iterator, List, Optional, Tuple
+import logging
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+logger = logging.getLogger(__name__)
+
+# Rows per worksheet in .xlsx, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+
+# Rows converted to Python values at a time
+DEFAULT_BATCH_ROWS = 50_000
+
+
+def _batches(df: pd.DataFrame, batch_rows: int) -> Iterator[List[list]]:
+    """Yield df as lists of row values, batch_rows at a time (NaN/NaT become empty cells)."""
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows].astype(object)
+        yield batch.where(batch.notna(), None).values.tolist()
+
+
+def sheet_names(title: str, sheet_count: int) -> List[str]:
+    """Raw_Data, Raw_Data_2, Raw_Data_3, ... for a frame split over sheet_count sheets."""
+    return [title if i == 0 else f"{title}_{i + 1}" for i in range(sheet_count)]
+
+
+class StreamingExcelWriter:
+    """
+    Write-only workbook that streams DataFrames into worksheets.
+
+    Rows are appended in batches and flushed to disk by openpyxl as they
+    are written, so memory use does not grow with the number of rows. A
+    frame longer than the sheet limit continues on numbered sheets.
+    """
+
+    def __init__(self, output_path: str, max_rows: int = EXCEL_MAX_ROWS,
+                 batch_rows: int = DEFAULT_BATCH_ROWS):
+        self.output_path = output_path
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.workbook = Workbook(write_only=True)
+        self._header_font = Font(bold=True)
+
+    def _header(self, worksheet, columns) -> list:
+        cells = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=str(column))
+            cell.font = self._header_font
+            cells.append(cell)
+        return cells
+
+    def write_frame(self, title: str, df: pd.DataFrame,
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """
+        Append df as one or more worksheets.
+
+        Args:
+            title (str): Sheet name; overflow sheets get a _2, _3, ... suffix
+            df (pd.DataFrame): Rows to write (the index is not written)
+            progress_callback (callable): Optional callback(rows_written, total_rows)
+
+        Returns:
+            list: Names of the sheets written
+        """
+        rows_per_sheet = self.max_rows - 1
+        sheet_count = max(1, -(-len(df) // rows_per_sheet))
+        names = sheet_names(title, sheet_count)
+        if sheet_count > 1:
+            logger.info(f"{title}: {len(df):,} rows split over {sheet_count} sheets")
+
+        written = 0
+        for index, name in enumerate(names):
+            worksheet = self.workbook.create_sheet(title=name)
+            worksheet.append(self._header(worksheet, df.columns))
+
+            part = df.iloc[index * rows_per_sheet:(index + 1) * rows_per_sheet]
+            for rows in _batches(part, self.batch_rows):
+                for row in rows:
+                    worksheet.append(row)
+                written += len(rows)
+                if progress_callback:
+                    progress_callback(written, len(df))
+
+        return names
+
+    def save(self):
+        """Finish the workbook and write it to output_path."""
+        self.workbook.save(self.output_path)
+
+
+def write_workbook(output_path: str, sheets: List[Tuple[str, pd.DataFrame]],
+                   progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+    """
+    Stream a list of (sheet name, DataFrame) pairs into a new workbook.
+
+    Args:
+        output_path (str): Path of the .xlsx file
+        sheets (list): Sheets in workbook order
+        progress_callback (callable): Optional callback(rows_written, total_rows) across all sheets
+
+    Returns:
+        list: Names of the sheets written, including overflow sheets
+    """
+    writer = StreamingExcelWriter(output_path)
+    total_rows = sum(len(df) for _, df in sheets)
+    done = 0
+    names = []
+
+    for title, df in sheets:
+        def report(written, _total, offset=done):
+            if progress_callback:
+                progress_callback(offset + written, total_rows)
+
+        names.extend(writer.write_frame(title, df, report))
+        done += len(df)
+
+    writer.save()
+    return names
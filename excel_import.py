@@ -0,0 +1,177 @@
+"""
+Excel bill ingestion for Microsoft Fabric bill analysis
+Streams rows from .xlsx workbooks through openpyxl's read-only mode and
+locates the billing sheet and header row automatically
+"""
+
+import os
+from typing import Iterator, List, Optional, Tuple
+import logging
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from bill_schema import REQUIRED_COLUMNS, HEADER_SCAN_ROWS, projected_columns
+from excel_export import sheet_names
+
+logger = logging.getLogger(__name__)
+
+# Workbooks openpyxl can stream; legacy .xls needs the optional xlrd package
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+LEGACY_EXCEL_EXTENSIONS = ('.xls',)
+
+# Rows converted to a DataFrame at a time
+DEFAULT_EXCEL_CHUNK_ROWS = 100_000
+
+try:
+    import xlrd  # noqa: F401
+    HAS_XLRD = True
+except ImportError:
+    HAS_XLRD = False
+
+
+def is_excel_file(file_path: str) -> bool:
+    """True for .xlsx/.xlsm/.xls paths."""
+    return file_path.lower().endswith(EXCEL_EXTENSIONS + LEGACY_EXCEL_EXTENSIONS)
+
+
+def _header_row(worksheet) -> Optional[Tuple[int, List[str]]]:
+    """(1-based row number, column names) of the first row naming every required column."""
+    for row_number, row in enumerate(worksheet.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True), start=1):
+        names = ['' if value is None else str(value).strip() for value in row]
+        if all(col in names for col in REQUIRED_COLUMNS):
+            return row_number, names
+    return None
+
+
+def find_bill_sheet(workbook) -> Optional[Tuple[str, int, List[str]]]:
+    """
+    Pick the worksheet holding the billing rows.
+
+    Among the sheets with a header naming MeterCategory, ConsumedService,
+    ResourceName and Cost, the one with the most rows wins (then the widest
+    header, then the later sheet, since raw data usually follows summaries).
+
+    Returns:
+        tuple: (sheet title, header row number, column names), or None if no sheet qualifies
+    """
+    titles = set(workbook.sheetnames)
+    best = None
+    for index, worksheet in enumerate(workbook.worksheets):
+        # Raw_Data_2, Raw_Data_3, ... are read as part of Raw_Data
+        base, _, number = worksheet.title.rpartition('_')
+        if number.isdigit() and base in titles:
+            continue
+        header = _header_row(worksheet)
+        if header is None:
+            continue
+        # Write-only workbooks (including our own exports) may not record their size
+        rank = (worksheet.max_row or 0, len(header[1]), index)
+        if best is None or rank > best[0]:
+            best = (rank, worksheet.title, header)
+
+    if best is None:
+        return None
+    _, title, (row_number, names) = best
+    return title, row_number, names
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    """Name blank header cells and de-duplicate repeated ones, as read_csv does."""
+    seen = {}
+    result = []
+    for i, name in enumerate(names):
+        name = name or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        result.append(name)
+    return result
+
+
+def iter_excel_chunks(file_path: str, chunk_rows: int = DEFAULT_EXCEL_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield the billing rows of a workbook as DataFrames of up to chunk_rows rows.
+
+    The workbook is opened read-only, so cells are parsed as they are
+    iterated instead of building the whole object graph. If the billing
+    sheet continues on numbered sheets (Raw_Data, Raw_Data_2, ... as
+    written by export_to_excel) those rows follow in order. Empty rows are
+    skipped, and only the projected columns (see bill_schema) are kept.
+
+    Raises:
+        ValueError: If no sheet has the required columns
+    """
+    if file_path.lower().endswith(LEGACY_EXCEL_EXTENSIONS):
+        yield from _iter_legacy_chunks(file_path, chunk_rows)
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        found = find_bill_sheet(workbook)
+        if found is None:
+            raise ValueError(f"No worksheet has the columns {', '.join(REQUIRED_COLUMNS)}")
+        title, header_row, names = found
+        columns = _unique_names(names)
+        # Same column projection as CSV bills
+        projection = projected_columns()
+        keep = [i for i, col in enumerate(columns) if projection is None or col in projection]
+        columns = [columns[i] for i in keep]
+
+        titles = [title]
+        for continuation in sheet_names(title, len(workbook.sheetnames))[1:]:
+            if continuation not in workbook.sheetnames:
+                break
+            titles.append(continuation)
+        logger.info(f"Reading billing rows from sheet(s) {', '.join(titles)} of {file_path}")
+
+        rows = []
+        for index, sheet_title in enumerate(titles):
+            worksheet = workbook[sheet_title]
+            first_row = header_row + 1 if index == 0 else 2
+            for row in worksheet.iter_rows(min_row=first_row, values_only=True):
+                if all(value is None for value in row):
+                    continue
+                rows.append(tuple(row[i] if i < len(row) else None for i in keep))
+                if len(rows) >= chunk_rows:
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+                    rows = []
+        if rows:
+            yield pd.DataFrame.from_records(rows, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _iter_legacy_chunks(file_path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Legacy .xls through pandas/xlrd (read in full; the format cannot be streamed)."""
+    if not HAS_XLRD:
+        raise ValueError("Reading legacy .xls workbooks requires xlrd (pip install xlrd); save as .xlsx instead")
+
+    for title, df in pd.read_excel(file_path, sheet_name=None, engine='xlrd').items():
+        df.columns = [str(col).strip() for col in df.columns]
+        if all(col in df.columns for col in REQUIRED_COLUMNS):
+            logger.info(f"Reading billing rows from sheet {title} of {file_path}")
+            projection = projected_columns()
+            if projection is not None:
+                df = df[[col for col in df.columns if col in projection]]
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+            return
+    raise ValueError(f"No worksheet has the columns {', '.join(REQUIRED_COLUMNS)}")
+
+
+def read_excel_bill(file_path: str) -> pd.DataFrame:
+    """
+    Read the billing sheet of a workbook into one DataFrame.
+
+    Returns:
+        pd.DataFrame: Raw billing rows (empty with the header's columns if there are none)
+    """
+    chunks = list(iter_excel_chunks(file_path))
+    if not chunks:
+        return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    logger.info(f"Read {len(df)} rows from workbook {os.path.basename(file_path)}")
+    return df
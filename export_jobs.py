@@ -0,0 +1,163 @@
+"""
+Background export jobs for the Flask application
+Runs Excel/CSV exports on a local worker pool and tracks their progress
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import logging
+
+from bill_cache import file_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+# Finished jobs (and their status) are forgotten after this many seconds
+JOB_RETENTION_SECONDS = 3600
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    """State of one export: status, progress (0-1) and the resulting file."""
+
+    def __init__(self, kind: str, file_path: str, download_name: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.file_path = file_path
+        self.download_name = download_name
+        self.status = PENDING
+        self.progress = 0.0
+        self.stage = 'Queued'
+        self.result_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def update(self, progress: float, stage: str):
+        """Progress callback handed to the export function."""
+        self.progress = max(0.0, min(float(progress), 1.0))
+        self.stage = stage
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the job has finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'stage': self.stage,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ExportJobManager:
+    """
+    Local worker pool for export jobs.
+
+    Jobs are keyed by (kind, file version); submitting an export while an
+    identical one for the same version of the file is still pending or
+    running returns the existing job instead of starting another one.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ExportJob] = {}
+        self._active: Dict[tuple, str] = {}
+
+    def submit(self, kind: str, file_path: str, export_func: Callable[[Callable, str], Optional[str]],
+               download_name: str) -> ExportJob:
+        """
+        Queue an export, or return the identical export already in flight.
+
+        Args:
+            kind (str): Export type, e.g. 'excel' or 'csv'
+            file_path (str): Source billing file
+            export_func (callable): Called with the job's progress callback and
+                job id (to name a file no other job writes); returns the path
+                of the written file or None on failure
+            download_name (str): File name offered to the browser
+
+        Returns:
+            ExportJob: The new or deduplicated job
+        """
+        key = (kind, file_version(file_path))
+
+        with self._lock:
+            self._prune()
+
+            job_id = self._active.get(key)
+            if job_id is not None:
+                logger.info(f"Reusing {kind} export job {job_id} for {file_path}")
+                return self._jobs[job_id]
+
+            job = ExportJob(kind, file_path, download_name)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+
+        logger.info(f"Queued {kind} export job {job.id} for {file_path}")
+        self._executor.submit(self._run, job, key, export_func)
+        return job
+
+    def _run(self, job: ExportJob, key: tuple, export_func: Callable[[Callable, str], Optional[str]]):
+        job.status = RUNNING
+        job.update(0.0, 'Starting')
+        try:
+            result_path = export_func(job.update, job.id)
+            if result_path:
+                job.result_path = result_path
+                job.update(1.0, 'Finished')
+                job.status = DONE
+            else:
+                job.error = 'Export failed'
+                job.status = FAILED
+        except Exception as e:
+            logger.error(f"Export job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(key) == job.id:
+                    del self._active[key]
+            job._done.set()
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        """Look up a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        """Forget finished jobs older than JOB_RETENTION_SECONDS and delete their files (lock must be held)."""
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.result_path and os.path.exists(job.result_path):
+                try:
+                    os.remove(job.result_path)
+                except OSError as e:
+                    logger.warning(f"Could not remove export {job.result_path}: {str(e)}")
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,244 @@
+"""
+Lightweight stage instrumentation for Microsoft Fabric bill analysis
+Records wall time, peak RSS growth and row counts per analyzer/chart stage,
+groups them per web request and renders aggregates in Prometheus text format
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import logging
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = os.environ.get('FBA_INSTRUMENTATION', '1') != '0'
+
+# Stages recorded during the current request (None outside a request)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('fba_trace', default=None)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    """Turn recording on or off; when off, instrumented calls go straight through."""
+    global _enabled
+    _enabled = enabled
+
+
+def peak_rss_bytes() -> int:
+    """Process peak resident set size so far (0 where unavailable)."""
+    if not HAS_RESOURCE:
+        return 0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _count_rows(owner) -> Optional[int]:
+    """Rows of the bill an analyzer (or a chart generator's analyzer) is working on."""
+    owner = getattr(owner, 'analyzer', owner)
+    df = getattr(owner, 'df', None)
+    if df is not None:
+        return len(df)
+    cube = getattr(owner, '_cube', None)
+    return cube.total_rows if cube is not None else None
+
+
+class _Histogram:
+    """Cumulative histogram with sum and count, as in Prometheus."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide aggregates of stage and request measurements."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds: Dict[str, _Histogram] = {}
+        self.stage_rss_bytes: Dict[str, int] = {}
+        self.stage_rows: Dict[str, int] = {}
+        self.request_seconds: Dict[str, _Histogram] = {}
+
+    def record_stage(self, name: str, seconds: float, rss_delta: int, rows: Optional[int]):
+        with self._lock:
+            self.stage_seconds.setdefault(name, _Histogram()).observe(seconds)
+            self.stage_rss_bytes[name] = self.stage_rss_bytes.get(name, 0) + rss_delta
+            self.stage_rows[name] = self.stage_rows.get(name, 0) + (rows or 0)
+
+    def record_request(self, endpoint: str, seconds: float):
+        with self._lock:
+            self.request_seconds.setdefault(endpoint, _Histogram()).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.stage_seconds.clear()
+            self.stage_rss_bytes.clear()
+            self.stage_rows.clear()
+            self.request_seconds.clear()
+
+    @staticmethod
+    def _histogram_lines(metric: str, label: str, histograms: Dict[str, _Histogram]) -> List[str]:
+        lines = []
+        for key, histogram in sorted(histograms.items()):
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{metric}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{label}="{key}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum{{{label}="{key}"}} {histogram.total:.6f}')
+            lines.append(f'{metric}_count{{{label}="{key}"}} {histogram.count}')
+        return lines
+
+    def prometheus_text(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                '# HELP fba_stage_duration_seconds Wall time of analyzer and chart stages',
+                '# TYPE fba_stage_duration_seconds histogram'
+            ]
+            lines += self._histogram_lines('fba_stage_duration_seconds', 'stage', self.stage_seconds)
+
+            lines += [
+                '# HELP fba_stage_peak_rss_increase_bytes_total Growth of the process peak RSS during each stage',
+                '# TYPE fba_stage_peak_rss_increase_bytes_total counter'
+            ]
+            lines += [f'fba_stage_peak_rss_increase_bytes_total{{stage="{name}"}} {value}'
+                      for name, value in sorted(self.stage_rss_bytes.items())]
+
+            lines += [
+                '# HELP fba_stage_rows_total Billing rows processed by each stage',
+                '# TYPE fba_stage_rows_total counter'
+            ]
+            lines += [f'fba_stage_rows_total{{stage="{name}"}} {value}'
+                      for name, value in sorted(self.stage_rows.items())]
+
+            lines += [
+                '# HELP fba_request_duration_seconds Wall time of web requests by endpoint',
+                '# TYPE fba_request_duration_seconds histogram'
+            ]
+            lines += self._histogram_lines('fba_request_duration_seconds', 'endpoint', self.request_seconds)
+
+            lines += [
+                '# HELP fba_process_peak_rss_bytes Peak resident set size of the process',
+                '# TYPE fba_process_peak_rss_bytes gauge',
+                f'fba_process_peak_rss_bytes {peak_rss_bytes()}'
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+class _Stage:
+    """Context manager measuring one stage."""
+
+    __slots__ = ('name', 'owner', 'rows', '_start', '_rss')
+
+    def __init__(self, name: str, owner=None, rows: Optional[int] = None):
+        self.name = name
+        self.owner = owner
+        self.rows = rows
+
+    def __enter__(self):
+        self._rss = peak_rss_bytes()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        rss_delta = peak_rss_bytes() - self._rss
+        rows = self.rows if self.rows is not None else _count_rows(self.owner)
+
+        metrics.record_stage(self.name, seconds, rss_delta, rows)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((self.name, seconds, rss_delta, rows))
+        return False
+
+
+class _NullStage:
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str, owner=None, rows: Optional[int] = None):
+    """
+    Measure a block of code as a named stage.
+
+    Args:
+        name (str): Stage name, e.g. "FabricBillAnalyzer.read_csv"
+        owner: Analyzer or chart generator whose rows are counted after the block
+        rows (int): Row count to record instead (may also be set on the returned object)
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, owner, rows)
+
+
+def instrumented(func: Callable) -> Callable:
+    """Record every call of an analyzer or chart method as a stage named Class.method."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not _enabled:
+            return func(self, *args, **kwargs)
+        with _Stage(name, self):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+def start_trace():
+    """Begin collecting the stages of the current request; returns a token for end_trace."""
+    return _current_trace.set([])
+
+
+def end_trace(token) -> List[tuple]:
+    """Stop collecting and return the (name, seconds, rss_delta, rows) stages recorded."""
+    trace = _current_trace.get() or []
+    _current_trace.reset(token)
+    return trace
+
+
+def format_trace(trace: List[tuple]) -> str:
+    """One-line summary of a request's stages for the log."""
+    parts = []
+    for name, seconds, rss_delta, rows in trace:
+        part = f"{name} {seconds:.3f}s"
+        if rss_delta:
+            part += f" +{rss_delta / 1024 / 1024:.1f}MB"
+        if rows is not None:
+            part += f" {rows:,} rows"
+        parts.append(part)
+    return '; '.join(parts)
@@ -0,0 +1,207 @@
+"""
+Multi-file analysis for Microsoft Fabric bills
+Loads a directory or glob of monthly exports in parallel and reports over the whole set
+"""
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+import pandas as pd
+
+from aggregation import AggregateCube, KEY_COLUMNS, DEFAULT_TOP_N
+from analyzer import FabricBillAnalyzer
+from compressed import CSV_BILL_EXTENSIONS
+from excel_import import EXCEL_EXTENSIONS
+from instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+BILL_EXTENSIONS = CSV_BILL_EXTENSIONS + EXCEL_EXTENSIONS
+
+# Per-file cost breakdown added to every report
+BREAKDOWN_COLUMN = 'File_Breakdown'
+
+
+def expand_bill_paths(path_or_glob: str) -> List[str]:
+    """
+    Resolve a directory or glob pattern to a sorted list of billing files.
+
+    Args:
+        path_or_glob (str): Directory (all bills inside it) or glob such as "bills/2024-*.csv"
+
+    Returns:
+        list: Matching file paths in name order
+    """
+    if os.path.isdir(path_or_glob):
+        candidates = [os.path.join(path_or_glob, name) for name in os.listdir(path_or_glob)]
+    else:
+        candidates = glob.glob(path_or_glob)
+    return sorted(path for path in candidates
+                  if os.path.isfile(path) and path.lower().endswith(BILL_EXTENSIONS))
+
+
+def load_file_cube(file_path: str, top_n: int = DEFAULT_TOP_N) -> Optional[AggregateCube]:
+    """
+    Load and prepare one bill and reduce it to an aggregate cube.
+
+    Runs in a worker process; only the cube is sent back to the parent.
+    Returns None if the file cannot be loaded.
+    """
+    analyzer = FabricBillAnalyzer()
+    if not analyzer.load_data(file_path):
+        return None
+    return AggregateCube.from_frame(analyzer.df, top_n=top_n)
+
+
+class MultiBillAnalyzer(FabricBillAnalyzer):
+    """
+    Analyzer over a set of billing files, e.g. a year of monthly exports.
+
+    Each file is loaded, prepared and reduced to an AggregateCube in its own
+    worker process; the parent merges the cubes in file-name order. Raw rows
+    are not kept, so as in streaming mode get_top_costs returns the retained
+    top rows, search_resources matches grouped combinations and Excel exports
+    omit the Raw_Data sheet. Every report gains a File_Breakdown column with
+    the cost contributed by each file.
+    """
+
+    def __init__(self, max_workers: int = None, top_n: int = DEFAULT_TOP_N):
+        """
+        Initialize the multi-file analyzer.
+
+        Args:
+            max_workers (int): Worker processes (default: number of CPUs)
+            top_n (int): Number of highest-cost rows kept for get_top_costs
+        """
+        super().__init__()
+        self.max_workers = max_workers
+        self.top_n = top_n
+        self.file_paths: List[str] = []
+        self.file_cubes: Dict[str, AggregateCube] = {}
+        self._file_cube_bytes = 0
+
+    @instrumented
+    def load_data(self, path_or_glob: str) -> bool:
+        """
+        Load every billing file in a directory or matching a glob.
+
+        Args:
+            path_or_glob (str): Directory or glob pattern
+
+        Returns:
+            bool: True if all files loaded, False otherwise
+        """
+        self._reset_memos()
+        self.file_cubes = {}
+        self._file_cube_bytes = 0
+
+        file_paths = expand_bill_paths(path_or_glob)
+        if not file_paths:
+            logger.error(f"No billing files found for: {path_or_glob}")
+            return False
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                cubes = list(executor.map(load_file_cube, file_paths, [self.top_n] * len(file_paths)))
+        except Exception as e:
+            logger.error(f"Error loading billing files: {str(e)}")
+            return False
+
+        failed = [path for path, cube in zip(file_paths, cubes) if cube is None]
+        if failed:
+            logger.error(f"Failed to load: {failed}")
+            return False
+
+        # Merge in file order so first-appearance ordering spans the whole set
+        merged = AggregateCube(top_n=self.top_n)
+        for path, cube in zip(file_paths, cubes):
+            self.file_cubes[os.path.basename(path)] = cube
+            merged = merged.merge(cube.shift_rows(merged.total_rows))
+
+        self._cube = merged
+        self.file_paths = file_paths
+        self.file_path = path_or_glob
+        self._file_cube_bytes = sum(cube.memory_bytes() for cube in self.file_cubes.values())
+        self.analysis_timestamp = datetime.now()
+
+        logger.info(f"Loaded {merged.total_rows} records from {len(file_paths)} files "
+                    f"into {len(merged.cells)} combinations, ${merged.total_cost:,.2f} total cost")
+        return True
+
+    def memory_bytes(self) -> int:
+        """Estimate the memory held by the merged cube, the per-file cubes and derived structures."""
+        return super().memory_bytes() + self._file_cube_bytes
+
+    def file_summary(self) -> pd.DataFrame:
+        """Records and cost contributed by each file."""
+        total_cost = self._cube.total_cost if self._cube is not None else 0
+        summary = pd.DataFrame({
+            'File': list(self.file_cubes),
+            'Records': [cube.total_rows for cube in self.file_cubes.values()],
+            'Total_Cost': [round(cube.total_cost, 2) for cube in self.file_cubes.values()]
+        })
+        summary['Percentage'] = (summary['Total_Cost'] / total_cost * 100).round(2) if total_cost else 0.0
+        return summary
+
+    def file_breakdown(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Cost per file for each combination of the given key columns.
+
+        Returns:
+            pd.DataFrame: One row per key combination, one cost column per file
+        """
+        parts = []
+        for name, cube in self.file_cubes.items():
+            part = cube.cost_by(columns).rename(name)
+            parts.append(part)
+        return pd.concat(parts, axis=1).fillna(0).round(2)
+
+    def _with_breakdown(self, report: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Append the File_Breakdown column ("file: cost; ...") to a report keyed by columns."""
+        if report.empty:
+            return report
+
+        breakdown = self.file_breakdown(columns)
+        labels = pd.Series([
+            '; '.join(f"{name}: {cost:.2f}" for name, cost in row.items() if cost)
+            for row in breakdown.to_dict('records')
+        ], index=breakdown.index, name=BREAKDOWN_COLUMN)
+
+        keys = pd.MultiIndex.from_frame(report[columns]) if len(columns) > 1 else pd.Index(report[columns[0]])
+        report = report.copy()
+        report[BREAKDOWN_COLUMN] = labels.reindex(keys).to_numpy()
+        return report
+
+    def analyze_by_service(self) -> pd.DataFrame:
+        """Costs by consumed service with a per-file breakdown."""
+        return self._with_breakdown(super().analyze_by_service(), ['ConsumedService'])
+
+    def analyze_by_category(self) -> pd.DataFrame:
+        """Costs by meter category with a per-file breakdown."""
+        return self._with_breakdown(super().analyze_by_category(), ['MeterCategory'])
+
+    def analyze_by_resource(self) -> pd.DataFrame:
+        """Costs by resource with a per-file breakdown."""
+        return self._with_breakdown(super().analyze_by_resource(), ['ResourceName'])
+
+    def generate_combined_sorted_report(self) -> pd.DataFrame:
+        """Combined Sorted Report over all files with a per-file breakdown."""
+        return self._with_breakdown(super().generate_combined_sorted_report(), KEY_COLUMNS)
+
+    def get_top_costs(self, limit: int = 10) -> pd.DataFrame:
+        """Get top cost items across all files (at most top_n rows are retained)."""
+        if self._cube is None:
+            return pd.DataFrame()
+        if limit > self.top_n:
+            logger.warning(f"Only the top {self.top_n} rows are retained in multi-file mode")
+        return self._cube.top_costs(limit)
+
+    def search_resources(self, search_term: str) -> pd.DataFrame:
+        """Search grouped combinations containing the search term."""
+        if self._cube is None:
+            return pd.DataFrame()
+        return self._cube.search(search_term)
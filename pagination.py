@@ -0,0 +1,283 @@
+"""
+Server-side pagination for large result sets
+Offset/limit and keyset cursor paging with server-side sorting of DataFrames
+"""
+
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(offset: int, limit: int, sort: str, direction: str,
+                  row: int, values: List) -> str:
+    """
+    Encode paging state as an opaque URL-safe cursor.
+
+    The cursor records the boundary row of the current page (its sort key
+    values and row position) rather than a row count to skip, so the next
+    page is resumed from that row. offset is carried only for display.
+
+    Args:
+        offset (int): Position of the page the cursor leads to
+        limit (int): Page size
+        sort (str): Sort specification
+        direction (str): 'next' (rows after the boundary) or 'prev' (rows before it)
+        row (int): Row position of the boundary row in the unsorted result
+        values (list): The boundary row's sort key values (JSON-safe)
+    """
+    state = json.dumps({'o': offset, 'l': limit, 's': sort, 'd': direction, 'r': row, 'k': values},
+                       separators=(',', ':'))
+    return base64.urlsafe_b64encode(state.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        seek = {'direction': str(state['d']), 'row': int(state['r']), 'values': list(state['k'])}
+        if seek['direction'] not in ('next', 'prev'):
+            raise ValueError(seek['direction'])
+        return {'offset': int(state['o']), 'limit': int(state['l']), 'sort': str(state.get('s', '')),
+                'seek': seek}
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_sort(sort: str) -> List[Tuple[str, bool]]:
+    """
+    Parse a sort specification such as "Cost:desc,ResourceName".
+
+    Returns:
+        list: (column, ascending) pairs
+    """
+    keys = []
+    for part in filter(None, (p.strip() for p in (sort or '').split(','))):
+        column, _, direction = part.partition(':')
+        direction = direction.lower() or 'asc'
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"Invalid sort direction: {direction}")
+        keys.append((column, direction == 'asc'))
+    return keys
+
+
+def parse_page_request(args) -> Dict:
+    """
+    Read offset/limit/sort/cursor query parameters.
+
+    A cursor, when given, replaces the other parameters.
+
+    Args:
+        args: Request query arguments (werkzeug MultiDict or dict)
+
+    Returns:
+        dict: offset, limit and sort specification, plus the seek boundary
+            ('seek') when paging from a cursor
+    """
+    if args.get('cursor'):
+        page = decode_cursor(args['cursor'])
+    else:
+        try:
+            page = {
+                'offset': int(args.get('offset', 0)),
+                'limit': int(args.get('limit', DEFAULT_PAGE_SIZE)),
+                'sort': args.get('sort', '')
+            }
+        except (TypeError, ValueError):
+            raise ValueError('offset and limit must be integers')
+
+    if page['offset'] < 0 or page['limit'] < 1:
+        raise ValueError('offset must be >= 0 and limit must be >= 1')
+    page['limit'] = min(page['limit'], MAX_PAGE_SIZE)
+    parse_sort(page['sort'])
+    return page
+
+
+def _sort_keys(df: pd.DataFrame, sort: str) -> List[Tuple[str, bool]]:
+    """Parse sort and check that every key is a column of df."""
+    keys = parse_sort(sort)
+    unknown = [column for column, _ in keys if column not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown sort column(s): {', '.join(unknown)}")
+    return keys
+
+
+def sort_frame(df: pd.DataFrame, sort: str, needed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Sort a DataFrame by a sort specification.
+
+    Ties keep their original row order, so the order is fully determined by
+    the sort keys plus the row position. When only the first `needed` rows
+    are required and the sort is on a single numeric column, a partial
+    selection (nlargest/nsmallest) is used instead of a full sort, unless
+    fewer than `needed` rows have a value and missing ones (sorted last)
+    would be part of the result.
+    """
+    keys = _sort_keys(df, sort)
+    if not keys:
+        return df
+
+    if needed is not None and len(keys) == 1 and needed < len(df):
+        column, ascending = keys[0]
+        # nlargest/nsmallest drop NaN, which sorts last: only usable when enough rows have a value
+        if pd.api.types.is_numeric_dtype(df[column]) and df[column].count() >= needed:
+            return df.nsmallest(needed, column) if ascending else df.nlargest(needed, column)
+
+    if needed is not None and len(keys) > 1 and needed < len(df):
+        # Only rows whose leading key is among the first values covering `needed` rows can appear
+        column, ascending = keys[0]
+        if pd.api.types.is_numeric_dtype(df[column]):
+            if df[column].count() >= needed:
+                df = df.nsmallest(needed, column, keep='all') if ascending else df.nlargest(needed, column, keep='all')
+        else:
+            counts = df[column].value_counts(sort=False, dropna=False)
+            counts = counts[counts > 0].sort_index(ascending=ascending, na_position='last')
+            cutoff = int(np.searchsorted(counts.to_numpy().cumsum(), needed))
+            if cutoff + 1 < len(counts):
+                df = df[df[column].isin(counts.index[:cutoff + 1])]
+
+    return df.sort_values(
+        by=[column for column, _ in keys],
+        ascending=[ascending for _, ascending in keys],
+        kind='stable'
+    )
+
+
+def page_records(page_df: pd.DataFrame) -> List[Dict]:
+    """Convert a page of rows to JSON-safe records (NaN becomes null)."""
+    page_df = page_df.astype(object)
+    return page_df.where(page_df.notna(), None).to_dict('records')
+
+
+def _json_value(value):
+    """A sort key value as stored in a cursor."""
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _compare(series: pd.Series, value, ascending: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Masks of the rows sorted after value, and of the rows equal to it, in one key column.
+
+    Missing values sort last in either direction, as in sort_values.
+    """
+    missing = series.isna().to_numpy()
+    if value is None:
+        return np.zeros(len(series), dtype=bool), missing
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Categoricals sort by category position
+        categories = series.cat.categories
+        if value in categories:
+            series, value = pd.Series(series.cat.codes.to_numpy()), categories.get_loc(value)
+        else:
+            series = series.astype(object)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        value = pd.Timestamp(value)
+
+    later = (series > value) if ascending else (series < value)
+    later = np.asarray(later, dtype=bool) | missing
+    equal = np.asarray(series == value, dtype=bool) & ~missing
+    return later, equal
+
+
+def _seek(df: pd.DataFrame, keys: List[Tuple[str, bool]], seek: Dict) -> np.ndarray:
+    """
+    Row positions strictly after (or before) a cursor's boundary row, in row order.
+
+    The boundary is compared on (sort keys..., row position), the same total
+    order sort_frame produces: the equivalent of SQL's
+    ``WHERE (key, id) > (:key, :id)`` keyset predicate. Rows added or
+    removed since the cursor was issued do not shift the page.
+    """
+    rows = np.arange(len(df))
+    after = np.zeros(len(df), dtype=bool)
+    tied = np.ones(len(df), dtype=bool)
+    for (column, ascending), value in zip(keys, seek['values']):
+        later, equal = _compare(df[column], value, ascending)
+        after |= tied & later
+        tied &= equal
+    after |= tied & (rows > seek['row'])
+
+    if seek['direction'] == 'next':
+        return np.flatnonzero(after)
+    return np.flatnonzero(~after & ~(tied & (rows == seek['row'])))
+
+
+def _page_positions(df: pd.DataFrame, keys: List[Tuple[str, bool]], page: Dict) -> np.ndarray:
+    """Row positions of the requested page, in display order."""
+    offset, limit, sort, seek = page['offset'], page['limit'], page['sort'], page.get('seek')
+
+    if not keys:
+        # Row order: the boundary position is its own search key
+        if seek is None:
+            start = offset
+        elif seek['direction'] == 'next':
+            start = seek['row'] + 1
+        else:
+            start = max(seek['row'] - limit, 0)
+            return np.arange(start, min(seek['row'], len(df)))
+        return np.arange(min(start, len(df)), min(start + limit, len(df)))
+
+    # Only the sort keys are reordered; the page's rows are gathered afterwards
+    keyed = df[[column for column, _ in keys]].copy()
+    keyed['_row'] = np.arange(len(df))
+    if seek is None:
+        ordered = sort_frame(keyed, sort, needed=offset + limit)
+        return ordered['_row'].to_numpy()[offset:offset + limit]
+
+    candidates = keyed.iloc[_seek(df, keys, seek)]
+    if seek['direction'] == 'next':
+        return sort_frame(candidates, sort, needed=limit)['_row'].to_numpy()[:limit]
+    return sort_frame(candidates, sort)['_row'].to_numpy()[-limit:]
+
+
+def paginate_frame(df: pd.DataFrame, page: Dict) -> Dict:
+    """
+    Slice one page out of a DataFrame.
+
+    Offset requests select the page after a (partial) sort. Cursors are
+    keyset cursors: they hold the sort key values and row position of the
+    page's boundary row, and the following page is the first `limit` rows
+    after it, so later pages cost the same as the first instead of growing
+    with the offset. Only the rows of the requested page are converted to
+    records, so the response cost is proportional to the page size.
+
+    Args:
+        df (pd.DataFrame): Full result set
+        page (dict): Output of parse_page_request
+
+    Returns:
+        dict: Page payload with data, totals and next/previous cursors
+    """
+    offset, limit, sort = page['offset'], page['limit'], page['sort']
+    total = len(df)
+
+    keys = _sort_keys(df, sort)
+    positions = _page_positions(df, keys, page)
+    page_df = df.iloc[positions]
+
+    def boundary(direction: str, position: int, cursor_offset: int) -> str:
+        values = [_json_value(df[column].iat[position]) for column, _ in keys]
+        return encode_cursor(cursor_offset, limit, sort, direction, int(position), values)
+
+    has_next = len(positions) > 0 and offset + len(positions) < total
+    has_prev = len(positions) > 0 and offset > 0
+    return {
+        'data': page_records(page_df),
+        'offset': offset,
+        'limit': limit,
+        'sort': sort,
+        'total_records': total,
+        'next_cursor': boundary('next', positions[-1], offset + limit) if has_next else None,
+        'prev_cursor': boundary('prev', positions[0], max(offset - limit, 0)) if has_prev else None
+    }
@@ -0,0 +1,188 @@
+"""
+Ad-hoc SQL over loaded Microsoft Fabric bills
+Copies a bill's rows and aggregate cells into an in-memory SQLite database,
+indexed on the key and date columns, and runs read-only queries against it
+with row limits and timeouts
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+import pandas as pd
+
+from aggregation import AggregateCube, KEY_COLUMNS
+from timeseries import DATE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+BILL_TABLE = 'bill'
+CELLS_TABLE = 'cells'
+
+DEFAULT_ROW_LIMIT = 1000
+MAX_ROW_LIMIT = 100_000
+
+# Seconds a query may run
+DEFAULT_TIMEOUT = 5.0
+MAX_TIMEOUT = 60.0
+
+# SQLite virtual machine instructions between timeout checks
+PROGRESS_STEPS = 10_000
+
+# Rows inserted per executemany call while loading
+INSERT_BATCH_ROWS = 50_000
+
+# Authorizer actions a read-only query needs; everything else (writes,
+# PRAGMA, ATTACH, transactions) is denied
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                 getattr(sqlite3, 'SQLITE_RECURSIVE', sqlite3.SQLITE_SELECT)}
+
+
+class QueryError(ValueError):
+    """A query was rejected, failed or ran out of time."""
+
+
+def _authorize(action, *_args) -> int:
+    return sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_column(series: pd.Series) -> Tuple[str, Callable[[pd.Series], pd.Series]]:
+    """
+    SQLite type of a column, and a function converting a slice of it to
+    Python values (None for missing).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # ISO text sorts and compares correctly and works with date()/strftime()
+        fmt = '%Y-%m-%d' if (series.dropna() == series.dropna().dt.normalize()).all() else '%Y-%m-%d %H:%M:%S'
+        return 'TEXT', lambda values: values.dt.strftime(fmt).where(values.notna(), None)
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return 'INTEGER', lambda values: values.astype(object)
+    if pd.api.types.is_float_dtype(series):
+        return 'REAL', lambda values: values.astype(object).where(values.notna(), None)
+    return 'TEXT', lambda values: values.astype(object).where(values.notna(), None)
+
+
+class QueryStore:
+    """
+    In-memory SQLite copy of one loaded bill.
+
+    Tables:
+        bill: one row per billing record with the parsed columns (only for
+            analyzers that keep rows)
+        cells: Cost_Sum, Cost_Count, Cost_Min and Cost_Max per
+            (MeterCategory, ConsumedService, ResourceName)
+
+    Queries run on one connection, one at a time, under an authorizer that
+    only permits reading.
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame], cube: AggregateCube):
+        """
+        Load the bill's rows and aggregate cells.
+
+        Args:
+            df (pd.DataFrame): Prepared rows, or None for aggregate-only analyzers
+            cube (AggregateCube): The bill's aggregate cube
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+
+        if df is not None:
+            date_columns = [col for col in DATE_COLUMNS if col in df.columns]
+            self._load(BILL_TABLE, df, KEY_COLUMNS + date_columns)
+        self._load(CELLS_TABLE, cube.cells.drop(columns=['Cost_Comp', 'First_Row'], errors='ignore'), KEY_COLUMNS)
+        # Planner statistics for the indexes
+        self._conn.execute('ANALYZE')
+        self._conn.commit()
+
+        self.schema = {
+            table: [(row[1], row[2]) for row in self._conn.execute(f'PRAGMA table_info({_quote(table)})')]
+            for (table,) in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                               "AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        }
+        # Pages held by the in-memory database (read before PRAGMA is denied)
+        page_count = self._conn.execute('PRAGMA page_count').fetchone()[0]
+        page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+        self._bytes = page_count * page_size
+        self._conn.set_authorizer(_authorize)
+
+    def _load(self, table: str, df: pd.DataFrame, index_columns: List[str]):
+        """Create table from df and index it on each of index_columns."""
+        columns = [_sql_column(df[col]) for col in df.columns]
+        definitions = ', '.join(f'{_quote(str(col))} {sql_type}' for col, (sql_type, _) in zip(df.columns, columns))
+        self._conn.execute(f'CREATE TABLE {_quote(table)} ({definitions})')
+
+        # Rows are converted one batch at a time, so only a batch is ever held as Python objects
+        insert = f'INSERT INTO {_quote(table)} VALUES ({", ".join("?" * len(columns))})'
+        for start in range(0, len(df), INSERT_BATCH_ROWS):
+            batch = df.iloc[start:start + INSERT_BATCH_ROWS]
+            values = pd.DataFrame({position: convert(batch.iloc[:, position])
+                                   for position, (_, convert) in enumerate(columns)})
+            self._conn.executemany(insert, values.itertuples(index=False, name=None))
+
+        for col in index_columns:
+            if col in df.columns:
+                self._conn.execute(f'CREATE INDEX {_quote(f"{table}_{col}")} ON {_quote(table)} ({_quote(col)})')
+        logger.info(f"Query store: {len(df):,} rows in table {table}")
+
+    def query(self, sql: str, limit: int = DEFAULT_ROW_LIMIT, timeout: float = DEFAULT_TIMEOUT) -> Dict:
+        """
+        Run one read-only SQL statement.
+
+        Args:
+            sql (str): A single SELECT (or WITH ... SELECT) statement
+            limit (int): Maximum rows returned (capped at MAX_ROW_LIMIT)
+            timeout (float): Seconds before the query is interrupted (capped at MAX_TIMEOUT)
+
+        Returns:
+            dict: columns, rows (lists of values), row_count, truncated (more rows
+                existed than limit) and seconds
+
+        Raises:
+            QueryError: If the statement writes, is invalid or times out
+        """
+        limit = max(1, min(int(limit), MAX_ROW_LIMIT))
+        timeout = max(0.001, min(float(timeout), MAX_TIMEOUT))
+
+        with self._lock:
+            start = time.monotonic()
+            deadline = start + timeout
+            self._conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute(sql)
+                if cursor.description is None:
+                    raise QueryError("Only queries that return rows are allowed")
+                rows = cursor.fetchmany(limit + 1)
+                columns = [description[0] for description in cursor.description]
+            except (sqlite3.Error, sqlite3.Warning) as e:
+                if time.monotonic() > deadline:
+                    raise QueryError(f"Query exceeded the {timeout:g}s timeout") from e
+                if 'not authorized' in str(e):
+                    raise QueryError("Only read-only queries are allowed") from e
+                raise QueryError(str(e)) from e
+            finally:
+                cursor.close()
+                self._conn.set_progress_handler(None, 0)
+            seconds = time.monotonic() - start
+
+        return {
+            'columns': columns,
+            'rows': [list(row) for row in rows[:limit]],
+            'row_count': min(len(rows), limit),
+            'truncated': len(rows) > limit,
+            'seconds': round(seconds, 6)
+        }
+
+    def memory_bytes(self) -> int:
+        """Size of the in-memory database (tables and indexes)."""
+        return self._bytes
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,177 @@
+"""
+Inverted substring index for Microsoft Fabric bill search
+Resolves search terms against the distinct values of the key columns first,
+then maps the matching values to row ids
+"""
+
+import re
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Columns covered by search_resources and the /filter text filters
+SEARCH_COLUMNS = ['ResourceName', 'ConsumedService', 'MeterCategory']
+
+NGRAM_SIZE = 3
+
+# Characters that make a search term a regular expression (str.contains semantics)
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+
+# Above this share of matching rows a dense mask beats gathering postings
+DENSE_MATCH_RATIO = 1 / 16
+
+
+def term_pattern(search_term: str) -> Optional[re.Pattern]:
+    """
+    Compiled case-insensitive pattern for a regex search term.
+
+    Returns None when the term should be matched as a literal substring:
+    terms without metacharacters, and terms that are not valid regular
+    expressions (e.g. "(" or "*-prod"), so typing one never fails a search.
+    """
+    if not any(ch in REGEX_CHARS for ch in search_term):
+        return None
+    try:
+        return re.compile(search_term, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class ColumnIndex:
+    """
+    Trigram index over the distinct values of one column plus row postings.
+
+    Each distinct value has an integer code. Trigrams of the lowercased
+    values map to the codes containing them, and the codes map to the
+    (sorted) row ids holding that value.
+    """
+
+    def __init__(self, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            values = series.cat.categories
+        else:
+            codes, values = pd.factorize(series)
+
+        self.values = [str(v) for v in values]
+        self.lowered = [v.lower() for v in self.values]
+        self.codes = codes
+        self.row_count = len(codes)
+
+        postings = defaultdict(list)
+        for code, value in enumerate(self.lowered):
+            for gram in _ngrams(value):
+                postings[gram].append(code)
+        self.ngrams = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+        # Row postings in CSR layout: rows of code c are order[offsets[c]:offsets[c + 1]]
+        valid = codes >= 0
+        self.counts = np.bincount(codes[valid], minlength=len(self.values))
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+        self.order = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by the value lists, trigram postings and row postings."""
+        strings = sum(sys.getsizeof(v) for v in self.values) + sum(sys.getsizeof(v) for v in self.lowered)
+        postings = sys.getsizeof(self.ngrams) + sum(sys.getsizeof(gram) + sys.getsizeof(ids)
+                                                    for gram, ids in self.ngrams.items())
+        rows = self.codes.nbytes + self.counts.nbytes + self.offsets.nbytes + self.order.nbytes
+        return strings + postings + rows
+
+    def match_values(self, search_term: str) -> np.ndarray:
+        """
+        Codes of the distinct values matching search_term, case-insensitively.
+
+        Plain terms are resolved through the trigram postings; terms with
+        regex metacharacters are matched as regular expressions, as
+        pandas str.contains would, unless they do not compile, in which
+        case they are matched literally like plain terms.
+        """
+        pattern = term_pattern(search_term)
+        if pattern is not None:
+            return np.array([code for code, value in enumerate(self.values) if pattern.search(value)], dtype=np.int64)
+
+        term = search_term.lower()
+        if len(term) < NGRAM_SIZE:
+            candidates = range(len(self.lowered))
+        else:
+            candidates = None
+            for gram in sorted(_ngrams(term), key=lambda g: len(self.ngrams.get(g, ()))):
+                ids = self.ngrams.get(gram)
+                if ids is None:
+                    return np.array([], dtype=np.int64)
+                candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+                if len(candidates) == 0:
+                    return candidates
+
+        return np.array([code for code in candidates if term in self.lowered[code]], dtype=np.int64)
+
+    def rows_for(self, codes: np.ndarray) -> np.ndarray:
+        """Sorted row ids holding any of the given value codes."""
+        matched_rows = int(self.counts[codes].sum()) if len(codes) else 0
+        if matched_rows == 0:
+            return np.array([], dtype=np.int64)
+
+        if matched_rows > self.row_count * DENSE_MATCH_RATIO:
+            lookup = np.zeros(len(self.values) + 1, dtype=bool)
+            lookup[codes] = True
+            # Code -1 (missing) indexes the trailing False slot
+            return np.flatnonzero(lookup[self.codes])
+
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes])
+        rows.sort()
+        return rows
+
+    def search(self, search_term: str) -> np.ndarray:
+        """Sorted row ids whose value contains search_term."""
+        return self.rows_for(self.match_values(search_term))
+
+
+class SearchIndex:
+    """Substring search over ResourceName, ConsumedService and MeterCategory."""
+
+    def __init__(self, df: pd.DataFrame, columns: List[str] = None):
+        self.columns: Dict[str, ColumnIndex] = {
+            col: ColumnIndex(df[col]) for col in (columns or SEARCH_COLUMNS) if col in df.columns
+        }
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by every column index."""
+        return sum(index.memory_bytes() for index in self.columns.values())
+
+    def search_column(self, column: str, search_term: str) -> np.ndarray:
+        """Sorted row ids where column contains search_term."""
+        return self.columns[column].search(search_term)
+
+    def search_any(self, search_term: str) -> np.ndarray:
+        """Sorted row ids where any indexed column contains search_term."""
+        if not self.columns:
+            return np.array([], dtype=np.int64)
+
+        # Union through a row bitmap avoids sorting overlapping matches
+        bitmap = np.zeros(next(iter(self.columns.values())).row_count, dtype=bool)
+        for index in self.columns.values():
+            bitmap[index.search(search_term)] = True
+        return np.flatnonzero(bitmap)
+
+    def filter_rows(self, filters: Dict[str, str]) -> Optional[np.ndarray]:
+        """
+        Row ids matching every non-empty {column: term} filter.
+
+        Returns:
+            np.ndarray: Sorted row ids, or None when no filter is set
+        """
+        row_ids = None
+        for column, search_term in filters.items():
+            if not search_term:
+                continue
+            rows = self.search_column(column, search_term)
+            row_ids = rows if row_ids is None else np.intersect1d(row_ids, rows, assume_unique=True)
+        return row_ids
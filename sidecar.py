@@ -0,0 +1,194 @@
+"""
+Columnar sidecar cache for cleaned billing data
+Stores the prepared DataFrame next to the source file so later loads skip parsing
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional
+import logging
+
+import pandas as pd
+
+from bill_schema import projected_columns
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cleaned frame layout changes so old sidecars are rebuilt
+SIDECAR_VERSION = 1
+SIDECAR_SUFFIX = '.fbcache'
+
+# Bytes hashed from the start and end of the source file
+HASH_SAMPLE_BYTES = 1024 * 1024
+
+# Low-cardinality key columns stored as categoricals
+CATEGORICAL_COLUMNS = ['MeterCategory', 'ConsumedService', 'ResourceName']
+
+try:
+    import pyarrow.feather as feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def sidecar_paths(file_path: str) -> Dict[str, str]:
+    """Return the data and metadata paths of a source file's sidecar."""
+    base = f"{file_path}{SIDECAR_SUFFIX}"
+    return {
+        'feather': f"{base}.feather",
+        'pickle': f"{base}.pkl",
+        'meta': f"{base}.json"
+    }
+
+
+def source_fingerprint(file_path: str) -> Dict:
+    """
+    Fingerprint a source file by size, mtime and a hash of its head and tail.
+
+    Hashing only the first and last megabyte keeps validation cheap on
+    multi-GB exports while still catching rewritten files.
+    """
+    st = os.stat(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(st.st_size).encode())
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(HASH_SAMPLE_BYTES))
+        if st.st_size > 2 * HASH_SAMPLE_BYTES:
+            f.seek(-HASH_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(HASH_SAMPLE_BYTES))
+    return {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'hash': digest.hexdigest()
+    }
+
+
+def _current_projection() -> Optional[List[str]]:
+    """Columns parsed from sources right now (None: all of them)."""
+    projection = projected_columns()
+    return None if projection is None else sorted(projection)
+
+
+def _covers_projection(stored: Optional[List[str]]) -> bool:
+    """True if a sidecar parsed with the stored projection has every column now projected."""
+    if stored is None:
+        return True
+    current = _current_projection()
+    return current is not None and set(current) <= set(stored)
+
+
+def read_sidecar(file_path: str) -> Optional[pd.DataFrame]:
+    """
+    Load the cleaned DataFrame for file_path from its sidecar if it is still valid.
+
+    The saving over re-parsing is the CSV tokenizing, type inference and
+    cleaning; the frame returned is an ordinary in-memory copy, so peak
+    memory matches a fresh load.
+
+    Args:
+        file_path (str): Path to the source billing file
+
+    Returns:
+        pd.DataFrame: Cleaned data, or None if there is no valid sidecar
+    """
+    paths = sidecar_paths(file_path)
+    if not os.path.exists(paths['meta']):
+        return None
+
+    try:
+        with open(paths['meta'], 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        if meta.get('version') != SIDECAR_VERSION:
+            return None
+        if meta.get('source') != source_fingerprint(file_path):
+            logger.info(f"Sidecar for {file_path} is stale, reloading source")
+            return None
+        if not _covers_projection(meta.get('projection')):
+            logger.info(f"Sidecar for {file_path} lacks newly registered columns, reloading source")
+            return None
+
+        data_path = paths[meta['format']]
+        if meta['format'] == 'feather':
+            if not HAS_PYARROW:
+                return None
+            # Converted to pandas in full (text columns become Python objects), so
+            # the mapping only avoids a read buffer; it is not a zero-copy view
+            df = feather.read_table(data_path, memory_map=True).to_pandas()
+        else:
+            df = pd.read_pickle(data_path)
+
+        logger.info(f"Loaded {len(df)} records from sidecar {data_path}")
+        return df
+
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable sidecar for {file_path}: {str(e)}")
+        return None
+
+
+def write_sidecar(file_path: str, df: pd.DataFrame) -> Optional[str]:
+    """
+    Write a cleaned DataFrame as a typed columnar sidecar next to file_path.
+
+    Uses uncompressed Feather when pyarrow is installed so reloads skip
+    decompression, and falls back to pickle otherwise.
+
+    Args:
+        file_path (str): Path to the source billing file
+        df (pd.DataFrame): Prepared data to store
+
+    Returns:
+        str: Path to the written sidecar, or None on failure
+    """
+    paths = sidecar_paths(file_path)
+    encoded = df.reset_index(drop=True).astype(
+        {col: 'category' for col in CATEGORICAL_COLUMNS if col in df.columns}
+    )
+
+    try:
+        fingerprint = source_fingerprint(file_path)
+        fmt = 'pickle'
+        if HAS_PYARROW:
+            try:
+                tmp_path = paths['feather'] + '.tmp'
+                encoded.to_feather(tmp_path, compression='uncompressed')
+                os.replace(tmp_path, paths['feather'])
+                fmt = 'feather'
+            except Exception as e:
+                logger.warning(f"Feather sidecar failed, falling back to pickle: {str(e)}")
+
+        if fmt == 'pickle':
+            tmp_path = paths['pickle'] + '.tmp'
+            encoded.to_pickle(tmp_path)
+            os.replace(tmp_path, paths['pickle'])
+
+        # Metadata is written last so a partial write is never treated as valid
+        tmp_meta = paths['meta'] + '.tmp'
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': SIDECAR_VERSION,
+                'format': fmt,
+                'source': fingerprint,
+                'rows': len(encoded),
+                'columns': list(encoded.columns),
+                'projection': _current_projection()
+            }, f)
+        os.replace(tmp_meta, paths['meta'])
+
+        logger.info(f"Sidecar written: {paths[fmt]}")
+        return paths[fmt]
+
+    except Exception as e:
+        logger.warning(f"Could not write sidecar for {file_path}: {str(e)}")
+        return None
+
+
+def remove_sidecar(file_path: str):
+    """Delete any sidecar files belonging to file_path."""
+    for path in sidecar_paths(file_path).values():
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove sidecar {path}: {str(e)}")
@@ -0,0 +1,34 @@
+/*
+ * Interactive charts: the analysis page loads every chart's Plotly figure
+ * spec from /api/charts/<filename> once the tables are on screen and renders
+ * them with the locally served plotly.js. Charts without data are hidden.
+ */
+
+document.addEventListener('DOMContentLoaded', async function() {
+    const container = document.getElementById('chartsContainer');
+    if (!container) return;
+
+    const targets = container.querySelectorAll('[data-chart]');
+    try {
+        const response = await fetch(container.dataset.chartsUrl);
+        const payload = await response.json();
+        if (!response.ok) throw new Error(payload.error || response.statusText);
+
+        targets.forEach(target => {
+            const spec = payload.charts[target.dataset.chart];
+            if (!spec) {
+                container.querySelector('[data-chart-section="' + target.dataset.chart + '"]').remove();
+                return;
+            }
+            // The shared styling template is sent once for all charts
+            spec.layout.template = payload.template;
+            target.innerHTML = '';
+            Plotly.newPlot(target, spec.data, spec.layout, { responsive: true });
+        });
+    } catch (error) {
+        targets.forEach(target => {
+            target.innerHTML = '<p class="text-danger">Charts could not be loaded: ' +
+                escapeHtml(error.message) + '</p>';
+        });
+    }
+});
@@ -0,0 +1,44 @@
+/*
+ * Background exports: links with a data-export-url attribute start an
+ * export job, poll its progress and download the file when it is ready.
+ * Without JavaScript the link's href still runs the export synchronously.
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('a[data-export-url]').forEach(link => {
+        link.addEventListener('click', async function(event) {
+            event.preventDefault();
+            if (link.classList.contains('disabled')) return;
+
+            const label = link.innerHTML;
+            link.classList.add('disabled');
+
+            try {
+                let response = await fetch(link.dataset.exportUrl, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+                    body: new URLSearchParams({ kind: link.dataset.exportKind })
+                });
+                let job = await response.json();
+                if (!response.ok) throw new Error(job.error || response.statusText);
+
+                while (job.status === 'pending' || job.status === 'running') {
+                    link.innerHTML = '<i class="fas fa-spinner fa-spin me-1"></i>' +
+                        job.stage + ' (' + Math.round(job.progress * 100) + '%)';
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                    response = await fetch(job.status_url);
+                    job = await response.json();
+                    if (!response.ok) throw new Error(job.error || response.statusText);
+                }
+
+                if (job.status !== 'done') throw new Error(job.error || 'Export failed');
+                window.location.href = job.download_url;
+            } catch (error) {
+                alert('Export error: ' + error.message);
+            } finally {
+                link.innerHTML = label;
+                link.classList.remove('disabled');
+            }
+        });
+    });
+});
@@ -0,0 +1,144 @@
+/*
+ * Paged tables backed by the windowed JSON API
+ * (/api/combined_report, /api/filter, /api/search).
+ *
+ * Rows are requested one page at a time; clicking a header with a
+ * data-sort-key attribute re-sorts on the server and returns to the
+ * first page.
+ */
+
+function escapeHtml(value) {
+    if (value === null || value === undefined) return '';
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function formatCost(value) {
+    return '$' + Number(value || 0).toFixed(2);
+}
+
+class PagedTable {
+    /**
+     * @param {Object} options
+     * @param {string} options.tableId    id of the <table> element
+     * @param {string} options.url        API endpoint
+     * @param {Object} [options.params]   extra query parameters (filters, search term)
+     * @param {Function} options.renderRow  row object -> <tr> inner HTML
+     * @param {number} [options.pageSize] rows per page
+     * @param {string} [options.sort]     initial sort, e.g. "Cost:desc"
+     */
+    constructor(options) {
+        this.table = document.getElementById(options.tableId);
+        this.tbody = this.table.querySelector('tbody');
+        this.url = options.url;
+        this.params = options.params || {};
+        this.renderRow = options.renderRow;
+        this.pageSize = options.pageSize || 100;
+        this.sort = options.sort || '';
+        this.offset = 0;
+        this.requestId = 0;
+
+        this.pager = document.createElement('div');
+        this.pager.className = 'd-flex justify-content-between align-items-center p-2';
+        this.pager.innerHTML =
+            '<small class="text-muted page-info"></small>' +
+            '<div class="btn-group btn-group-sm">' +
+            '<button type="button" class="btn btn-outline-secondary page-prev">&laquo; Previous</button>' +
+            '<button type="button" class="btn btn-outline-secondary page-next">Next &raquo;</button>' +
+            '</div>';
+        this.table.parentNode.insertAdjacentElement('afterend', this.pager);
+
+        this.pager.querySelector('.page-prev').addEventListener('click', () => this.load(this.prevCursor));
+        this.pager.querySelector('.page-next').addEventListener('click', () => this.load(this.nextCursor));
+
+        this.table.querySelectorAll('th[data-sort-key]').forEach(th => {
+            th.style.cursor = 'pointer';
+            th.addEventListener('click', () => this.sortBy(th));
+        });
+        // Without an explicit sort the server's default order and the template's icons apply
+        if (this.sort) this.updateSortIcons();
+    }
+
+    query(cursor) {
+        const params = new URLSearchParams(this.params);
+        if (cursor) {
+            params.set('cursor', cursor);
+        } else {
+            params.set('offset', this.offset);
+            params.set('limit', this.pageSize);
+            params.set('sort', this.sort);
+        }
+        return params;
+    }
+
+    downloadUrl() {
+        const params = new URLSearchParams(this.params);
+        params.set('sort', this.sort);
+        params.set('format', 'csv');
+        return this.url + '?' + params.toString();
+    }
+
+    async load(cursor) {
+        const requestId = ++this.requestId;
+        this.tbody.style.opacity = '0.5';
+
+        try {
+            const response = await fetch(this.url + '?' + this.query(cursor).toString());
+            const page = await response.json();
+            if (requestId !== this.requestId) return;  // a newer request superseded this one
+            if (!response.ok) throw new Error(page.error || response.statusText);
+
+            this.offset = page.offset;
+            this.pageSize = page.limit;
+            this.sort = page.sort;
+            this.nextCursor = page.next_cursor;
+            this.prevCursor = page.prev_cursor;
+
+            this.tbody.innerHTML = page.data.map(row => '<tr>' + this.renderRow(row) + '</tr>').join('');
+            this.renderPager(page);
+        } catch (error) {
+            this.tbody.innerHTML = '<tr><td colspan="' + this.table.querySelectorAll('thead th').length +
+                '" class="text-danger">Error loading rows: ' + escapeHtml(error.message) + '</td></tr>';
+        } finally {
+            this.tbody.style.opacity = '1';
+        }
+    }
+
+    renderPager(page) {
+        const first = page.total_records ? page.offset + 1 : 0;
+        const last = page.offset + page.data.length;
+        this.pager.querySelector('.page-info').textContent =
+            'Showing ' + first.toLocaleString() + '–' + last.toLocaleString() +
+            ' of ' + page.total_records.toLocaleString();
+        this.pager.querySelector('.page-prev').disabled = !page.prev_cursor;
+        this.pager.querySelector('.page-next').disabled = !page.next_cursor;
+    }
+
+    sortBy(th) {
+        const key = th.dataset.sortKey;
+        const current = this.sort === key + ':asc' ? 'asc' : (this.sort === key + ':desc' ? 'desc' : 'none');
+        const direction = current === 'asc' ? 'desc' : 'asc';
+
+        this.sort = key + ':' + direction;
+        this.offset = 0;
+        this.updateSortIcons();
+        this.load();
+    }
+
+    updateSortIcons() {
+        const [activeKey, direction] = this.sort.includes(',') ? ['', ''] : this.sort.split(':');
+        this.table.querySelectorAll('th[data-sort-key]').forEach(th => {
+            const icon = th.querySelector('.sort-icon');
+            if (!icon) return;
+            if (th.dataset.sortKey === activeKey) {
+                icon.className = 'fas ' + (direction === 'desc' ? 'fa-sort-down' : 'fa-sort-up') + ' text-success sort-icon';
+            } else {
+                icon.className = 'fas fa-sort text-muted sort-icon';
+            }
+        });
+    }
+}
@@ -0,0 +1,128 @@
+"""
+Streaming ingestion for Microsoft Fabric bills larger than memory
+Reads the CSV (or workbook) in fixed-size chunks and folds each chunk into running aggregates
+"""
+
+import os
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+import logging
+
+import pandas as pd
+
+from aggregation import AggregateCube, DEFAULT_TOP_N
+from analyzer import FabricBillAnalyzer, prepare_frame
+from excel_import import is_excel_file, iter_excel_chunks
+from bill_schema import REQUIRED_COLUMNS, iter_bill_csv
+from instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+class StreamingBillAnalyzer(FabricBillAnalyzer):
+    """
+    Analyzer that never holds the whole bill in memory.
+
+    Each chunk is cleaned, reduced to an AggregateCube and merged into the
+    running cube, so peak memory is bounded by the chunk size plus the number
+    of distinct (category, service, resource) combinations. Row-level data is
+    not retained: only the top_n highest-cost rows are kept for get_top_costs,
+    search_resources matches grouped combinations, and Excel exports omit the
+    Raw_Data sheet.
+    """
+
+    def __init__(self, chunksize: int = DEFAULT_CHUNKSIZE, top_n: int = DEFAULT_TOP_N):
+        """
+        Initialize the streaming analyzer.
+
+        Args:
+            chunksize (int): Number of CSV rows parsed per chunk
+            top_n (int): Number of highest-cost rows kept for get_top_costs
+        """
+        super().__init__(use_sidecar=False)
+        self.chunksize = chunksize
+        self.top_n = top_n
+
+    def _iter_chunks(self, file_path: str) -> Iterator[pd.DataFrame]:
+        """Yield raw chunks of the projected columns (decompressing as needed); workbooks stream row batches."""
+        if is_excel_file(file_path):
+            yield from iter_excel_chunks(file_path, self.chunksize)
+            return
+
+        yield from iter_bill_csv(file_path, self.chunksize)
+
+    def _fold_file(self, file_path: str, cube: AggregateCube) -> Optional[Tuple[AggregateCube, int]]:
+        """
+        Fold every chunk of a CSV file or workbook into cube.
+
+        Rows of the file are numbered after the cube's existing rows.
+
+        Returns:
+            tuple: (merged cube, number of chunks), or None if required columns are missing
+        """
+        chunk_count = 0
+
+        for chunk in self._iter_chunks(file_path):
+            if chunk_count == 0:
+                missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+                if missing_columns:
+                    logger.error(f"Missing required columns: {missing_columns}")
+                    logger.info(f"Available columns: {list(chunk.columns)}")
+                    return None
+
+            chunk = prepare_frame(chunk[REQUIRED_COLUMNS].copy())
+            cube = cube.merge(AggregateCube.from_frame(chunk, row_offset=cube.total_rows, top_n=self.top_n))
+            chunk_count += 1
+
+        return cube, chunk_count
+
+    @instrumented
+    def load_data(self, file_path: str) -> bool:
+        """
+        Stream billing data from a CSV file into running aggregates.
+
+        Args:
+            file_path (str): Path to the CSV file
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self._reset_memos()
+
+        try:
+            if not os.path.exists(file_path):
+                logger.error(f"File not found: {file_path}")
+                return False
+
+            folded = self._fold_file(file_path, AggregateCube(top_n=self.top_n))
+            if folded is None:
+                return False
+            cube, chunk_count = folded
+
+            self._cube = cube
+            self.file_path = file_path
+            self.analysis_timestamp = datetime.now()
+
+            logger.info(f"Streamed {cube.total_rows} records in {chunk_count} chunks from {file_path} "
+                        f"into {len(cube.cells)} combinations, ${cube.total_cost:,.2f} total cost")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error streaming data: {str(e)}")
+            return False
+
+    def get_top_costs(self, limit: int = 10) -> pd.DataFrame:
+        """Get top cost items (at most top_n rows are retained)."""
+        if self._cube is None:
+            return pd.DataFrame()
+        if limit > self.top_n:
+            logger.warning(f"Only the top {self.top_n} rows are retained in streaming mode")
+        return self._cube.top_costs(limit)
+
+    def search_resources(self, search_term: str) -> pd.DataFrame:
+        """Search grouped combinations containing the search term."""
+        if self._cube is None:
+            return pd.DataFrame()
+        return self._cube.search(search_term)
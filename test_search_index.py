@@ -0,0 +1,45 @@
+"""
+Tests for the substring search index
+Run with: python -m pytest test_search_index.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregation import AggregateCube
+from search_index import SearchIndex, term_pattern
+
+
+def _bill() -> pd.DataFrame:
+    return pd.DataFrame({
+        'MeterCategory': ['Compute', 'Compute', 'Storage', 'Tools'],
+        'ConsumedService': ['Microsoft.Compute', 'Microsoft.Compute', 'Microsoft.Storage', 'Microsoft.Tools'],
+        'ResourceName': ['vm-app01', 'vm-app02', 'logs(archive)', 'build-*-prod'],
+        'Cost': [10.0, 20.0, 5.0, 1.0]
+    })
+
+
+def test_plain_term_matches_substring_case_insensitively():
+    index = SearchIndex(_bill())
+    assert index.search_any('APP0').tolist() == [0, 1]
+
+
+def test_valid_regex_is_matched_as_pattern():
+    index = SearchIndex(_bill())
+    assert index.search_column('ResourceName', r'app0[2-9]$').tolist() == [1]
+
+
+def test_invalid_regex_falls_back_to_literal_match():
+    index = SearchIndex(_bill())
+    assert term_pattern('*-prod') is None
+    assert term_pattern('(') is None
+    assert index.search_any('*-prod').tolist() == [3]
+    assert index.search_any('(').tolist() == [2]
+    assert index.search_any('(arch').tolist() == [2]
+    assert index.filter_rows({'ResourceName': '[unclosed'}).tolist() == []
+
+
+def test_cube_search_matches_invalid_regex_literally():
+    cube = AggregateCube.from_frame(_bill())
+    assert cube.search('*-prod')['ResourceName'].tolist() == ['build-*-prod']
+    assert np.isclose(cube.search('(')['Cost'].sum(), 5.0)
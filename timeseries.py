@@ -0,0 +1,245 @@
+"""
+Time-series cost engine for Microsoft Fabric bill analysis
+Daily cost grids per dimension with cumulative sums for O(1) date-range totals
+"""
+
+import sys
+from typing import Dict, Optional, Union
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Date columns in order of preference (usage date is when the cost was incurred)
+DATE_COLUMNS = ['UsageDate', 'Date', 'BillingDate']
+
+DIMENSIONS = {
+    'service': 'ConsumedService',
+    'category': 'MeterCategory',
+    'resource': 'ResourceName'
+}
+
+# Resample rules; weeks start on Monday and every period is labelled by its first day
+FREQUENCIES = {
+    'daily': 'D',
+    'weekly': 'W-MON',
+    'monthly': 'MS'
+}
+
+# Largest days x values grid kept as a dense cumulative-sum matrix (8 bytes per cell)
+DENSE_CELL_LIMIT = 5_000_000
+
+DateLike = Union[str, pd.Timestamp]
+
+
+def find_date_column(df: pd.DataFrame) -> Optional[str]:
+    """Return the first parsed datetime column among DATE_COLUMNS, if any."""
+    for col in DATE_COLUMNS:
+        if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col]):
+            return col
+    return None
+
+
+def resample(daily: Union[pd.Series, pd.DataFrame], freq: str) -> Union[pd.Series, pd.DataFrame]:
+    """Sum a daily series into weekly/monthly periods labelled by their first day."""
+    if freq == 'daily':
+        return daily
+    return daily.resample(FREQUENCIES[freq], label='left', closed='left').sum()
+
+
+class DimensionSeries:
+    """
+    Daily costs for every value of one dimension with cumulative sums.
+
+    Small grids are stored as a dense (days + 1) x values cumulative-sum
+    matrix, so the total of any value over any date range is two lookups.
+    Grids above DENSE_CELL_LIMIT (typically ResourceName on long bills) keep
+    only the non-empty (value, day) cells sorted by value and day, with
+    per-value cumulative sums; a range total then costs two binary searches
+    within that value's days.
+    """
+
+    def __init__(self, day_index: np.ndarray, codes: np.ndarray, values: pd.Index,
+                 cost: np.ndarray, n_days: int):
+        self.values = values
+        self.n_days = n_days
+        self._lookup = {value: code for code, value in enumerate(values)}
+        n_values = len(values)
+        valid = codes >= 0
+
+        if n_days * n_values <= DENSE_CELL_LIMIT:
+            flat = np.bincount(codes[valid] * n_days + day_index[valid], weights=cost[valid],
+                               minlength=n_days * n_values)
+            daily = flat.reshape(n_values, n_days).T
+            self.dense = np.vstack([np.zeros((1, n_values)), np.cumsum(daily, axis=0)])
+        else:
+            self.dense = None
+            keys, inverse = np.unique(codes[valid].astype(np.int64) * n_days + day_index[valid],
+                                      return_inverse=True)
+            sums = np.bincount(inverse, weights=cost[valid])
+            self.cell_codes = keys // n_days
+            self.cell_days = keys % n_days
+            self.cell_cumsum = np.concatenate([[0.0], np.cumsum(sums)])
+            self.offsets = np.searchsorted(self.cell_codes, np.arange(n_values + 1))
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by the cumulative-sum grid or cells."""
+        if self.dense is not None:
+            arrays = [self.dense]
+        else:
+            arrays = [self.cell_codes, self.cell_days, self.cell_cumsum, self.offsets]
+        return sum(array.nbytes for array in arrays) + sys.getsizeof(self._lookup)
+
+    def value_code(self, value: str) -> Optional[int]:
+        return self._lookup.get(value)
+
+    def range_total(self, code: int, start: int, end: int) -> float:
+        """Cost of one value over day offsets [start, end)."""
+        if self.dense is not None:
+            return float(self.dense[end, code] - self.dense[start, code])
+
+        lo, hi = self.offsets[code], self.offsets[code + 1]
+        days = self.cell_days[lo:hi]
+        first = lo + np.searchsorted(days, start)
+        last = lo + np.searchsorted(days, end)
+        return float(self.cell_cumsum[last] - self.cell_cumsum[first])
+
+    def daily_matrix(self, codes: np.ndarray) -> np.ndarray:
+        """Daily cost of the given value codes as a days x len(codes) array."""
+        if self.dense is not None:
+            return np.diff(self.dense[:, codes], axis=0)
+
+        column_of = np.full(len(self.values), -1, dtype=np.int64)
+        column_of[codes] = np.arange(len(codes))
+        columns = column_of[self.cell_codes]
+        selected = columns >= 0
+
+        matrix = np.zeros((self.n_days, len(codes)))
+        matrix[self.cell_days[selected], columns[selected]] = np.diff(self.cell_cumsum)[selected]
+        return matrix
+
+    def totals(self) -> np.ndarray:
+        """Total cost of every value over the whole period."""
+        if self.dense is not None:
+            return self.dense[-1].copy()
+        return self.cell_cumsum[self.offsets[1:]] - self.cell_cumsum[self.offsets[:-1]]
+
+
+class CostTimeSeries:
+    """
+    Daily, weekly and monthly cost series over one date column.
+
+    Rows are bucketed into calendar days once; per-day totals for the whole
+    bill and for each dimension are kept with cumulative sums so that any
+    date-range total is answered without touching the rows again. Weekly and
+    monthly series are resampled from the daily grid.
+    """
+
+    def __init__(self, df: pd.DataFrame, date_column: str):
+        """
+        Build the daily grids.
+
+        Args:
+            df (pd.DataFrame): Prepared billing rows
+            date_column (str): Parsed datetime column to bucket by
+        """
+        self.date_column = date_column
+        dated = df[df[date_column].notna()]
+
+        days = dated[date_column].dt.floor('D').to_numpy()
+        self.start = pd.Timestamp(days.min()) if len(days) else pd.NaT
+        self.n_days = int((days.max() - days.min()) // np.timedelta64(1, 'D')) + 1 if len(days) else 0
+        self.days = pd.date_range(self.start, periods=self.n_days, freq='D') if len(days) else pd.DatetimeIndex([])
+
+        day_index = ((days - days.min()) // np.timedelta64(1, 'D')).astype(np.int64) if len(days) else np.array([], dtype=np.int64)
+        cost = dated['Cost'].to_numpy(dtype=np.float64)
+
+        self.total_cumsum = np.concatenate([[0.0], np.cumsum(np.bincount(day_index, weights=cost, minlength=self.n_days))])
+        self.dimensions: Dict[str, DimensionSeries] = {}
+        for name, column in DIMENSIONS.items():
+            if column not in dated.columns:
+                continue
+            if isinstance(dated[column].dtype, pd.CategoricalDtype):
+                codes = dated[column].cat.codes.to_numpy().astype(np.int64)
+                values = dated[column].cat.categories
+            else:
+                codes, values = pd.factorize(dated[column])
+            self.dimensions[name] = DimensionSeries(day_index, codes, values, cost, self.n_days)
+
+        logger.info(f"Time series built on {date_column}: {self.n_days} days from {len(dated)} dated records")
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by the daily grids of the bill and every dimension."""
+        return self.total_cumsum.nbytes + sum(series.memory_bytes() for series in self.dimensions.values())
+
+    @property
+    def end(self) -> pd.Timestamp:
+        """Last day with data."""
+        return self.days[-1] if self.n_days else pd.NaT
+
+    def _day_offset(self, date: DateLike) -> int:
+        """Days between the first day with data and date."""
+        return (pd.Timestamp(date).normalize() - self.start).days
+
+    def range_total(self, start: DateLike = None, end: DateLike = None,
+                    dimension: str = None, value: str = None) -> float:
+        """
+        Total cost between two dates (inclusive) in O(1).
+
+        Args:
+            start: First day (default: first day with data)
+            end: Last day (default: last day with data)
+            dimension (str): 'service', 'category' or 'resource' to restrict to one value
+            value (str): Value of the dimension, e.g. a service name
+
+        Returns:
+            float: Total cost
+        """
+        # Half-open day offsets [lo, hi) clamped to the days with data
+        lo = max(self._day_offset(start), 0) if start is not None else 0
+        hi = min(self._day_offset(end) + 1, self.n_days) if end is not None else self.n_days
+        if not self.n_days or hi <= lo:
+            return 0.0
+
+        if dimension is None:
+            return float(self.total_cumsum[hi] - self.total_cumsum[lo])
+
+        series = self.dimensions[dimension]
+        code = series.value_code(value)
+        if code is None:
+            return 0.0
+        return series.range_total(code, lo, hi)
+
+    def total(self, freq: str = 'daily') -> pd.Series:
+        """Total cost per period."""
+        daily = pd.Series(np.diff(self.total_cumsum), index=self.days, name='Cost')
+        return resample(daily, freq)
+
+    def by(self, dimension: str, freq: str = 'daily', top_n: Optional[int] = 10) -> pd.DataFrame:
+        """
+        Cost per period for each value of a dimension.
+
+        Args:
+            dimension (str): 'service', 'category' or 'resource'
+            freq (str): 'daily', 'weekly' or 'monthly'
+            top_n (int): Keep the top_n values by total cost and sum the rest
+                into an "Other" column (None keeps every value)
+
+        Returns:
+            pd.DataFrame: One row per period, one column per value
+        """
+        series = self.dimensions[dimension]
+        totals = series.totals()
+        order = np.argsort(-totals, kind='stable')
+        order = order[totals[order] > 0]
+        codes = order if top_n is None else order[:top_n]
+
+        frame = pd.DataFrame(series.daily_matrix(codes), index=self.days,
+                             columns=[str(series.values[c]) for c in codes])
+        if top_n is not None and len(order) > top_n:
+            frame['Other'] = np.diff(self.total_cumsum) - frame.sum(axis=1)
+
+        frame.index.name = 'Period'
+        return resample(frame, freq)
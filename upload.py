@@ -0,0 +1,222 @@
+"""
+Streamed upload ingestion for Microsoft Fabric bills
+Writes an upload to disk chunk by chunk while hashing it and parsing it in a
+background thread, so a bill is ready for analysis as soon as it has arrived
+"""
+
+import hashlib
+import io
+import json
+import os
+import queue
+import tempfile
+import threading
+from typing import Dict, Optional
+import logging
+
+import pandas as pd
+
+from analyzer import FabricBillAnalyzer
+from bill_schema import read_csv_options, read_sample, sniff_sample
+from compressed import compression_of, decompress_stream
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the partial file an upload is written to before it is complete
+PART_SUFFIX = '.part'
+
+# Content hashes of the uploaded files, kept in the upload folder
+REGISTRY_NAME = '.fbuploads.json'
+
+# Received chunks buffered for the parser before the upload waits for it
+PARSE_QUEUE_CHUNKS = 64
+
+_registry_lock = threading.Lock()
+
+
+class _QueueReader(io.RawIOBase):
+    """Readable stream over byte chunks put on a queue; None marks the end."""
+
+    def __init__(self, chunks: queue.Queue, first: bytes = b''):
+        self._chunks = chunks
+        self._pending = first
+        self.done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self.done:
+                return 0
+            chunk = self._chunks.get()
+            if chunk is None:
+                self.done = True
+                return 0
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Readable stream returning prefix, then the rest of stream."""
+
+    def __init__(self, prefix: bytes, stream):
+        self._pending = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._pending:
+            self._pending = self._stream.read(len(buffer))
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class UploadSink:
+    """
+    File-like target for one uploaded file.
+
+    Werkzeug's multipart parser writes the upload into it as it arrives
+    (see werkzeug.formparser.parse_form_data's stream_factory). Each chunk
+    goes to a partial file next to the destination and into a SHA-256
+    digest; for CSV bills (plain, .gz or .zst) it is also handed to a
+    background thread that decompresses, parses and prepares the rows with
+    FabricBillAnalyzer, so parsing overlaps with the transfer.
+    """
+
+    def __init__(self, dest_path: str, parse: bool = True):
+        """
+        Start receiving an upload.
+
+        Args:
+            dest_path (str): Final path of the file once the upload is committed
+            parse (bool): Parse the content as a CSV bill while it arrives
+        """
+        self.dest_path = dest_path
+        folder, name = os.path.split(dest_path)
+        fd, self.part_path = tempfile.mkstemp(dir=folder or '.', prefix=f".{name}.", suffix=PART_SUFFIX)
+        self._file = os.fdopen(fd, 'wb')
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.analyzer: Optional[FabricBillAnalyzer] = None
+
+        self._chunks = None
+        self._parser = None
+        if parse:
+            self._chunks = queue.Queue(maxsize=PARSE_QUEUE_CHUNKS)
+            self._parser = threading.Thread(target=self._parse, daemon=True)
+            self._parser.start()
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        self._file.write(data)
+        self._digest.update(data)
+        self.size += len(data)
+        if self._chunks is not None:
+            self._chunks.put(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # The parser rewinds finished files; the content is read from disk instead
+        return 0
+
+    def read(self, size: int = -1) -> bytes:
+        return b''
+
+    def _parse(self):
+        """Parser thread: build a prepared analyzer from the queued chunks."""
+        first = self._chunks.get()
+        reader = _QueueReader(self._chunks, first or b'')
+        reader.done = first is None
+        try:
+            # Same decompression, dialect sniffing and column projection as FabricBillAnalyzer.load_data
+            stream = decompress_stream(io.BufferedReader(reader), compression_of(self.dest_path))
+            sample = read_sample(stream)
+            options = read_csv_options(sniff_sample(sample))
+            df = pd.read_csv(io.BufferedReader(_PrefixedReader(sample, stream)), **options)
+
+            analyzer = FabricBillAnalyzer()
+            if analyzer.load_frame(df, self.dest_path):
+                self.analyzer = analyzer
+        except Exception as e:
+            logger.warning(f"Could not parse {os.path.basename(self.dest_path)} during upload: {str(e)}")
+        finally:
+            # Keep the upload flowing if parsing stopped before the end
+            while not reader.done:
+                reader.done = self._chunks.get() is None
+
+    def finish(self) -> str:
+        """
+        Wait for the rest of the upload to be written and parsed.
+
+        Returns:
+            str: Hex SHA-256 of the uploaded content
+        """
+        if not self._file.closed:
+            self._file.close()
+            if self._chunks is not None:
+                self._chunks.put(None)
+                self._parser.join()
+        return self._digest.hexdigest()
+
+    def commit(self):
+        """Move the completed upload to its destination."""
+        self.finish()
+        os.replace(self.part_path, self.dest_path)
+
+    def discard(self):
+        """Drop the upload, e.g. a duplicate or an aborted request."""
+        self.finish()
+        self.analyzer = None
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def _read_registry(folder: str) -> Dict:
+    try:
+        with open(os.path.join(folder, REGISTRY_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def find_duplicate(folder: str, digest: str) -> Optional[str]:
+    """
+    Name of a file in folder whose uploaded content hashed to digest.
+
+    Entries whose file was since deleted or modified are ignored.
+    """
+    with _registry_lock:
+        registry = _read_registry(folder)
+
+    for name, entry in registry.items():
+        if entry['hash'] != digest:
+            continue
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']:
+            return name
+    return None
+
+
+def register_upload(folder: str, name: str, digest: str):
+    """Record the content hash of a committed upload."""
+    st = os.stat(os.path.join(folder, name))
+    with _registry_lock:
+        registry = _read_registry(folder)
+        registry[name] = {'hash': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+        path = os.path.join(folder, REGISTRY_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, indent=1)
+        os.replace(tmp_path, path)